@@ -8,10 +8,9 @@ FlowState Website Checker - API Backend
 """
 
 import os
-import json
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from flask import Flask, request, jsonify
 try:
@@ -25,19 +24,54 @@ os.environ["GROQ_API_KEY"] = "type in your own key"
 
 from task_focus_monitor import TaskFocusMonitor
 from flowstate_bridge import FlowStateBridge
+from local_model import LocalRelevanceModel
+from log_writer import LogWriter
+from metrics import REGISTRY, instrument_app, register_cache_metrics
+from monitor_registry import MonitorRegistry, client_id_from_request
+from tracing import span, trace_app
+from shared_state import SharedStateStore
+from single_flight import SingleFlight
+from verdict_cache import canonicalize_url
+from warmup import DEFAULT_WARMUP_ENABLED, TaskWarmup
 
 app = Flask(__name__)
 if _has_cors:
     CORS(app)
+instrument_app(app)                  # 请求指标与 GET /metrics（Prometheus 文本格式）
 
-monitor = TaskFocusMonitor()         # 依赖环境变量 GROQ_API_KEY
+shared_state = SharedStateStore.from_env()  # 设置 WEBCHECKER_SHARED_STATE 时多个 worker 进程共享缓存、计数与会话
+# 依赖环境变量 GROQ_API_KEY；默认客户端使用。设置任务后在后台预热判定缓存（WEBCHECKER_WARMUP=0 关闭）
+# 存在 local_model.json（python3 local_model.py train 生成）时，明确的网站由本地模型判定，不调用 LLM
+monitor = TaskFocusMonitor(shared_state=shared_state, warmup=TaskWarmup() if DEFAULT_WARMUP_ENABLED else None,
+                           local_model=LocalRelevanceModel.from_env())
+# 按客户端（X-Client-Id / client_id）区分的监控器，共用 monitor 的 API 客户端、缓存与会话存储
+monitors = MonitorRegistry(factory=lambda client_id: TaskFocusMonitor(parent=monitor, client_id=client_id),
+                           default=lambda: monitor)
 bridge = FlowStateBridge()           # 依赖 ../flowstate/dist/cli.js 可用（npm run build）
+inflight = SingleFlight()            # 合并相同 (任务, URL) 的并发判定
+log_writer = LogWriter()             # 后台批量写入 JSONL 日志
 BASE_DIR = Path(__file__).parent
 LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 
 EVENT_LOG = LOG_DIR / "website_events.jsonl"
 RESULT_LOG = LOG_DIR / "classification_results.jsonl"
+TRACE_LOG = LOG_DIR / "request_traces.jsonl"
+
+# 为 1 时把每个请求的分段耗时写入 TRACE_LOG（Server-Timing 响应头始终返回）
+TRACE_ENABLED = os.environ.get("WEBCHECKER_TRACE_LOG", "0") == "1"
+
+# 抓取 /metrics 时读取各组件已有的计数（按名称查找模块级对象，测试中替换后同样生效）
+register_cache_metrics(lambda: monitor.verdict_cache)
+REGISTRY.register_callback("webchecker_coalesced_requests_total", "被合并的并发判定请求数", "counter",
+                           lambda: inflight.stats()["coalesced"])
+REGISTRY.register_callback("webchecker_log_records_total", "JSONL 日志记录数（按结果）", "counter",
+                           lambda: {k: log_writer.stats()[k] for k in ("written", "dropped")}, labelname="outcome")
+REGISTRY.register_callback("webchecker_log_queue_depth", "JSONL 日志队列中等待写入的记录数", "gauge",
+                           lambda: log_writer.stats()["queued"])
+
+# /classify_websites 单次请求最多接受的网站数量
+MAX_BATCH_WEBSITES = int(os.environ.get("WEBCHECKER_MAX_BATCH", "50"))
 
 
 def _now_iso() -> str:
@@ -45,11 +79,28 @@ def _now_iso() -> str:
 
 
 def _append_jsonl(path: Path, obj: Dict[str, Any]) -> None:
+    # 只入队，由 log_writer 后台线程批量写盘
+    with span("log"):
+        log_writer.write(path, obj)
+
+
+def _positive_seconds(value: Any) -> Optional[float]:
+    """解析正的秒数，非数字、布尔值、非正数或无穷大时返回 None"""
+    if isinstance(value, bool):
+        return None
     try:
-        with path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-    except Exception as e:
-        print(f"[WARN] 写入日志失败 {path}: {e}")
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return seconds if 0 < seconds < float("inf") else None
+
+
+def _write_trace(record: Dict[str, Any]) -> None:
+    if TRACE_ENABLED:
+        log_writer.write(TRACE_LOG, record)
+
+
+trace_app(app, sink=_write_trace)    # 每个请求返回 Server-Timing 响应头
 
 
 @app.get("/health")
@@ -78,8 +129,12 @@ def classify_website():
       },
       "website": { "url": "https://stackoverflow.com", "title": "Stack Overflow", "app_id": "browser" }
     }
+
+    可选 "timeout": 判定截止时间（秒），超时返回 action 为 "error" 的结果
+    可选 "client_id"（或请求头 X-Client-Id）：区分用户，各自维护任务与专注会话
     """
     data = request.get_json(silent=True) or {}
+    client_id = client_id_from_request(request, data)
 
     # 容错解析 website
     website = data.get("website")
@@ -93,10 +148,17 @@ def classify_website():
     if not website or not website.get("url"):
         return jsonify({"ok": False, "error": "missing website.url"}), 400
 
+    timeout = data.get("timeout")
+    if timeout is not None:
+        timeout = _positive_seconds(timeout)
+        if timeout is None:
+            return jsonify({"ok": False, "error": "invalid timeout"}), 400
+
     # 任务：优先用外部传入，否则从 FlowState 拉取当前任务
     task = data.get("task")
     if task is None:
-        task = bridge.get_current_task()
+        with span("bridge"):
+            task = bridge.get_current_task()
 
     if not task:
         return jsonify({"ok": False, "error": "no active task found from FlowState, and no task provided"}), 400
@@ -107,13 +169,29 @@ def classify_website():
         "client_time": data.get("client_time"),
         "task_brief": {"id": task.get("id"), "name": task.get("name")},
         "website": website,
-        "source": data.get("source", "unknown")  # 比如 "chrome-extension", "flowstate-cli"
+        "source": data.get("source", "unknown"),  # 比如 "chrome-extension", "flowstate-cli"
+        "client_id": client_id
     }
     _append_jsonl(EVENT_LOG, event_record)
 
-    # 判定
+    # 判定：传入 timeout（秒）时经由异步判定引擎执行，超过截止时间即取消
+    # 同一客户端相同 (任务指纹, 规范化URL) 的并发请求只触发一次判定，其余请求共享结果
+    def _classify():
+        with monitors.acquire(client_id) as client_monitor:
+            if timeout is not None:
+                return client_monitor.engine.run(
+                    client_monitor.check_from_flowstate_async(task, website, timeout=timeout)
+                )
+            return client_monitor.check_from_flowstate(task, website)
+
+    flight_key = (
+        client_id,
+        TaskFocusMonitor.flowstate_task_key(task),
+        canonicalize_url(website["url"]),
+    )
     try:
-        result = monitor.check_from_flowstate(task, website)
+        with span("classify"):
+            result, coalesced = inflight.do(flight_key, _classify)
     except Exception as e:
         return jsonify({"ok": False, "error": f"classify failed: {e}"}), 500
 
@@ -131,23 +209,118 @@ def classify_website():
         "is_relevant": result["is_relevant"],
         "action": result["action"],
         "confidence": result["confidence"],
-        "reason": result["reason"]
+        "reason": result["reason"],
+        "cached": result.get("cached", False),
+        "coalesced": coalesced
     }), 200
 
 
+@app.post("/classify_websites")
+def classify_websites():
+    """
+    批量判定：同一任务下的多个网站合并为一到两次 LLM 调用
+    请求体示例（task 可省略，省略时从 FlowState 获取当前任务）：
+    {
+      "task": { "id": "task_123", "name": "学习Python编程", "resources": [] },
+      "websites": [
+        { "url": "https://docs.python.org", "title": "Python 文档", "app_id": "browser" },
+        "https://www.youtube.com"
+      ]
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    client_id = client_id_from_request(request, data)
+
+    raw_websites = data.get("websites")
+    if not isinstance(raw_websites, list) or not raw_websites:
+        return jsonify({"ok": False, "error": "missing websites"}), 400
+    if len(raw_websites) > MAX_BATCH_WEBSITES:
+        return jsonify({"ok": False, "error": f"too many websites (max {MAX_BATCH_WEBSITES})"}), 400
+
+    websites = []
+    for item in raw_websites:
+        # 兼容简化传参：直接传 URL 字符串
+        website = {"url": item, "title": "", "app_id": "browser"} if isinstance(item, str) else item
+        if not isinstance(website, dict) or not website.get("url"):
+            return jsonify({"ok": False, "error": "every website needs a url"}), 400
+        websites.append(website)
+
+    task = data.get("task")
+    if task is None:
+        with span("bridge"):
+            task = bridge.get_current_task()
+
+    if not task:
+        return jsonify({"ok": False, "error": "no active task found from FlowState, and no task provided"}), 400
+
+    received_at = _now_iso()
+    task_brief = {"id": task.get("id"), "name": task.get("name")}
+    for website in websites:
+        _append_jsonl(EVENT_LOG, {
+            "received_at": received_at,
+            "client_time": data.get("client_time"),
+            "task_brief": task_brief,
+            "website": website,
+            "source": data.get("source", "unknown"),
+            "client_id": client_id
+        })
+
+    try:
+        with monitors.acquire(client_id) as client_monitor:
+            results = client_monitor.check_websites_from_flowstate(task, websites)
+    except Exception as e:
+        return jsonify({"ok": False, "error": f"classify failed: {e}"}), 500
+
+    response_items = []
+    for website, result in zip(websites, results):
+        _append_jsonl(RESULT_LOG, {
+            "timestamp": _now_iso(),
+            "task": task_brief,
+            "website": website,
+            "result": result,
+        })
+        response_items.append({
+            "url": website["url"],
+            "is_relevant": result["is_relevant"],
+            "action": result["action"],
+            "confidence": result["confidence"],
+            "reason": result["reason"],
+            "cached": result.get("cached", False)
+        })
+
+    return jsonify({"ok": True, "results": response_items}), 200
+
+
 @app.get("/stats")
 def stats():
     """
-    简单会话内统计（基于 monitor.check_history）
+    简单会话内统计（基于客户端监控器写入时累计的计数；启用共享状态时总数为该客户端在所有 worker 上的累计数）
+    可用 X-Client-Id 请求头或 client_id 查询参数指定客户端
     """
-    hist = monitor.get_history() if hasattr(monitor, "get_history") else []
-    total = len(hist)
-    relevant = sum(1 for h in hist if h.get("result", {}).get("is_relevant"))
+    client_id = client_id_from_request(request)
+    client_monitor = monitors.get(client_id)
+    check_stats = client_monitor.get_check_stats() if client_monitor is not None else {}
+    if shared_state is not None:
+        counts = shared_state.client_counts(client_id)
+        total = counts["total"]
+        relevant = counts["relevant"]
+    else:
+        total = check_stats.get("total", 0)
+        relevant = check_stats.get("relevant", 0)
     return jsonify({
         "ok": True,
         "total_checks": total,
         "relevant": relevant,
-        "irrelevant": total - relevant
+        "irrelevant": total - relevant,
+        "by_confidence": check_stats.get("by_confidence", {}),
+        "top_domains": check_stats.get("top_domains", []),
+        "cache": monitor.verdict_cache.stats(),
+        "coalescing": inflight.stats(),
+        "clients": monitors.stats(),
+        "warmup": monitor.warmup.stats() if monitor.warmup is not None else None,
+        "local_model": monitor.local_model.stats() if monitor.local_model is not None else None,
+        "pipeline": monitor.pipeline.stats(),
+        "log_writer": log_writer.stats()
     }), 200
 
 
@@ -158,5 +331,6 @@ if __name__ == "__main__":
     port = int(os.environ.get("WEBCHECKER_PORT", "5001"))
     host = os.environ.get("WEBCHECKER_HOST", "127.0.0.1")
     print(f"Listening on http://{host}:{port}")
+    print("开发模式（调试器与自动重载已开启）；生产环境请使用: python3 serve.py --workers 4")
     print("CTRL+C to stop")
     app.run(debug=True, host=host, port=port)
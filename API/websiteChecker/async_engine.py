@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+异步判定引擎 - 基于 AsyncGroq
+- 信号量限制同时在途的 LLM 调用数量
+- 每次调用可设置截止时间（超时即取消）
+- 自带后台事件循环，Flask 路由、CLI 等同步代码也可以直接驱动
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from typing import Any, Awaitable, Dict, List, Optional
+
+from groq import AsyncGroq
+
+from metrics import LLM_LATENCY, record_error
+
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("WEBCHECKER_MAX_CONCURRENCY", "16"))
+DEFAULT_TIMEOUT = float(os.environ.get("WEBCHECKER_LLM_TIMEOUT", "20"))
+
+
+class AsyncClassificationEngine:
+    """异步 LLM 调用核心（一个进程内可同时保持数十个判定在途）"""
+
+    def __init__(self, api_key: str = None, max_concurrency: int = None,
+                 timeout: float = None, model: str = DEFAULT_MODEL, client: Any = None,
+                 base_url: str = None):
+        """
+        初始化引擎
+
+        参数:
+            api_key: Groq API密钥，不提供则从环境变量GROQ_API_KEY读取
+            max_concurrency: 同时在途的最大调用数，默认 WEBCHECKER_MAX_CONCURRENCY 或 16
+            timeout: 单次调用默认截止时间（秒），默认 WEBCHECKER_LLM_TIMEOUT 或 20
+            model: 使用的模型
+            client: 自定义异步客户端（需提供 chat.completions.create 协程），用于测试
+            base_url: API 地址，不提供则读取环境变量GROQ_BASE_URL
+        """
+        self.client = client or AsyncGroq(
+            api_key=api_key or os.environ.get("GROQ_API_KEY"), base_url=base_url
+        )
+        self.max_concurrency = max(1, max_concurrency or DEFAULT_MAX_CONCURRENCY)
+        self.timeout = timeout if timeout is not None else DEFAULT_TIMEOUT
+        self.model = model
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.errors = 0
+
+    async def complete(self, messages: List[Dict], max_tokens: int = 512,
+                       temperature: float = 0.2, timeout: float = None, model: str = None,
+                       response_format: Dict = None) -> str:
+        """
+        发起一次对话补全（受并发信号量与截止时间约束）
+
+        参数:
+            messages: 对话消息列表
+            max_tokens: 最大输出长度
+            temperature: 采样温度
+            timeout: 截止时间（秒），None 使用默认值，0 表示不限
+            model: 本次调用使用的模型，None 使用引擎的默认模型
+            response_format: 输出格式约束（如 {"type": "json_object"}），None 不限制
+
+        返回:
+            str: 模型返回的文本内容
+
+        异常:
+            asyncio.TimeoutError: 超过截止时间（包括排队等待的时间）
+            asyncio.CancelledError: 调用被取消
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        timeout = self.timeout if timeout is None else timeout
+        extra = {"response_format": response_format} if response_format else {}
+
+        async def _call() -> str:
+            async with self._semaphore:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                start = time.perf_counter()
+                try:
+                    chat_completion = await self.client.chat.completions.create(
+                        messages=messages,
+                        model=model or self.model,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **extra
+                    )
+                finally:
+                    self.in_flight -= 1
+                    LLM_LATENCY.labels("async").observe(time.perf_counter() - start)
+                return chat_completion.choices[0].message.content
+
+        try:
+            content = await asyncio.wait_for(_call(), timeout=timeout or None)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            record_error("llm", "TimeoutError")
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception as e:
+            self.errors += 1
+            record_error("llm", e)
+            raise
+        self.completed += 1
+        return content
+
+    def stats(self) -> Dict:
+        """返回在途数量与完成/超时/取消/失败计数"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+        }
+
+    # ---- 供同步代码使用的驱动接口 ----
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """
+        把协程提交到引擎的后台事件循环
+
+        返回:
+            concurrent.futures.Future: 可 result(timeout) 等待，也可 cancel() 取消
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro: Awaitable, timeout: float = None) -> Any:
+        """
+        在后台事件循环中运行协程并阻塞等待结果
+
+        参数:
+            coro: 协程
+            timeout: 等待上限（秒），超时会取消该协程
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self) -> None:
+        """停止后台事件循环并关闭客户端"""
+        with self._loop_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        close_client = getattr(self.client, "close", None)
+        if close_client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(close_client(), loop).result(5)
+            except Exception:
+                pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="async-classification-engine", daemon=True
+                )
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
@@ -16,13 +16,14 @@ def batch_check_websites(task, websites):
     monitor = TaskFocusMonitor()
     monitor.set_task(task)
     
-    results = []
+    print(f"正在检查 {len(websites)} 个网站（合并为批量请求）...\n")
     
-    print(f"正在检查 {len(websites)} 个网站...\n")
+    # 一次 LLM 调用判定整批网站，无法解析的条目才会单独重试
+    checked = monitor.check_websites(websites)
     
-    for i, website in enumerate(websites, 1):
-        print(f"[{i}/{len(websites)}] 检查: {website}")
-        result = monitor.check_website(website)
+    results = []
+    for i, (website, result) in enumerate(zip(websites, checked), 1):
+        print(f"[{i}/{len(websites)}] {website}")
         results.append({
             "url": website,
             "relevant": result['is_relevant'],
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+有界的网站检查历史
+- 只在内存中保留最近 max_entries 条记录（环形缓冲区），长时间运行的服务内存不再无限增长
+- 记录写入时同步更新计数（相关/无关、按置信度、按域名），统计为 O(1)，不再遍历历史
+- 可选溢出到磁盘：被挤出缓冲区的记录按批追加到 JSONL 文件
+- 历史记录不保存 raw_response（与判定缓存一致，只保留判定所需字段）
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from verdict_cache import canonicalize_url
+
+
+DEFAULT_HISTORY_SIZE = int(os.environ.get("WEBCHECKER_HISTORY_SIZE", "1000"))
+DEFAULT_SPILL_FILE = os.environ.get("WEBCHECKER_HISTORY_SPILL", "")
+# 按域名计数的最大域名数，超出后新域名计入 OTHER_DOMAIN
+DEFAULT_MAX_DOMAINS = int(os.environ.get("WEBCHECKER_HISTORY_DOMAINS", "500"))
+OTHER_DOMAIN = "(other)"
+# 溢出记录攒够该条数后写入一次磁盘
+_SPILL_BATCH = 64
+
+
+def domain_of(url: str) -> str:
+    """返回 URL 的主机名（去掉 www.），无法解析时返回空字符串"""
+    canonical = canonicalize_url(url)
+    return (urlsplit(canonical).hostname or "") if canonical else ""
+
+
+class CheckHistory:
+    """检查历史的环形缓冲区与累计计数（线程安全）"""
+
+    def __init__(self, max_entries: int = None, spill_file: Optional[str] = None,
+                 max_domains: int = None):
+        """
+        参数:
+            max_entries: 内存中保留的记录数，默认 WEBCHECKER_HISTORY_SIZE 或 1000
+            spill_file: 被挤出的记录追加到的 JSONL 文件，默认 WEBCHECKER_HISTORY_SPILL（空表示直接丢弃）
+            max_domains: 按域名计数的最大域名数，默认 WEBCHECKER_HISTORY_DOMAINS 或 500
+        """
+        self.max_entries = max(1, max_entries if max_entries is not None else DEFAULT_HISTORY_SIZE)
+        spill_file = DEFAULT_SPILL_FILE if spill_file is None else spill_file
+        self.spill_file = Path(spill_file) if spill_file else None
+        self.max_domains = max_domains if max_domains is not None else DEFAULT_MAX_DOMAINS
+
+        self._entries: deque = deque()
+        self._pending_spill: List[Dict] = []
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        self.total = 0
+        self.relevant = 0
+        self.by_confidence: Dict[str, int] = {}
+        self.by_domain: Dict[str, Dict[str, int]] = {}
+        self.spilled = 0
+
+    def append(self, entry: Dict) -> None:
+        """
+        追加一条检查记录并更新计数
+
+        参数:
+            entry: {"timestamp", "website_url", "task", "result": {"is_relevant", "confidence", ...}}
+        """
+        result = entry.get("result") or {}
+        if "raw_response" in result:
+            entry = dict(entry, result={k: v for k, v in result.items() if k != "raw_response"})
+        is_relevant = bool(result.get("is_relevant"))
+        confidence = result.get("confidence") or "unknown"
+        domain = domain_of(entry.get("website_url", ""))
+
+        with self._lock:
+            self._entries.append(entry)
+            if len(self._entries) > self.max_entries:
+                dropped = self._entries.popleft()
+                if self.spill_file is not None:
+                    self._pending_spill.append(dropped)
+                self.spilled += 1
+
+            self.total += 1
+            if is_relevant:
+                self.relevant += 1
+            self.by_confidence[confidence] = self.by_confidence.get(confidence, 0) + 1
+            if domain not in self.by_domain and len(self.by_domain) >= self.max_domains:
+                domain = OTHER_DOMAIN
+            counts = self.by_domain.setdefault(domain, {"relevant": 0, "irrelevant": 0})
+            counts["relevant" if is_relevant else "irrelevant"] += 1
+
+            pending = None
+            if len(self._pending_spill) >= _SPILL_BATCH:
+                pending, self._pending_spill = self._pending_spill, []
+        if pending:
+            self._write_spill(pending)
+
+    def clear(self) -> None:
+        """清空历史与计数（开始新任务时调用），未写入的溢出记录先落盘"""
+        with self._lock:
+            self._entries.clear()
+            self._reset_counters()
+            pending, self._pending_spill = self._pending_spill, []
+        if pending:
+            self._write_spill(pending)
+
+    def flush(self) -> None:
+        """把尚未写入的溢出记录写入磁盘"""
+        with self._lock:
+            pending, self._pending_spill = self._pending_spill, []
+        if pending:
+            self._write_spill(pending)
+
+    def _write_spill(self, records: List[Dict]) -> None:
+        try:
+            self.spill_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_file, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        except OSError as e:
+            print(f"[WARN] 写入溢出的检查历史失败: {e}")
+
+    def stats(self, top_domains: int = 10) -> Dict:
+        """
+        返回累计统计（包含已被挤出缓冲区的记录）
+
+        参数:
+            top_domains: 返回检查次数最多的前几个域名
+
+        返回:
+            dict: total / relevant / irrelevant / by_confidence / top_domains / retained / spilled
+        """
+        with self._lock:
+            domains = sorted(self.by_domain.items(),
+                             key=lambda item: item[1]["relevant"] + item[1]["irrelevant"], reverse=True)
+            return {
+                "total": self.total,
+                "relevant": self.relevant,
+                "irrelevant": self.total - self.relevant,
+                "by_confidence": dict(self.by_confidence),
+                "top_domains": [dict(counts, domain=domain) for domain, counts in domains[:top_domains]],
+                "retained": len(self._entries),
+                "spilled": self.spilled,
+            }
+
+    def snapshot(self) -> List[Dict]:
+        """返回缓冲区内记录的副本（从旧到新）"""
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.snapshot())
+
+    def __getitem__(self, index):
+        with self._lock:
+            if isinstance(index, slice):
+                return list(self._entries)[index]
+            return self._entries[index]
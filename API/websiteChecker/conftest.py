@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+pytest 公共配置
+- 测试期间默认的会话数据文件（FOCUS_DATA_FILE）指向临时目录：
+  api_server / web_monitor 等模块在导入时创建的监控器、未指定计算器的测试，
+  都不会读写仓库里的 focus_sessions.json 及其日志、统计等旁路文件
+"""
+
+import os
+import shutil
+import tempfile
+
+_data_dir = None
+
+
+def pytest_configure(config):
+    global _data_dir
+    _data_dir = tempfile.mkdtemp(prefix="focus_sessions_")
+    os.environ["FOCUS_DATA_FILE"] = os.path.join(_data_dir, "focus_sessions.json")
+
+
+def pytest_unconfigure(config):
+    os.environ.pop("FOCUS_DATA_FILE", None)
+    if _data_dir:
+        shutil.rmtree(_data_dir, ignore_errors=True)
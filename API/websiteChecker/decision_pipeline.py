@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+分级判定流水线：规则 → 判定缓存 → 本地模型 → 小模型 → 大模型
+- rules：静态域名规则（domain_rules.json），可按任务关键词设置允许/屏蔽列表
+- cache：判定缓存（VerdictCache / SharedVerdictCache）
+- local：本地相关性模型（local_model.py），不够确定时放弃
+- small_llm：快速小模型（默认 llama-3.1-8b-instant），置信度低于 min_confidence 时升级
+- large_llm：大模型（默认 llama-3.3-70b-versatile），作为最后一级
+- 每个阶段记录进入次数、命中（给出判定）、放弃/升级、错误次数与耗时（p50/p95），
+  同时写入 Prometheus 指标，便于按成本与 p95 延迟调整阈值
+
+阶段可通过 WEBCHECKER_PIPELINE 配置（逗号分隔，按顺序），至少包含一个 LLM 阶段；
+rules / local 阶段只在配置了规则文件 / 本地模型时生效
+"""
+
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from async_engine import DEFAULT_MODEL
+from metrics import PIPELINE_STAGE_LATENCY, PIPELINE_STAGE_OUTCOMES
+from tracing import span
+from verdict_cache import canonicalize_url
+
+
+STAGES = ("rules", "cache", "local", "small_llm", "large_llm")
+LLM_STAGES = ("small_llm", "large_llm")
+
+# 默认不启用小模型（判定结果与调用次数与原来一致）；启用：WEBCHECKER_PIPELINE=rules,cache,local,small_llm,large_llm
+DEFAULT_STAGES = os.environ.get("WEBCHECKER_PIPELINE", "rules,cache,local,large_llm")
+DEFAULT_SMALL_MODEL = os.environ.get("WEBCHECKER_SMALL_MODEL", "llama-3.1-8b-instant")
+DEFAULT_LARGE_MODEL = os.environ.get("WEBCHECKER_LARGE_MODEL", DEFAULT_MODEL)
+# 小模型的判定置信度低于该值时升级到下一级（low / medium / high）
+DEFAULT_MIN_CONFIDENCE = os.environ.get("WEBCHECKER_MIN_CONFIDENCE", "medium")
+DEFAULT_RULES_FILE = os.environ.get("WEBCHECKER_RULES", str(Path(__file__).parent / "domain_rules.json"))
+
+_CONFIDENCE_RANK = {"none": -1, "low": 0, "medium": 1, "high": 2}
+# 每个阶段保留最近多少次耗时用于计算分位数
+_LATENCY_WINDOW = 1024
+
+
+def parse_stages(spec) -> List[str]:
+    """
+    解析阶段配置
+
+    参数:
+        spec: 逗号分隔的字符串或阶段名列表
+
+    返回:
+        list: 阶段名列表
+
+    异常:
+        ValueError: 含未知阶段、重复阶段或没有 LLM 阶段
+    """
+    names = [s.strip() for s in spec.split(",")] if isinstance(spec, str) else list(spec)
+    names = [name for name in names if name]
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"未知的判定阶段: {', '.join(unknown)}（可用: {', '.join(STAGES)}）")
+    if len(set(names)) != len(names):
+        raise ValueError(f"判定阶段重复: {spec}")
+    if not any(name in LLM_STAGES for name in names):
+        raise ValueError("判定流水线至少需要一个 LLM 阶段（small_llm / large_llm）")
+    return names
+
+
+def _host(url: str) -> str:
+    canonical = canonicalize_url(url)
+    return (urlsplit(canonical).hostname or "") if canonical else ""
+
+
+def _domain_matches(host: str, domains) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class DomainRules:
+    """
+    静态域名规则
+
+    文件格式（JSON）：
+        {
+          "allow": ["docs.python.org"],
+          "block": ["youtube.com"],
+          "tasks": {"数学": {"allow": ["khanacademy.org"], "block": ["bilibili.com"]}}
+        }
+    tasks 中的关键词出现在任务描述里时，其规则优先于全局规则；域名同时匹配其子域名
+    """
+
+    def __init__(self, allow: Sequence[str] = (), block: Sequence[str] = (),
+                 tasks: Dict[str, Dict[str, Sequence[str]]] = None):
+        self.allow = self._normalize(allow)
+        self.block = self._normalize(block)
+        self.tasks = {
+            keyword: (self._normalize(rules.get("allow", ())), self._normalize(rules.get("block", ())))
+            for keyword, rules in (tasks or {}).items()
+        }
+
+    @staticmethod
+    def _normalize(domains) -> Tuple[str, ...]:
+        domains = [d.strip().lower() for d in domains if d and d.strip()]
+        return tuple(d[4:] if d.startswith("www.") else d for d in domains)
+
+    @classmethod
+    def load(cls, rules_file: str) -> "DomainRules":
+        with open(rules_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("allow", ()), data.get("block", ()), data.get("tasks"))
+
+    @classmethod
+    def from_env(cls) -> "DomainRules":
+        """加载 WEBCHECKER_RULES（默认 domain_rules.json），文件不存在时返回空规则"""
+        if not os.path.exists(DEFAULT_RULES_FILE):
+            return cls()
+        try:
+            return cls.load(DEFAULT_RULES_FILE)
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"[WARN] 加载域名规则失败，忽略规则: {e}")
+            return cls()
+
+    def __bool__(self) -> bool:
+        return bool(self.allow or self.block or self.tasks)
+
+    def match(self, task: str, url: str) -> Optional[Dict]:
+        """
+        按规则判定
+
+        返回:
+            dict: 判定结果（格式同 check_website），没有规则匹配时返回 None
+        """
+        host = _host(url)
+        if not host:
+            return None
+        scopes = [(f"任务关键词“{keyword}”", allow, block)
+                  for keyword, (allow, block) in self.tasks.items() if keyword in (task or "")]
+        scopes.append(("全局", self.allow, self.block))
+        for scope, allow, block in scopes:
+            if _domain_matches(host, block):
+                return _rule_result(False, f"{scope}规则：屏蔽 {host}")
+            if _domain_matches(host, allow):
+                return _rule_result(True, f"{scope}规则：允许 {host}")
+        return None
+
+
+def _rule_result(is_relevant: bool, reason: str) -> Dict:
+    return {
+        "is_relevant": is_relevant,
+        "action": "allow" if is_relevant else "block",
+        "reason": reason,
+        "confidence": "high",
+    }
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class _StageStats:
+    __slots__ = ("entered", "hits", "passed", "errors", "latencies")
+
+    def __init__(self):
+        self.entered = 0
+        self.hits = 0
+        self.passed = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=_LATENCY_WINDOW)
+
+
+class DecisionPipeline:
+    """分级判定流水线（线程安全，可被多个监控器共用）"""
+
+    def __init__(self, stages=None, rules: DomainRules = None, small_model: str = None,
+                 large_model: str = None, min_confidence: str = None):
+        """
+        参数:
+            stages: 阶段列表或逗号分隔字符串，默认 WEBCHECKER_PIPELINE 或 rules,cache,local,large_llm
+            rules: 域名规则，默认加载 WEBCHECKER_RULES（domain_rules.json）
+            small_model: small_llm 阶段的模型，默认 WEBCHECKER_SMALL_MODEL 或 llama-3.1-8b-instant
+            large_model: large_llm 阶段的模型，默认 WEBCHECKER_LARGE_MODEL 或 llama-3.3-70b-versatile
+            min_confidence: 非最后一级 LLM 接受判定所需的最低置信度，默认 WEBCHECKER_MIN_CONFIDENCE 或 medium
+
+        异常:
+            ValueError: 阶段配置或置信度无效
+        """
+        self.stages = parse_stages(stages if stages is not None else DEFAULT_STAGES)
+        self.rules = rules if rules is not None else DomainRules.from_env()
+        models = {
+            "small_llm": small_model or DEFAULT_SMALL_MODEL,
+            "large_llm": large_model or DEFAULT_LARGE_MODEL,
+        }
+        self.llm_stages: List[Tuple[str, str]] = [(name, models[name]) for name in self.stages if name in LLM_STAGES]
+        min_confidence = min_confidence or DEFAULT_MIN_CONFIDENCE
+        if min_confidence not in _CONFIDENCE_RANK:
+            raise ValueError(f"无效的置信度: {min_confidence}")
+        self.min_confidence = min_confidence
+
+        self._lock = threading.Lock()
+        self._stats = {name: _StageStats() for name in self.stages}
+
+    # ---- 统计 ----
+
+    def observe(self, stage: str, outcome: str, seconds: float = None, count: int = 1) -> None:
+        """
+        记录阶段结果
+
+        参数:
+            stage: 阶段名
+            outcome: "hit"（给出判定）、"pass"（放弃 / 升级到下一级）或 "error"
+            seconds: 本次耗时，None 表示不记录耗时（批量调用的耗时用 record_latency 单独记录）
+            count: 本次涉及的网站数
+        """
+        with self._lock:
+            stats = self._stats[stage]
+            stats.entered += count
+            if outcome == "hit":
+                stats.hits += count
+            elif outcome == "pass":
+                stats.passed += count
+            else:
+                stats.errors += count
+            if seconds is not None:
+                stats.latencies.append(seconds)
+        PIPELINE_STAGE_OUTCOMES.labels(stage, outcome).inc(count)
+        if seconds is not None:
+            PIPELINE_STAGE_LATENCY.labels(stage).observe(seconds)
+
+    def record_latency(self, stage: str, seconds: float) -> None:
+        """记录一次调用的耗时（不计入判定次数，用于批量调用）"""
+        with self._lock:
+            self._stats[stage].latencies.append(seconds)
+        PIPELINE_STAGE_LATENCY.labels(stage).observe(seconds)
+
+    def stats(self) -> Dict:
+        """
+        各阶段统计（按流水线顺序）
+
+        返回:
+            dict: 阶段名 -> {entered, hits, passed, errors, hit_rate, latency_ms: {mean, p50, p95}}
+        """
+        report = {}
+        with self._lock:
+            for name in self.stages:
+                stats = self._stats[name]
+                latencies = sorted(stats.latencies)
+                report[name] = {
+                    "entered": stats.entered,
+                    "hits": stats.hits,
+                    "passed": stats.passed,
+                    "errors": stats.errors,
+                    "hit_rate": stats.hits / stats.entered if stats.entered else 0.0,
+                    "latency_ms": {
+                        "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+                        "p50": round(_percentile(latencies, 50) * 1000, 3),
+                        "p95": round(_percentile(latencies, 95) * 1000, 3),
+                    },
+                }
+        return report
+
+    # ---- 判定 ----
+
+    def accepts(self, result: Dict, position: int) -> bool:
+        """第 position 个 LLM 阶段的判定是否可以接受（最后一级总是接受）"""
+        if position >= len(self.llm_stages) - 1:
+            return True
+        rank = _CONFIDENCE_RANK.get(result.get("confidence"), -1)
+        return rank >= _CONFIDENCE_RANK[self.min_confidence]
+
+    def pre_llm(self, monitor, website_url: str, website_description: str = None,
+                task_key: str = None) -> Optional[Dict]:
+        """
+        依次执行 LLM 之前的阶段（规则、缓存、本地模型）
+
+        返回:
+            dict: 某个阶段给出的判定（带 "stage"），都未给出时返回 None
+        """
+        task_key = task_key or monitor.current_task_key
+        for name in self.stages:
+            if name in LLM_STAGES:
+                continue
+            if name == "rules":
+                if not self.rules:
+                    continue
+                start = time.perf_counter()
+                with span("rules"):
+                    result = self.rules.match(monitor.current_task, website_url)
+            elif name == "cache":
+                start = time.perf_counter()
+                with span("cache"):
+                    result = monitor.verdict_cache.get(task_key, website_url)
+                if result is not None:
+                    result["cached"] = True
+            else:
+                if monitor.local_model is None:
+                    continue
+                start = time.perf_counter()
+                result = monitor._local_verdict(website_url, website_description)
+            self.observe(name, "pass" if result is None else "hit", time.perf_counter() - start)
+            if result is not None:
+                result["stage"] = name
+                return result
+        return None
+
+    def decide(self, monitor, website_url: str, website_description: str = None) -> Dict:
+        """
+        判定一个网站（同步）：先走 LLM 之前的阶段，再逐级调用 LLM
+
+        LLM 判定写入判定缓存；升级后的调用失败时沿用上一级的判定。
+        回答经严格解析，追问一次后仍无法解析的按该阶段调用失败处理（不会被当作判定记录）
+
+        异常:
+            Exception: 所有 LLM 阶段都失败时抛出最后一个异常
+        """
+        task_key = monitor.current_task_key
+        result = self.pre_llm(monitor, website_url, website_description, task_key)
+        if result is not None:
+            return result
+        return self.decide_llm(monitor, website_url, website_description, task_key)
+
+    def decide_llm(self, monitor, website_url: str, website_description: str = None,
+                   task_key: str = None) -> Dict:
+        """
+        只执行 LLM 阶段（调用方已执行过 pre_llm 且没有得到判定，例如批量判定的回退）
+
+        异常:
+            Exception: 所有 LLM 阶段都失败时抛出最后一个异常
+        """
+        task_key = task_key or monitor.current_task_key
+        with span("prompt"):
+            prompt = monitor._build_check_prompt(website_url, website_description)
+        fallback, last_error = None, None
+        for position, (name, model) in enumerate(self.llm_stages):
+            start = time.perf_counter()
+            try:
+                result = monitor._ask_verdict(prompt, website_url, model=model)
+            except Exception as e:
+                self.observe(name, "error", time.perf_counter() - start)
+                last_error = e
+                continue
+            result["stage"] = name
+            if self.accepts(result, position):
+                self.observe(name, "hit", time.perf_counter() - start)
+                monitor.verdict_cache.put(task_key, website_url, result)
+                return result
+            self.observe(name, "pass", time.perf_counter() - start)
+            fallback = result
+
+        if fallback is None:
+            raise last_error
+        monitor.verdict_cache.put(task_key, website_url, fallback)
+        return fallback
+
+    async def decide_async(self, monitor, website_url: str, website_description: str = None,
+                           timeout: float = None) -> Dict:
+        """
+        decide 的异步版本，LLM 调用经由监控器的异步判定引擎
+
+        参数:
+            timeout: 所有 LLM 阶段合计的截止时间（秒），None 使用引擎默认值
+
+        异常:
+            asyncio.TimeoutError: 第一级 LLM 超时（升级后的调用超时时沿用上一级的判定）
+        """
+        task_key = monitor.current_task_key
+        result = self.pre_llm(monitor, website_url, website_description, task_key)
+        if result is not None:
+            return result
+
+        with span("prompt"):
+            prompt = monitor._build_check_prompt(website_url, website_description)
+        deadline = None if not timeout else time.monotonic() + timeout
+        fallback, last_error = None, None
+        for position, (name, model) in enumerate(self.llm_stages):
+            remaining = timeout if deadline is None else deadline - time.monotonic()
+            if deadline is not None and remaining <= 0:
+                last_error = last_error or asyncio.TimeoutError()
+                break
+            start = time.perf_counter()
+            try:
+                result = await monitor._ask_verdict_async(prompt, website_url, model=model, timeout=remaining)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.observe(name, "error", time.perf_counter() - start)
+                last_error = e
+                continue
+            result["stage"] = name
+            if self.accepts(result, position):
+                self.observe(name, "hit", time.perf_counter() - start)
+                monitor.verdict_cache.put(task_key, website_url, result)
+                return result
+            self.observe(name, "pass", time.perf_counter() - start)
+            fallback = result
+
+        if fallback is None:
+            raise last_error
+        monitor.verdict_cache.put(task_key, website_url, fallback)
+        return fallback
@@ -7,8 +7,12 @@
 import time
 import random
 from focus_score_calculator import FocusScoreCalculator
+from focus_storage import create_storage
 from enhanced_focus_monitor import EnhancedFocusMonitor
 
+# 演示写入的数据文件（演示结束后连同日志、统计等旁路文件一起清理）
+DEMO_FILES = ["demo_sessions.json", "demo_monitor.json", "demo_scenarios.json"]
+
 
 def demo_basic_usage():
     """演示基础使用方法"""
@@ -83,7 +87,8 @@ def demo_enhanced_monitor():
     print("🚀 增强版监控器演示")
     print("=" * 70)
     
-    monitor = EnhancedFocusMonitor()
+    # 演示数据不写入真实的会话记录
+    monitor = EnhancedFocusMonitor(focus_calculator=FocusScoreCalculator("demo_monitor.json"))
     
     print("\n1. 启动任务监控...")
     success = monitor.start_task_monitoring("demo_task_002", "写技术文档")
@@ -237,12 +242,11 @@ def main():
         print("4. 扩展更多功能")
         
         # 清理演示文件
-        import os
-        demo_files = ["demo_sessions.json", "demo_scenarios.json"]
-        for file in demo_files:
-            if os.path.exists(file):
-                os.remove(file)
-                print(f"🗑️  已清理演示文件: {file}")
+        for data_file in DEMO_FILES:
+            for path in create_storage(data_file).files():
+                if path.exists():
+                    path.unlink()
+                    print(f"🗑️  已清理演示文件: {path}")
         
     except KeyboardInterrupt:
         print("\n\n⚠️  演示被用户中断")
@@ -10,6 +10,11 @@ from typing import Dict, List, Optional
 from groq import Groq
 from focus_score_calculator import FocusScoreCalculator
 from flowstate_bridge import FlowStateBridge
+from verdict_cache import VerdictCache, task_fingerprint
+from verdict_protocol import (
+    JSON_RESPONSE_FORMAT, VerdictParseError, max_tokens_for, output_instructions,
+    parse_verdict, repair_messages, response_format_mode,
+)
 
 # 硬编码 GROQ API Key（按你的要求）
 GROQ_HARDCODED_KEY = "Type in your own key"
@@ -17,14 +22,23 @@ os.environ["GROQ_API_KEY"] = GROQ_HARDCODED_KEY
 
 
 class EnhancedFocusMonitor:
-    def __init__(self, api_key=None, flowstate_path=None):
+    def __init__(self, api_key=None, flowstate_path=None, base_url=None, verdict_cache=None, warmup=None,
+                 response_format=None, focus_calculator=None):
         # 忽略传入的 api_key，统一使用硬编码的密钥
-        self.client = Groq(api_key=GROQ_HARDCODED_KEY)
+        # base_url 可指向本地桩服务（stub_llm.py），默认读取环境变量 GROQ_BASE_URL
+        self.client = Groq(api_key=GROQ_HARDCODED_KEY, base_url=base_url)
         
-        self.focus_calculator = FocusScoreCalculator()
+        # focus_calculator 可指定会话数据文件不同的计算器（测试与演示用）
+        self.focus_calculator = focus_calculator if focus_calculator is not None else FocusScoreCalculator()
         self.flowstate_bridge = FlowStateBridge(flowstate_path)
+        # 判定缓存与 TaskFocusMonitor 共用同一格式；warmup（TaskWarmup）在任务开始时后台预热缓存
+        self.verdict_cache = verdict_cache if verdict_cache is not None else VerdictCache()
+        self.warmup = warmup
+        # 判定的输出格式（json / text），回答经 verdict_protocol 严格解析
+        self.response_format = response_format_mode(response_format)
         
         self.current_task = None
+        self.current_task_key = None
         self.current_session = None
         self.monitoring_active = False
     
@@ -42,8 +56,13 @@ class EnhancedFocusMonitor:
             self.current_session = self.focus_calculator.start_session(
                 self.current_task["id"], self.current_task["name"]
             )
+            self.current_task_key = task_fingerprint(
+                self.current_task["name"], self.current_task.get("resources", [])
+            )
             
             self.monitoring_active = True
+            if self.warmup is not None:
+                self.warmup.start(self, self.current_task.get("resources", []))
             
             print(f"🎯 开始监控任务: {self.current_task['name']}")
             print(f"   任务ID: {self.current_task['id']}")
@@ -65,9 +84,15 @@ class EnhancedFocusMonitor:
             if not website_data:
                 return {"success": False, "error": "无法获取当前网站信息"}
             
-            result = self._analyze_website_with_ai(
-                website_data["url"], website_data.get("title", ""), self.current_task
-            )
+            result = self.verdict_cache.get(self.current_task_key, website_data["url"])
+            if result is None:
+                result = self._analyze_website_with_ai(
+                    website_data["url"], website_data.get("title", ""), self.current_task
+                )
+                if result.get("error"):
+                    # 调用失败（如 401）不计入专注度，避免被当作“无关网站”
+                    return {"success": False, "error": result["reason"]}
+                self.verdict_cache.put(self.current_task_key, website_data["url"], result)
             
             self.focus_calculator.record_website_check(
                 website_url=website_data["url"],
@@ -89,6 +114,34 @@ class EnhancedFocusMonitor:
         except Exception as e:
             return {"success": False, "error": f"检查网站失败: {e}"}
     
+    def prefetch(self, websites: List, max_batch: int = None) -> int:
+        """
+        预先判定网站并写入判定缓存（不计入专注会话，供 TaskWarmup 在后台调用）
+        
+        参数:
+            websites: 网站列表，元素为 URL 字符串或 (url, title) 元组
+            max_batch: 未使用（本监控器逐个判定），与 TaskFocusMonitor.prefetch 保持同一接口
+        
+        返回:
+            int: 新写入缓存的网站数
+        """
+        task, task_key = self.current_task, self.current_task_key
+        if not task:
+            return 0
+        seeded = 0
+        for website in websites:
+            url, title = (website, None) if isinstance(website, str) else website
+            if self.current_task_key != task_key:
+                break
+            if self.verdict_cache.contains(task_key, url):
+                continue
+            result = self._analyze_website_with_ai(url, title or "", task)
+            if result.get("error"):
+                continue
+            self.verdict_cache.put(task_key, url, result)
+            seeded += 1
+        return seeded
+    
     def _analyze_website_with_ai(self, url: str, title: str, task: Dict) -> Dict:
         try:
             task_name = task.get("name", "未知任务")
@@ -132,56 +185,49 @@ class EnhancedFocusMonitor:
 2. 如果网站是娱乐、社交、购物等与任务无关的内容，判定为"不相关"
 3. 如果网站是搜索引擎、工具类网站，需要根据任务判断
 
-请按以下格式回答：
-判断：相关 / 不相关
-置信度：高 / 中 / 低
-理由：[简短说明为什么相关或不相关]
-
-只回答以上内容，不要添加其他说明。"""
+{output_instructions(self.response_format)}"""
 
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的任务专注度助手，帮助用户判断网站是否与当前任务相关，从而保持专注。"
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.2,
-                max_tokens=512
-            )
-            
-            response_content = chat_completion.choices[0].message.content
-            return self._parse_ai_response(response_content)
+            messages = [
+                {
+                    "role": "system",
+                    "content": "你是一个专业的任务专注度助手，帮助用户判断网站是否与当前任务相关，从而保持专注。"
+                },
+                {"role": "user", "content": prompt}
+            ]
+            response_content = self._complete(messages)
+            try:
+                return self._parse_ai_response(response_content)
+            except VerdictParseError as e:
+                # 格式不对时带上原回答追问一次，仍失败则按调用失败处理
+                messages = repair_messages(messages, response_content, e, self.response_format)
+            return self._parse_ai_response(self._complete(messages))
             
         except Exception as e:
             return {
                 "is_relevant": False,
                 "confidence": "low",
-                "reason": f"AI分析失败: {str(e)}"
+                "reason": f"AI分析失败: {str(e)}",
+                "error": True
             }
     
+    def _complete(self, messages: List[Dict]) -> str:
+        extra = {"response_format": JSON_RESPONSE_FORMAT} if self.response_format == "json" else {}
+        chat_completion = self.client.chat.completions.create(
+            messages=messages,
+            model="llama-3.3-70b-versatile",
+            temperature=0.2,
+            max_tokens=max_tokens_for(self.response_format),
+            **extra
+        )
+        return chat_completion.choices[0].message.content
+    
     def _parse_ai_response(self, response_content: str) -> Dict:
-        is_relevant = "相关" in response_content and "不相关" not in response_content.split("\n")[0]
-        
-        confidence = "medium"
-        if "高" in response_content:
-            confidence = "high"
-        elif "低" in response_content:
-            confidence = "low"
-        
-        reason = response_content
-        lines = response_content.split("\n")
-        for line in lines:
-            if "理由" in line:
-                reason = line.replace("理由：", "").replace("理由:", "").strip()
-                break
-        
+        """严格解析判定（JSON 或三行文本），格式不对时抛出 VerdictParseError"""
+        result = parse_verdict(response_content)
         return {
-            "is_relevant": is_relevant,
-            "confidence": confidence,
-            "reason": reason
+            "is_relevant": result["is_relevant"],
+            "confidence": result["confidence"],
+            "reason": result["reason"]
         }
     
     def end_task_monitoring(self) -> Optional[Dict]:
@@ -216,6 +262,7 @@ class EnhancedFocusMonitor:
             print("=" * 70 + "\n")
             
             self.current_task = None
+            self.current_task_key = None
             self.current_session = None
             self.monitoring_active = False
             
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+文件变化监听
+- Linux 上通过 inotify（ctypes 调用 libc，无额外依赖）监听文件所在目录
+- 其他平台或 inotify 不可用时退化为按 mtime/大小轮询
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1  # noqa: B018 - 确认符号存在
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """监听一组文件的变化（文件本身可以暂不存在）"""
+
+    def __init__(self, paths: Iterable, poll_interval: float = 1.0,
+                 debounce: float = 0.05, use_inotify: bool = True):
+        """
+        参数:
+            paths: 要监听的文件路径
+            poll_interval: 轮询模式下的检查间隔（秒）
+            debounce: 收到第一个事件后继续收集事件的时间（秒），合并一次写入产生的多个事件
+            use_inotify: 是否尝试使用 inotify
+        """
+        self.paths = [Path(p).absolute() for p in paths]
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+
+        self._signatures: Dict[Path, Optional[Tuple[int, int]]] = {
+            path: self._signature(path) for path in self.paths
+        }
+        self._fd: Optional[int] = None
+        self._watch_dirs: Dict[int, Path] = {}
+        self._polled: List[Path] = list(self.paths)
+
+        libc = _load_inotify() if use_inotify else None
+        if libc is not None:
+            self._setup_inotify(libc)
+
+    @property
+    def mode(self) -> str:
+        """"inotify"、"poll" 或 "mixed"（部分目录不存在，只能轮询）"""
+        if self._fd is None:
+            return "poll"
+        return "mixed" if self._polled else "inotify"
+
+    def wait(self, timeout: float = None) -> List[Path]:
+        """
+        阻塞直到有文件变化或超时
+
+        参数:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        返回:
+            list: 内容发生变化的文件路径；超时返回空列表
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self._fd is not None:
+                # 仍需轮询的路径也要按 poll_interval 检查
+                step = remaining
+                if self._polled:
+                    step = self.poll_interval if step is None else min(step, self.poll_interval)
+                if self._read_inotify(step):
+                    time.sleep(self.debounce)
+                    self._read_inotify(0)
+            else:
+                step = self.poll_interval if remaining is None else min(remaining, self.poll_interval)
+                time.sleep(step)
+
+            changed = self._collect_changes()
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+
+    def close(self) -> None:
+        """释放 inotify 文件描述符"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _setup_inotify(self, libc) -> None:
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        self._fd = fd
+        self._polled = []
+        dirs: Dict[Path, int] = {}
+        for path in self.paths:
+            directory = path.parent
+            if directory not in dirs:
+                wd = libc.inotify_add_watch(fd, str(directory).encode(), _WATCH_MASK)
+                dirs[directory] = wd
+                if wd >= 0:
+                    self._watch_dirs[wd] = directory
+            if dirs[directory] < 0:
+                # 目录不存在时无法监听，只能轮询
+                self._polled.append(path)
+
+    def _read_inotify(self, timeout: Optional[float]) -> bool:
+        """读取并丢弃 inotify 事件（是否变化以 stat 为准），返回是否收到相关事件"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+
+        relevant = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            directory = self._watch_dirs.get(wd)
+            if directory is not None and directory / name in self._signatures:
+                relevant = True
+        return relevant
+
+    def _collect_changes(self) -> List[Path]:
+        changed = []
+        for path in self.paths:
+            signature = self._signature(path)
+            if signature != self._signatures[path]:
+                self._signatures[path] = signature
+                changed.append(path)
+        return changed
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
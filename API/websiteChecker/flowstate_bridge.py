@@ -6,21 +6,273 @@ FlowState 到 TaskFocusMonitor 的桥接脚本
 
 import os
 import json
+import queue
 import subprocess
 import sys
+import threading
+import time
+import atexit
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
+from metrics import FLOWSTATE_LATENCY, record_error
+
+
+class FlowStateWorkerError(Exception):
+    """常驻 worker 不可用或请求失败"""
+
+
+class FlowStateStoreError(Exception):
+    """store.json 不存在或无法解析"""
+
+
+def default_store_path() -> Path:
+    """FlowState TaskStore 使用的数据文件路径（与 flowstate/src/store.ts 保持一致）"""
+    if os.environ.get("FLOWSTATE_STORE"):
+        return Path(os.environ["FLOWSTATE_STORE"])
+    home = os.environ.get("HOME") or os.environ.get("USERPROFILE") or "."
+    return Path(home) / ".flowstate" / "store.json"
+
+
+class FlowStateStoreReader:
+    """
+    直接读取 ~/.flowstate/store.json 的任务索引
+    只在文件 mtime 或大小变化时重新解析，其余查询都命中内存索引
+    """
+    
+    def __init__(self, store_path: str = None):
+        """
+        参数:
+            store_path: store.json 路径，默认读取 FLOWSTATE_STORE，否则为 ~/.flowstate/store.json
+        """
+        self.store_path = Path(store_path) if store_path else default_store_path()
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._tasks_by_id: Dict[str, Dict] = {}
+        self._tasks_by_recency: List[Dict] = []
+        self.reloads = 0
+    
+    @property
+    def available(self) -> bool:
+        return self.store_path.is_file()
+    
+    def current_task(self) -> Optional[Dict]:
+        """最近更新的任务（与 `flow task:list` 的第一行一致），没有任务时返回 None"""
+        self._refresh()
+        return dict(self._tasks_by_recency[0]) if self._tasks_by_recency else None
+    
+    def get_task(self, task_id: str) -> Optional[Dict]:
+        """按 id 获取任务，不存在时返回 None"""
+        self._refresh()
+        task = self._tasks_by_id.get(task_id)
+        return dict(task) if task else None
+    
+    def list_tasks(self) -> List[Dict]:
+        """按 updatedAt 倒序返回所有任务"""
+        self._refresh()
+        return [dict(task) for task in self._tasks_by_recency]
+    
+    def _refresh(self) -> None:
+        """
+        文件变化时重建索引
+        
+        异常:
+            FlowStateStoreError: 文件不存在，或首次解析就失败
+        """
+        try:
+            stat = self.store_path.stat()
+        except OSError as e:
+            raise FlowStateStoreError(f"无法访问 {self.store_path}: {e}")
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+        
+        with self._lock:
+            if signature == self._signature:
+                return
+            try:
+                with self.store_path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                # FlowState 正在写入时可能读到半个文件：已有索引则继续使用，下次再试
+                if self._signature is not None:
+                    return
+                raise FlowStateStoreError(f"解析 {self.store_path} 失败: {e}")
+            
+            tasks = [t for t in data.get("tasks") or [] if isinstance(t, dict) and t.get("id")]
+            self._tasks_by_id = {t["id"]: t for t in tasks}
+            # 与 TaskStore.listTasks 相同：按 updatedAt 倒序，相同时保持文件顺序
+            self._tasks_by_recency = sorted(tasks, key=lambda t: t.get("updatedAt") or 0, reverse=True)
+            self._signature = signature
+            self.reloads += 1
+
+
+class FlowStateWorker:
+    """
+    常驻 FlowState Node 进程（dist/worker.js）
+    通过 stdin/stdout 按行交换 JSON，避免每次命令都启动 Node
+    """
+    
+    def __init__(self, flowstate_path: Path, timeout: float = None,
+                 max_restarts: int = 3, restart_window: float = 60.0):
+        """
+        参数:
+            flowstate_path: flowstate 项目路径
+            timeout: 单次请求超时（秒），默认读取 FLOWSTATE_WORKER_TIMEOUT，否则 5 秒
+            max_restarts: restart_window 秒内允许的最大重启次数，超过后暂停使用 worker
+            restart_window: 重启次数的统计窗口（秒）
+        """
+        self.flowstate_path = Path(flowstate_path)
+        self.script = self.flowstate_path / "dist" / "worker.js"
+        self.timeout = timeout if timeout is not None else float(os.environ.get("FLOWSTATE_WORKER_TIMEOUT", "5"))
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        
+        self._process: Optional[subprocess.Popen] = None
+        self._responses: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._restart_times: List[float] = []
+        self.starts = 0
+        
+        atexit.register(self.close)
+    
+    @property
+    def available(self) -> bool:
+        """worker 脚本存在且未因频繁崩溃而暂停"""
+        if not self.script.exists():
+            return False
+        now = time.time()
+        recent = [t for t in self._restart_times if now - t < self.restart_window]
+        return len(recent) <= self.max_restarts
+    
+    def request(self, cmd: str, args: List[str] = None) -> Any:
+        """
+        发送一条命令并等待结果
+        
+        参数:
+            cmd: 命令名，例如 task:current / task:list / task:show
+            args: 命令参数
+        
+        返回:
+            worker 返回的 result 字段
+        
+        异常:
+            FlowStateWorkerError: worker 无法启动、崩溃、超时或返回错误
+        """
+        with self._lock:
+            process = self._ensure_started()
+            self._next_id += 1
+            request_id = self._next_id
+            line = json.dumps({"id": request_id, "cmd": cmd, "args": args or []}, ensure_ascii=False)
+            try:
+                process.stdin.write(line + "\n")
+                process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                self._kill()
+                raise FlowStateWorkerError(f"写入 worker 失败: {e}")
+            
+            deadline = time.time() + self.timeout
+            while True:
+                remaining = deadline - time.time()
+                try:
+                    raw = self._responses.get(timeout=max(0.0, remaining))
+                except queue.Empty:
+                    # 状态未知，直接重启，避免后续请求读到错位的响应
+                    self._kill()
+                    raise FlowStateWorkerError(f"worker 响应超时 ({self.timeout}s)")
+                if raw is None:
+                    self._kill()
+                    raise FlowStateWorkerError("worker 进程已退出")
+                try:
+                    response = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                if response.get("id") != request_id:
+                    # 之前超时请求的迟到响应
+                    continue
+                if not response.get("ok"):
+                    raise FlowStateWorkerError(response.get("error", "未知错误"))
+                return response.get("result")
+    
+    def close(self) -> None:
+        """关闭 worker 进程"""
+        with self._lock:
+            self._kill()
+    
+    def _ensure_started(self) -> subprocess.Popen:
+        if self._process is not None and self._process.poll() is None:
+            return self._process
+        if self._process is not None:
+            # 上一个进程已崩溃
+            self._kill()
+        if not self.available:
+            raise FlowStateWorkerError("worker 不可用（脚本缺失或短时间内崩溃次数过多）")
+        
+        if self.starts > 0:
+            self._restart_times.append(time.time())
+        try:
+            self._process = subprocess.Popen(
+                ["node", str(self.script)],
+                cwd=str(self.flowstate_path),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+                bufsize=1
+            )
+        except OSError as e:
+            self._restart_times.append(time.time())
+            raise FlowStateWorkerError(f"启动 worker 失败: {e}")
+        self.starts += 1
+        
+        self._responses = queue.Queue()
+        threading.Thread(
+            target=self._read_stdout,
+            args=(self._process, self._responses),
+            name="flowstate-worker-reader",
+            daemon=True
+        ).start()
+        return self._process
+    
+    @staticmethod
+    def _read_stdout(process: subprocess.Popen, responses: "queue.Queue[Optional[str]]") -> None:
+        for line in process.stdout:
+            responses.put(line)
+        # None 表示进程已退出
+        responses.put(None)
+    
+    def _kill(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except Exception:
+            pass
+        if process.poll() is None:
+            process.kill()
+        try:
+            process.wait(timeout=2)
+        except Exception:
+            pass
+
+
 class FlowStateBridge:
     """FlowState 数据桥接器"""
     
-    def __init__(self, flowstate_path: str = None):
+    def __init__(self, flowstate_path: str = None, backend: str = None):
         """
         初始化桥接器
         
         参数:
             flowstate_path: flowstate 项目路径，默认为 ../flowstate
+            backend: 读取方式，默认读取 FLOWSTATE_BRIDGE_BACKEND，否则为 "store"
+                - "store": 直接读取 store.json（失败时依次回退 worker、CLI）
+                - "worker": 常驻 Node 进程（失败时回退 CLI）
+                - "cli": 每次启动 node dist/cli.js
         """
         if flowstate_path:
             self.flowstate_path = Path(flowstate_path)
@@ -31,6 +283,47 @@ class FlowStateBridge:
         self.store_file = self.flowstate_path / "dist" / "store.js"
         self.config_file = self.flowstate_path / "dist" / "config.js"
         
+        self.backend = backend or os.environ.get("FLOWSTATE_BRIDGE_BACKEND", "store")
+        self.store_reader = FlowStateStoreReader() if self.backend == "store" else None
+        self.worker = FlowStateWorker(self.flowstate_path) if self.backend in ("store", "worker") else None
+    
+    def _store_lookup(self, method: str, *args) -> Tuple[bool, Any]:
+        """
+        通过内存索引查询 store.json
+        
+        返回:
+            tuple: (是否成功, 结果)；失败时调用方应回退到 worker/CLI
+        """
+        if not self.store_reader:
+            return False, None
+        start = time.perf_counter()
+        try:
+            return True, getattr(self.store_reader, method)(*args)
+        except FlowStateStoreError as e:
+            record_error("flowstate", e)
+            return False, None
+        finally:
+            FLOWSTATE_LATENCY.labels("store").observe(time.perf_counter() - start)
+    
+    def _worker_request(self, cmd: str, args: List[str] = None) -> Tuple[bool, Any]:
+        """
+        通过常驻 worker 执行命令
+        
+        返回:
+            tuple: (是否成功, 结果)；失败时调用方应回退到 CLI
+        """
+        if not self.worker or not self.worker.available:
+            return False, None
+        start = time.perf_counter()
+        try:
+            return True, self.worker.request(cmd, args)
+        except FlowStateWorkerError as e:
+            record_error("flowstate", e)
+            print(f"FlowState worker 请求失败，回退到 CLI: {e}")
+            return False, None
+        finally:
+            FLOWSTATE_LATENCY.labels("worker").observe(time.perf_counter() - start)
+    
     def get_current_task(self) -> Optional[Dict]:
         """
         获取当前任务信息
@@ -38,6 +331,15 @@ class FlowStateBridge:
         返回:
             dict: 任务信息，包含 id, name, resources 等
         """
+        ok, task = self._store_lookup("current_task")
+        if ok:
+            return task
+        
+        # 常驻 worker 一次往返即可拿到最新任务
+        ok, task = self._worker_request("task:current")
+        if ok:
+            return task
+        
         try:
             # 使用 flowstate CLI 获取任务列表
             result = self._run_flowstate_command(["task:list"])
@@ -133,6 +435,7 @@ class FlowStateBridge:
         返回:
             str: 命令输出
         """
+        start = time.perf_counter()
         try:
             # 构建完整命令
             cmd = ["node", str(self.flowstate_path / "dist" / "cli.js")] + args
@@ -149,15 +452,20 @@ class FlowStateBridge:
             if result.returncode == 0:
                 return result.stdout
             else:
+                record_error("flowstate", "CommandFailed")
                 print(f"FlowState 命令执行失败: {result.stderr}")
                 return None
                 
-        except subprocess.TimeoutExpired:
+        except subprocess.TimeoutExpired as e:
+            record_error("flowstate", e)
             print("FlowState 命令执行超时")
             return None
         except Exception as e:
+            record_error("flowstate", e)
             print(f"执行 FlowState 命令时出错: {e}")
             return None
+        finally:
+            FLOWSTATE_LATENCY.labels("cli").observe(time.perf_counter() - start)
     
     def get_task_resources(self, task_id: str) -> List[Dict]:
         """
@@ -169,6 +477,12 @@ class FlowStateBridge:
         返回:
             list: 资源列表
         """
+        ok, task_data = self._store_lookup("get_task", task_id)
+        if not ok:
+            ok, task_data = self._worker_request("task:show", [task_id])
+        if ok:
+            return (task_data or {}).get("resources", [])
+        
         try:
             task_detail = self._run_flowstate_command(["task:show", task_id])
             if not task_detail:
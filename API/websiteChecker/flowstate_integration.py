@@ -16,26 +16,39 @@ from pathlib import Path
 os.environ["GROQ_API_KEY"] = "type in your own key"
 
 # 导入我们的模块
-from flowstate_bridge import FlowStateBridge
+from file_watcher import FileWatcher
+from flowstate_bridge import FlowStateBridge, default_store_path
 from task_focus_monitor import TaskFocusMonitor
 
+# api_server 记录的网站访问日志，监听模式下作为网站来源
+DEFAULT_WEBSITE_FEED = Path(__file__).parent / "logs" / "website_events.jsonl"
+
 
 class FlowStateIntegration:
     """FlowState 集成监控器"""
     
-    def __init__(self, check_interval: int = 5):
+    def __init__(self, check_interval: int = 5, use_async: bool = False,
+                 watch: bool = False, website_feed: str = None):
         """
         初始化集成监控器
         
         参数:
             check_interval: 检查间隔（秒）
+            use_async: 是否经由异步判定引擎分析（不阻塞监控循环）
+            watch: 是否使用监听模式（任务存储或网站日志变化时才检查，替代定时轮询）
+            website_feed: 监听模式下的网站来源（JSONL，取最后一条记录的 website），
+                          默认为 api_server 的 logs/website_events.jsonl
         """
         self.bridge = FlowStateBridge()
         self.monitor = TaskFocusMonitor()
         self.check_interval = check_interval
+        self.use_async = use_async
+        self.watch = watch
+        self.website_feed = Path(website_feed) if website_feed else (DEFAULT_WEBSITE_FEED if watch else None)
         self.running = False
         self.current_task_id = None
         self.last_website = None
+        self.pending_analysis = None
         
         # 设置信号处理
         signal.signal(signal.SIGINT, self._signal_handler)
@@ -57,6 +70,11 @@ class FlowStateIntegration:
         
         self.running = True
         
+        if self.watch:
+            self._watch_loop()
+            print("\n监控已停止")
+            return
+        
         while self.running:
             try:
                 self._check_and_analyze()
@@ -69,9 +87,35 @@ class FlowStateIntegration:
         
         print("\n监控已停止")
     
+    def _watch_loop(self):
+        """监听模式：只在任务存储或网站日志变化时检查"""
+        store_path = self.bridge.store_reader.store_path if self.bridge.store_reader else default_store_path()
+        watcher = FileWatcher([store_path, self.website_feed], poll_interval=self.check_interval)
+        print(f"监听模式: {watcher.mode}")
+        print(f"   任务存储: {store_path}")
+        print(f"   网站日志: {self.website_feed}")
+        
+        try:
+            self._check_and_analyze()
+            while self.running:
+                try:
+                    # 超时只用于检查 running 标志，不做任何工作
+                    if watcher.wait(timeout=1.0):
+                        self._check_and_analyze()
+                except KeyboardInterrupt:
+                    break
+                except Exception as e:
+                    print(f"监控过程中出错: {e}")
+        finally:
+            watcher.close()
+    
     def stop(self):
         """停止监控"""
         self.running = False
+        if self.use_async:
+            if self.pending_analysis:
+                self.pending_analysis.cancel()
+            self.monitor.engine.close()
     
     def _check_and_analyze(self):
         """检查并分析当前状态"""
@@ -95,7 +139,7 @@ class FlowStateIntegration:
                         print(f"     - {resource.get('title', '无标题')} ({resource.get('id', '')})")
         
         # 获取当前网站
-        current_website = self.bridge.get_current_website()
+        current_website = self._get_current_website()
         
         # 检查网站是否发生变化
         if current_website and current_website != self.last_website:
@@ -116,29 +160,73 @@ class FlowStateIntegration:
            not (current_website and current_website != self.last_website):
             print(".", end="", flush=True)
     
+    def _get_current_website(self):
+        """当前网站：配置了网站日志时取日志最后一条，否则由桥接器提供"""
+        if not self.website_feed:
+            return self.bridge.get_current_website()
+        
+        try:
+            with self.website_feed.open("rb") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(0, size - 64 * 1024))
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+        
+        for line in reversed(lines):
+            try:
+                return json.loads(line.decode("utf-8")).get("website")
+            except (ValueError, UnicodeDecodeError):
+                continue
+        return None
+    
     def _analyze_website(self, task_data, website_data):
         """分析网站与任务的相关性"""
+        if self.use_async:
+            self._analyze_website_async(task_data, website_data)
+            return
+        
         try:
             # 使用 TaskFocusMonitor 进行分析
             result = self.monitor.check_from_flowstate(task_data, website_data)
-            
-            # 显示分析结果
-            website_url = website_data.get('url', '')
-            website_title = website_data.get('title', '')
-            
-            print(f"   🔍 专注度分析结果:")
-            print(f"      判断: {'✅ 相关' if result['is_relevant'] else '❌ 无关'}")
-            print(f"      置信度: {result['confidence']}")
-            print(f"      建议: {result['action']}")
-            print(f"      理由: {result['reason']}")
-            
-            # 如果是不相关的网站，给出警告
-            if not result['is_relevant'] and result['action'] == 'block':
-                print(f"   ⚠️  警告: 当前网站可能分散注意力，建议关闭")
-            
+            self._print_analysis(result)
         except Exception as e:
             print(f"   ❌ 分析失败: {e}")
     
+    def _analyze_website_async(self, task_data, website_data):
+        """提交到异步判定引擎；切换到新网站时取消上一个尚未完成的分析"""
+        if self.pending_analysis and not self.pending_analysis.done():
+            self.pending_analysis.cancel()
+        
+        future = self.monitor.engine.submit(
+            self.monitor.check_from_flowstate_async(task_data, website_data)
+        )
+        
+        def _on_done(done_future):
+            if done_future.cancelled():
+                return
+            error = done_future.exception()
+            if error:
+                print(f"   ❌ 分析失败: {error}")
+            else:
+                self._print_analysis(done_future.result())
+        
+        future.add_done_callback(_on_done)
+        self.pending_analysis = future
+    
+    def _print_analysis(self, result):
+        """显示分析结果"""
+        print(f"   🔍 专注度分析结果:")
+        print(f"      判断: {'✅ 相关' if result['is_relevant'] else '❌ 无关'}")
+        print(f"      置信度: {result['confidence']}")
+        print(f"      建议: {result['action']}")
+        print(f"      理由: {result['reason']}")
+        
+        # 如果是不相关的网站，给出警告
+        if not result['is_relevant'] and result['action'] == 'block':
+            print(f"   ⚠️  警告: 当前网站可能分散注意力，建议关闭")
+    
     def show_statistics(self):
         """显示统计信息"""
         if hasattr(self.monitor, 'print_statistics'):
@@ -166,6 +254,22 @@ def main():
         default=5, 
         help="检查间隔（秒，默认5秒）"
     )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="经由异步判定引擎分析网站（不阻塞监控循环）"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="监听模式：任务存储或网站日志变化时才检查（inotify，不可用时轮询）"
+    )
+    parser.add_argument(
+        "--website-feed",
+        type=str,
+        help="监听模式下的网站来源 JSONL（默认 logs/website_events.jsonl）"
+    )
     parser.add_argument(
         "--stats", 
         action="store_true", 
@@ -180,7 +284,12 @@ def main():
     args = parser.parse_args()
     
     # 创建集成监控器
-    integration = FlowStateIntegration(check_interval=args.interval)
+    integration = FlowStateIntegration(
+        check_interval=args.interval,
+        use_async=args.use_async,
+        watch=args.watch,
+        website_feed=args.website_feed
+    )
     
     if args.stats:
         # 显示统计信息
@@ -9,6 +9,32 @@ import argparse
 from enhanced_focus_monitor import EnhancedFocusMonitor
 
 
+def classify_urls(task, urls, concurrency=None, timeout=None):
+    """使用异步判定引擎并发检查多个网站"""
+    from async_engine import AsyncClassificationEngine
+    from task_focus_monitor import TaskFocusMonitor
+    
+    monitor = TaskFocusMonitor()
+    monitor._engine = AsyncClassificationEngine(
+        api_key=monitor.client.api_key, base_url=monitor.client.base_url,
+        max_concurrency=concurrency, timeout=timeout
+    )
+    monitor.set_task(task)
+    
+    try:
+        results = monitor.engine.run(monitor.check_many_async(urls))
+    finally:
+        monitor.engine.close()
+    
+    for url, result in zip(urls, results):
+        mark = '✅' if result['is_relevant'] else '❌'
+        print(f"{mark} {url}")
+        print(f"    置信度: {result['confidence']} | 理由: {result['reason']}")
+    
+    stats = monitor.engine.stats()
+    print(f"\n📊 完成 {stats['completed']} | 超时 {stats['timeouts']} | 失败 {stats['errors']} | 最大并发 {stats['max_in_flight']}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="专注度监控CLI工具")
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
@@ -29,12 +55,22 @@ def main():
     stats_parser = subparsers.add_parser('stats', help='查看专注度统计')
     stats_parser.add_argument('--days', type=int, default=30, help='统计天数')
     
+    classify_parser = subparsers.add_parser('classify', help='并发检查多个网站是否与任务相关')
+    classify_parser.add_argument('--task', required=True, help='任务描述')
+    classify_parser.add_argument('urls', nargs='+', help='网站URL')
+    classify_parser.add_argument('--concurrency', type=int, help='最大并发调用数')
+    classify_parser.add_argument('--timeout', type=float, help='单个网站的截止时间（秒）')
+    
     args = parser.parse_args()
     
     if not args.command:
         parser.print_help()
         return
     
+    if args.command == 'classify':
+        classify_urls(args.task, args.urls, args.concurrency, args.timeout)
+        return
+    
     monitor = EnhancedFocusMonitor()
     
     try:
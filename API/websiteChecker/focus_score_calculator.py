@@ -3,29 +3,197 @@
 专注度计算器 - 基于专注时长和无关网站访问次数计算用户专注度
 """
 
-import json
+import os
+import threading
 import time
-from datetime import datetime
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+import uuid
+import weakref
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from dataclasses import dataclass
+
+from focus_storage import add_to_daily, create_storage, daily_key
+from tracing import span
+
+
+class _InternTable:
+    """字符串驻留表：相同的值只保存一份，记录中只存整数 ID"""
+    
+    __slots__ = ("values", "_ids", "_lock")
+    
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = list(values)
+        self._ids: Dict[str, int] = {value: i for i, value in enumerate(self.values)}
+        self._lock = threading.Lock()
+    
+    def id_of(self, value: str) -> int:
+        value_id = self._ids.get(value)
+        if value_id is None:
+            with self._lock:
+                value_id = self._ids.get(value)
+                if value_id is None:
+                    value_id = len(self.values)
+                    self.values.append(value)
+                    self._ids[value] = value_id
+        return value_id
+
+
+# 置信度枚举（全局共用），遇到其他取值时追加
+_CONFIDENCES = _InternTable(["high", "medium", "low"])
+
+_FLAG_RELEVANT = 0x01
+
+
+class CheckLog:
+    """
+    按列存储的网站检查记录
+    
+    时间戳为 float 数组，URL/理由/置信度为驻留表 ID，是否相关打包为标志字节。
+    URL 与理由的驻留表属于每个 CheckLog，会话被释放时随之释放（不在进程内无限累积）。
+    支持 append、len、下标与迭代；下标/迭代时才生成与原来相同的 dict：
+        {"timestamp", "website_url", "is_relevant", "confidence", "reason"}
+    """
+    
+    __slots__ = ("_timestamps", "_urls", "_reasons", "_confidences", "_flags", "_url_table", "_reason_table")
+    
+    def __init__(self, checks: Iterable[Dict] = None):
+        self._url_table = _InternTable()
+        self._reason_table = _InternTable([""])
+        self._timestamps = array("d")
+        self._urls = array("I")
+        self._reasons = array("I")
+        self._confidences = array("H")
+        self._flags = bytearray()
+        for check in checks or ():
+            self.append(check)
+    
+    def append(self, check: Dict) -> None:
+        timestamp = check.get("timestamp")
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp).timestamp()
+        self._timestamps.append(float(timestamp or 0.0))
+        self._urls.append(self._url_table.id_of(check.get("website_url") or ""))
+        self._reasons.append(self._reason_table.id_of(check.get("reason") or ""))
+        self._confidences.append(_CONFIDENCES.id_of(check.get("confidence") or "medium"))
+        self._flags.append(_FLAG_RELEVANT if check.get("is_relevant") else 0)
+    
+    def __len__(self) -> int:
+        return len(self._flags)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._view(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("check index out of range")
+        return self._view(index)
+    
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self._view(i)
+    
+    def to_list(self) -> List[Dict]:
+        return list(self)
+    
+    def _view(self, i: int) -> Dict:
+        return {
+            "timestamp": datetime.fromtimestamp(self._timestamps[i]).isoformat(),
+            "website_url": self._url_table.values[self._urls[i]],
+            "is_relevant": bool(self._flags[i] & _FLAG_RELEVANT),
+            "confidence": _CONFIDENCES.values[self._confidences[i]],
+            "reason": self._reason_table.values[self._reasons[i]]
+        }
 
 
-@dataclass
 class FocusSession:
-    session_id: str
-    task_id: str
-    task_name: str
-    start_time: float
-    end_time: Optional[float] = None
-    total_duration: float = 0.0
-    relevant_websites: int = 0
-    irrelevant_websites: int = 0
-    focus_score: float = 0.0
-    website_checks: List[Dict] = None
-    
-    def __post_init__(self):
-        if self.website_checks is None:
-            self.website_checks = []
+    """
+    专注会话（__slots__ 对象，网站检查按列存储在 CheckLog 中）
+    
+    从存储加载的历史会话可以只带 checks_loader，首次访问 website_checks 时才读取检查记录
+    """
+    
+    __slots__ = (
+        "session_id", "task_id", "task_name", "start_time", "end_time", "total_duration",
+        "relevant_websites", "irrelevant_websites", "focus_score", "_checks", "_checks_loader",
+    )
+    
+    HEADER_FIELDS = __slots__[:-2]
+    
+    def __init__(self, session_id: str, task_id: str, task_name: str, start_time: float,
+                 end_time: Optional[float] = None, total_duration: float = 0.0,
+                 relevant_websites: int = 0, irrelevant_websites: int = 0,
+                 focus_score: float = 0.0, website_checks: Iterable[Dict] = None,
+                 checks_loader: Callable[[], List[Dict]] = None):
+        self.session_id = session_id
+        self.task_id = task_id
+        self.task_name = task_name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.total_duration = total_duration
+        self.relevant_websites = relevant_websites
+        self.irrelevant_websites = irrelevant_websites
+        self.focus_score = focus_score
+        if website_checks is None and checks_loader is not None:
+            self._checks = None
+            self._checks_loader = checks_loader
+        else:
+            self.website_checks = website_checks
+    
+    @property
+    def checks_loaded(self) -> bool:
+        return self._checks is not None
+    
+    @property
+    def website_checks(self) -> CheckLog:
+        if self._checks is None:
+            self._checks = CheckLog(self._checks_loader())
+            self._checks_loader = None
+        return self._checks
+    
+    @website_checks.setter
+    def website_checks(self, checks: Iterable[Dict]) -> None:
+        self._checks = checks if isinstance(checks, CheckLog) else CheckLog(checks)
+        self._checks_loader = None
+    
+    def add_check(self, check: Dict) -> None:
+        self.website_checks.append(check)
+    
+    def to_dict(self, include_checks: bool = True) -> Dict:
+        """
+        转为与原 JSON 格式相同的字典
+        
+        参数:
+            include_checks: 是否包含 website_checks 列表（尚未加载的检查记录不会为此读取）
+        """
+        data = {field: getattr(self, field) for field in self.HEADER_FIELDS}
+        if include_checks and self.checks_loaded:
+            data["website_checks"] = self._checks.to_list()
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FocusSession":
+        return cls(**data)
+    
+    def __repr__(self) -> str:
+        checks = len(self._checks) if self.checks_loaded else "not loaded"
+        return (f"FocusSession(session_id={self.session_id!r}, task_name={self.task_name!r}, "
+                f"checks={checks})")
+
+
+class _CalculatorGroup:
+    """共用同一份历史会话与存储的计算器（见 FocusScoreCalculator.fork）"""
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.members: "weakref.WeakSet[FocusScoreCalculator]" = weakref.WeakSet()
+        self.next_seq = 0
+    
+    def others_active(self, calculator: "FocusScoreCalculator") -> bool:
+        """是否还有其他计算器的会话未结束"""
+        with self.lock:
+            return any(c is not calculator and c.current_session is not None for c in list(self.members))
 
 
 @dataclass
@@ -41,39 +209,87 @@ class FocusMetrics:
 
 
 class FocusScoreCalculator:
-    def __init__(self, data_file: str = "focus_sessions.json"):
+    def __init__(self, data_file: str = None, storage=None):
+        """
+        参数:
+            data_file: 会话数据文件，默认读取 FOCUS_DATA_FILE，否则为 "focus_sessions.json"
+            storage: 存储后端实例或名称（"journal"/"json"/"sqlite"），默认读取 FOCUS_STORAGE，否则为 "journal"
+        """
+        data_file = data_file or os.environ.get("FOCUS_DATA_FILE", "focus_sessions.json")
         self.data_file = data_file
+        if storage is None or isinstance(storage, str):
+            storage = create_storage(data_file, storage)
+        self.storage = storage
         self.sessions: List[FocusSession] = []
         self.current_session: Optional[FocusSession] = None
+        self.daily_buckets: Dict[str, Dict] = {}
+        self._group = _CalculatorGroup()
+        self._group.members.add(self)
         self.load_data()
     
+    def fork(self) -> "FocusScoreCalculator":
+        """
+        创建共用历史会话、统计桶与存储，但当前会话独立的计算器（每个客户端一个）
+        
+        返回:
+            FocusScoreCalculator: 新的计算器，不会重新读取存储
+        """
+        other = FocusScoreCalculator.__new__(FocusScoreCalculator)
+        other.data_file = self.data_file
+        other.storage = self.storage
+        other.sessions = self.sessions
+        other.current_session = None
+        other.daily_buckets = self.daily_buckets
+        other._group = self._group
+        with self._group.lock:
+            self._group.members.add(other)
+        return other
+    
     def load_data(self):
         try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.sessions = [
-                    FocusSession(**session_data) 
-                    for session_data in data.get('sessions', [])
-                ]
-        except FileNotFoundError:
-            self.sessions = []
+            self.sessions = [
+                FocusSession.from_dict(session_data)
+                for session_data in self.storage.load()
+            ]
         except Exception as e:
             print(f"加载数据失败: {e}")
             self.sessions = []
+        self._load_daily_buckets()
+    
+    def _load_daily_buckets(self):
+        """读取按天统计桶，缺失或与已加载会话数不一致时从会话重建"""
+        try:
+            buckets = self.storage.load_daily()
+        except Exception as e:
+            print(f"加载统计数据失败: {e}")
+            buckets = None
+        
+        finished = [s for s in self.sessions if s.end_time is not None]
+        if buckets is None or (
+            finished and sum(b['sessions'] for b in buckets.values()) != len(finished)
+        ):
+            buckets = {}
+            for session in finished:
+                add_to_daily(buckets, session.to_dict(include_checks=False))
+            try:
+                self.storage.save_daily(buckets)
+            except Exception as e:
+                print(f"保存统计数据失败: {e}")
+        self.daily_buckets = buckets
     
     def save_data(self):
+        """写入全部会话的完整快照（日志存储会同时清空日志）"""
         try:
-            data = {
-                'sessions': [asdict(session) for session in self.sessions],
-                'last_updated': datetime.now().isoformat()
-            }
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.storage.save_all([session.to_dict() for session in self.sessions])
         except Exception as e:
             print(f"保存数据失败: {e}")
     
     def start_session(self, task_id: str, task_name: str) -> str:
-        session_id = f"session_{int(time.time())}_{len(self.sessions)}"
+        with self._group.lock:
+            # 序号在共用存储的计算器之间递增；进程号与随机后缀区分共用同一数据库的其他进程/计算器
+            seq = max(self._group.next_seq, len(self.sessions))
+            self._group.next_seq = seq + 1
+        session_id = f"session_{int(time.time())}_{seq}_{os.getpid()}_{uuid.uuid4().hex[:6]}"
         
         self.current_session = FocusSession(
             session_id=session_id,
@@ -86,6 +302,23 @@ class FocusScoreCalculator:
         print(f"  会话ID: {session_id}")
         return session_id
     
+    def resume_session(self, session: Dict) -> str:
+        """
+        以已有的会话表头作为当前会话（例如其他 worker 进程已为同一任务开启的会话）
+        
+        参数:
+            session: 会话表头（FocusSession.to_dict(include_checks=False) 的结果）
+        
+        返回:
+            str: 会话ID
+        """
+        header = {field: session[field] for field in FocusSession.HEADER_FIELDS if field in session}
+        self.current_session = FocusSession.from_dict(header)
+        
+        print(f"✓ 开始专注会话: {self.current_session.task_name}")
+        print(f"  会话ID: {self.current_session.session_id}")
+        return self.current_session.session_id
+    
     def end_session(self) -> Optional[FocusSession]:
         if not self.current_session:
             print("❌ 没有活跃的专注会话")
@@ -102,8 +335,23 @@ class FocusScoreCalculator:
             self.current_session.irrelevant_websites
         )
         
-        self.sessions.append(self.current_session)
-        self.save_data()
+        with self._group.lock:
+            self.sessions.append(self.current_session)
+            try:
+                self.storage.append_session(self.current_session.to_dict(include_checks=False))
+            except Exception as e:
+                print(f"保存数据失败: {e}")
+            # 日志压缩会清空日志，其他客户端未结束会话的检查记录还在日志里，等它们结束后再压缩；
+            # 整文件 JSON 存储只有 save_data 才会写入，必须每次保存
+            if self.storage.needs_compaction() and not (
+                self.storage.compaction_clears_journal and self._group.others_active(self)
+            ):
+                self.save_data()
+            day = add_to_daily(self.daily_buckets, self.current_session.to_dict(include_checks=False))
+            try:
+                self.storage.save_daily(self.daily_buckets, day)
+            except Exception as e:
+                print(f"保存统计数据失败: {e}")
         
         self._print_session_summary(self.current_session)
         
@@ -114,6 +362,10 @@ class FocusScoreCalculator:
     
     def record_website_check(self, website_url: str, is_relevant: bool, 
                            confidence: str = "medium", reason: str = ""):
+        with span("focus"):
+            self._record_website_check(website_url, is_relevant, confidence, reason)
+    
+    def _record_website_check(self, website_url: str, is_relevant: bool, confidence: str, reason: str):
         if not self.current_session:
             print("❌ 没有活跃的专注会话，无法记录网站检查")
             return
@@ -126,7 +378,12 @@ class FocusScoreCalculator:
             "reason": reason
         }
         
-        self.current_session.website_checks.append(check_record)
+        self.current_session.add_check(check_record)
+        try:
+            with span("storage"), self._group.lock:
+                self.storage.append_check(self.current_session.session_id, check_record)
+        except Exception as e:
+            print(f"保存数据失败: {e}")
         
         if is_relevant:
             self.current_session.relevant_websites += 1
@@ -204,32 +461,76 @@ class FocusScoreCalculator:
         }
     
     def get_focus_metrics(self, days: int = 30) -> FocusMetrics:
-        cutoff_time = time.time() - (days * 24 * 60 * 60)
+        """
+        统计最近 days 天内开始的已结束会话
         
-        recent_sessions = [
-            s for s in self.sessions 
-            if s.start_time >= cutoff_time and s.end_time is not None
-        ]
+        完整的日期直接合并按天统计桶；窗口起点所在的那一天只计入起点之后开始的会话，
+        由这些会话单独聚合（不会多算起点之前的部分）
         
-        if not recent_sessions:
-            return FocusMetrics()
+        参数:
+            days: 统计的天数
+        
+        返回:
+            FocusMetrics: 专注度统计
+        """
+        cutoff = time.time() - (days * 24 * 60 * 60)
+        first_day = daily_key(cutoff)
+        first_day_end = (datetime.strptime(first_day, "%Y-%m-%d") + timedelta(days=1)).timestamp()
+        if hasattr(self.storage, "query_daily"):
+            # 共用数据库的其他进程结束的会话也要计入，直接读取数据库中的统计桶与会话
+            buckets = self.storage.query_daily(first_day)
+            partial = self.storage.query_sessions_between(cutoff, first_day_end)
+        else:
+            buckets = self.daily_buckets
+            partial = self._finished_sessions_between(cutoff, first_day_end)
         
-        total_sessions = len(recent_sessions)
-        total_focus_time = sum(s.total_duration for s in recent_sessions)
-        focus_scores = [s.focus_score for s in recent_sessions]
+        buckets = {day: bucket for day, bucket in buckets.items() if day > first_day}
+        first_bucket: Dict[str, Dict] = {}
+        for session in partial:
+            add_to_daily(first_bucket, session)
+        buckets.update(first_bucket)
+        
+        merged = {"sessions": 0, "total_duration": 0.0, "score_sum": 0.0,
+                  "best_score": None, "worst_score": None, "relevant": 0, "irrelevant": 0}
+        for bucket in buckets.values():
+            for field in ("sessions", "total_duration", "score_sum", "relevant", "irrelevant"):
+                merged[field] += bucket[field]
+            merged["best_score"] = bucket["best_score"] if merged["best_score"] is None \
+                else max(merged["best_score"], bucket["best_score"])
+            merged["worst_score"] = bucket["worst_score"] if merged["worst_score"] is None \
+                else min(merged["worst_score"], bucket["worst_score"])
+        
+        if merged["sessions"]:
+            merged["avg_score"] = merged["score_sum"] / merged["sessions"]
+        return self._metrics_from_aggregate(merged)
+    
+    def _finished_sessions_between(self, start: float, end: float) -> List[Dict]:
+        """start（含）到 end（不含）之间开始的已结束会话"""
+        found = []
+        # 会话在结束时追加，按结束时间有序：从后往前找到结束于 start 之前的会话即可停止
+        for session in reversed(self.sessions):
+            if session.end_time is not None and session.end_time < start:
+                break
+            if session.end_time is not None and start <= session.start_time < end:
+                found.append(session.to_dict(include_checks=False))
+        return found
+    
+    @staticmethod
+    def _metrics_from_aggregate(row: Dict) -> FocusMetrics:
+        if not row.get("sessions"):
+            return FocusMetrics()
         
+        relevant = row["relevant"] or 0
+        irrelevant = row["irrelevant"] or 0
         return FocusMetrics(
-            total_sessions=total_sessions,
-            total_focus_time=total_focus_time,
-            average_focus_score=sum(focus_scores) / len(focus_scores),
-            best_focus_score=max(focus_scores),
-            worst_focus_score=min(focus_scores),
-            total_relevant_websites=sum(s.relevant_websites for s in recent_sessions),
-            total_irrelevant_websites=sum(s.irrelevant_websites for s in recent_sessions),
-            focus_efficiency=(
-                sum(s.relevant_websites for s in recent_sessions) / 
-                max(1, sum(s.relevant_websites + s.irrelevant_websites for s in recent_sessions))
-            )
+            total_sessions=row["sessions"],
+            total_focus_time=row["total_duration"] or 0.0,
+            average_focus_score=row["avg_score"],
+            best_focus_score=row["best_score"],
+            worst_focus_score=row["worst_score"],
+            total_relevant_websites=relevant,
+            total_irrelevant_websites=irrelevant,
+            focus_efficiency=relevant / max(1, relevant + irrelevant)
         )
     
     def print_focus_metrics(self, days: int = 30):
@@ -248,12 +549,34 @@ class FocusScoreCalculator:
         print(f"专注效率: {metrics.focus_efficiency * 100:.1f}%")
         print("=" * 70 + "\n")
     
+    def get_session_checks(self, session_id: str) -> List[Dict]:
+        """
+        读取某个会话的网站检查记录（历史会话的检查记录在此时才加载）
+        
+        参数:
+            session_id: 会话ID
+        
+        返回:
+            list: 检查记录字典列表，找不到会话时返回空列表
+        """
+        if self.current_session and self.current_session.session_id == session_id:
+            return self.current_session.website_checks.to_list()
+        for session in self.sessions:
+            if session.session_id == session_id:
+                return session.website_checks.to_list()
+        if hasattr(self.storage, "load_checks"):
+            return self.storage.load_checks(session_id)
+        return []
+    
     def get_session_history(self, limit: int = 10) -> List[Dict]:
-        sorted_sessions = sorted(
-            [s for s in self.sessions if s.end_time is not None],
-            key=lambda x: x.start_time,
-            reverse=True
-        )
+        if hasattr(self.storage, "query_history"):
+            sorted_sessions = [FocusSession.from_dict(row) for row in self.storage.query_history(limit)]
+        else:
+            sorted_sessions = sorted(
+                [s for s in self.sessions if s.end_time is not None],
+                key=lambda x: x.start_time,
+                reverse=True
+            )
         
         return [
             {
@@ -268,7 +591,6 @@ class FocusScoreCalculator:
             for s in sorted_sessions[:limit]
         ]
 
-
 def main():
     print("=" * 70)
     print("专注度计算器演示")
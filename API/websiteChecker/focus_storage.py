@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+专注会话的持久化后端
+- JsonFileStorage: 原有方式，每次会话结束都重写整个 JSON 文件
+- JournalStorage: 追加式日志，每次网站检查、每次会话结束各追加一行，定期压缩为快照
+- SqliteStorage: SQLite（WAL 模式），会话与网站检查分表并建索引，统计与历史直接用 SQL 查询
+
+后端只处理会话字典（与 FocusSession.to_dict() 相同的结构），不依赖 FocusSession 类。
+各后端同时保存按天聚合的统计桶（load_daily/save_daily），供专注度统计直接合并
+"""
+
+import functools
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+
+def _write_snapshot(path: Path, sessions: List[Dict]) -> None:
+    """原子地写入完整快照（先写临时文件再替换，中途崩溃不会损坏旧文件）"""
+    data = {
+        'sessions': sessions,
+        'last_updated': datetime.now().isoformat()
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def daily_key(timestamp: float) -> str:
+    """统计桶的键：会话开始时间所在的本地日期"""
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+
+
+def add_to_daily(buckets: Dict[str, Dict], session: Dict) -> str:
+    """
+    把一个已结束的会话计入对应日期的统计桶
+
+    返回:
+        str: 被更新的日期键
+    """
+    day = daily_key(session['start_time'])
+    bucket = buckets.get(day)
+    if bucket is None:
+        bucket = buckets[day] = {
+            'sessions': 0, 'total_duration': 0.0, 'score_sum': 0.0,
+            'best_score': session['focus_score'], 'worst_score': session['focus_score'],
+            'relevant': 0, 'irrelevant': 0,
+        }
+    bucket['sessions'] += 1
+    bucket['total_duration'] += session['total_duration']
+    bucket['score_sum'] += session['focus_score']
+    bucket['best_score'] = max(bucket['best_score'], session['focus_score'])
+    bucket['worst_score'] = min(bucket['worst_score'], session['focus_score'])
+    bucket['relevant'] += session['relevant_websites']
+    bucket['irrelevant'] += session['irrelevant_websites']
+    return day
+
+
+def _read_snapshot(path: Path) -> List[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('sessions', [])
+    except FileNotFoundError:
+        return []
+
+
+def _checks_file(data_file: Path) -> Path:
+    return data_file.with_name(data_file.name + ".checks.jsonl")
+
+
+def _read_checks(checks_file: Path, ref: List[int]) -> List[Dict]:
+    """按 [偏移, 长度] 读取一个会话的网站检查记录"""
+    offset, length = ref
+    with open(checks_file, 'rb') as f:
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+
+def _inline_checks(data_file: Path, sessions: List[Dict]) -> List[Dict]:
+    """把快照中的 checks_ref 展开为 website_checks（供不做延迟加载的后端读取日志存储的快照）"""
+    for session in sessions:
+        ref = session.pop('checks_ref', None)
+        if ref is not None:
+            session['website_checks'] = _read_checks(_checks_file(data_file), ref)
+    return sessions
+
+
+class _DailySidecar:
+    """统计桶保存在 data_file + ".daily.json"（每天一项，文件很小，整体重写）"""
+
+    data_file: Path
+
+    @property
+    def daily_file(self) -> Path:
+        return self.data_file.with_name(self.data_file.name + ".daily.json")
+
+    def load_daily(self) -> Optional[Dict[str, Dict]]:
+        """返回统计桶；文件不存在或损坏时返回 None（由调用方重建）"""
+        try:
+            with open(self.daily_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('days', {})
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def files(self) -> List[Path]:
+        """该存储会写入的全部文件（包括旁路文件），供清理使用"""
+        return [self.data_file, self.daily_file]
+
+    def save_daily(self, buckets: Dict[str, Dict], day: str = None) -> None:
+        tmp_path = self.daily_file.with_name(self.daily_file.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'days': buckets}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.daily_file)
+
+
+class JsonFileStorage(_DailySidecar):
+    """整文件 JSON 存储（每次会话结束都重写全部历史）"""
+
+    # save_all 只重写快照，不会丢弃其他会话尚未结束的检查记录
+    compaction_clears_journal = False
+
+    def __init__(self, data_file: str):
+        self.data_file = Path(data_file)
+
+    def load(self) -> List[Dict]:
+        return _inline_checks(self.data_file, _read_snapshot(self.data_file))
+
+    def append_check(self, session_id: str, check: Dict) -> None:
+        # 网站检查随会话一起在结束时保存
+        pass
+
+    def append_session(self, session: Dict) -> None:
+        pass
+
+    def needs_compaction(self) -> bool:
+        return True
+
+    def save_all(self, sessions: List[Dict]) -> None:
+        _write_snapshot(self.data_file, sessions)
+
+
+class JournalStorage(_DailySidecar):
+    """
+    追加式日志存储
+
+    data_file 为快照，只保存会话表头，每个会话的网站检查记录以 checks_ref（[偏移, 长度]）
+    指向 data_file + ".checks.jsonl"（每行一个会话的检查列表，只追加不改写）；
+    data_file + ".journal" 为 JSONL 日志：
+        {"type": "check", "session_id": ..., "check": {...}}
+        {"type": "session", "session": {...不含 website_checks 的会话字段}}
+    加载时读取快照再重放日志；日志记录数达到 compact_every 后压缩回快照。
+    快照中会话的检查记录不会在加载时读取，而是附带 checks_loader 按需读取；
+    旧格式（website_checks 内联）的快照可直接读取，下次压缩时迁移
+    """
+
+    # 压缩会清空日志，其中包括未结束会话的检查记录
+    compaction_clears_journal = True
+
+    def __init__(self, data_file: str, compact_every: int = None, fsync: bool = None):
+        """
+        参数:
+            data_file: 快照文件路径
+            compact_every: 日志累计多少条记录后压缩，默认读取 FOCUS_JOURNAL_COMPACT_EVERY，否则 1000
+            fsync: 每次追加后是否 fsync，默认读取 FOCUS_JOURNAL_FSYNC（"1" 开启）
+        """
+        self.data_file = Path(data_file)
+        self.journal_file = self.data_file.with_name(self.data_file.name + ".journal")
+        self.checks_file = _checks_file(self.data_file)
+        self.compact_every = compact_every or int(os.environ.get("FOCUS_JOURNAL_COMPACT_EVERY", "1000"))
+        self.fsync = fsync if fsync is not None else os.environ.get("FOCUS_JOURNAL_FSYNC") == "1"
+        self.journal_records = 0
+        self._check_refs: Dict[str, List[int]] = {}
+
+    def load(self) -> List[Dict]:
+        sessions = _read_snapshot(self.data_file)
+        for session in sessions:
+            ref = session.pop('checks_ref', None)
+            if ref is not None:
+                self._check_refs[session['session_id']] = ref
+                session['checks_loader'] = functools.partial(_read_checks, self.checks_file, ref)
+        known_ids = {s.get('session_id') for s in sessions}
+        pending_checks: Dict[str, List[Dict]] = {}
+        self.journal_records = 0
+
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 崩溃时写了一半的最后一行
+                        continue
+                    self.journal_records += 1
+                    if record.get('type') == 'check':
+                        pending_checks.setdefault(record['session_id'], []).append(record['check'])
+                    elif record.get('type') == 'session':
+                        session = dict(record['session'])
+                        session_id = session.get('session_id')
+                        if session_id in known_ids:
+                            # 压缩写完快照但未清空日志时的重复记录
+                            continue
+                        session['website_checks'] = pending_checks.pop(session_id, [])
+                        sessions.append(session)
+                        known_ids.add(session_id)
+        except FileNotFoundError:
+            pass
+
+        # 未结束会话（进程中途退出）的检查记录不会恢复，与原有行为一致
+        return sessions
+
+    def append_check(self, session_id: str, check: Dict) -> None:
+        self._append({"type": "check", "session_id": session_id, "check": check})
+
+    def append_session(self, session: Dict) -> None:
+        header = {k: v for k, v in session.items() if k != 'website_checks'}
+        self._append({"type": "session", "session": header})
+
+    def needs_compaction(self) -> bool:
+        return self.journal_records >= self.compact_every
+
+    def files(self) -> List[Path]:
+        return [self.data_file, self.journal_file, self.checks_file, self.daily_file]
+
+    def save_all(self, sessions: List[Dict]) -> None:
+        """
+        写入快照并清空日志
+
+        尚未写入 .checks.jsonl 的会话检查记录先追加过去，已有 checks_ref 的会话不重写
+        （会话结束后检查记录不再变化），因此未加载检查记录的会话可以不带 website_checks
+        """
+        headers = []
+        with open(self.checks_file, 'ab') as f:
+            for session in sessions:
+                header = {k: v for k, v in session.items() if k != 'website_checks'}
+                ref = self._check_refs.get(session['session_id'])
+                if ref is None and session.get('website_checks'):
+                    data = (json.dumps(session['website_checks'], ensure_ascii=False) + "\n").encode('utf-8')
+                    ref = [f.tell(), len(data)]
+                    f.write(data)
+                    self._check_refs[session['session_id']] = ref
+                if ref is not None:
+                    header['checks_ref'] = ref
+                headers.append(header)
+            f.flush()
+            os.fsync(f.fileno())
+
+        _write_snapshot(self.data_file, headers)
+        with open(self.journal_file, 'w', encoding='utf-8'):
+            pass
+        self.journal_records = 0
+
+    def _append(self, record: Dict) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.journal_records += 1
+
+
+_SESSION_COLUMNS = (
+    "session_id", "task_id", "task_name", "start_time", "end_time", "total_duration",
+    "relevant_websites", "irrelevant_websites", "focus_score",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    task_id TEXT,
+    task_name TEXT,
+    start_time REAL NOT NULL,
+    end_time REAL,
+    total_duration REAL DEFAULT 0,
+    relevant_websites INTEGER DEFAULT 0,
+    irrelevant_websites INTEGER DEFAULT 0,
+    focus_score REAL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON sessions(start_time);
+CREATE INDEX IF NOT EXISTS idx_sessions_task_id ON sessions(task_id);
+CREATE TABLE IF NOT EXISTS website_checks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    timestamp TEXT,
+    website_url TEXT,
+    domain TEXT,
+    is_relevant INTEGER,
+    confidence TEXT,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_checks_session_id ON website_checks(session_id);
+CREATE INDEX IF NOT EXISTS idx_checks_domain ON website_checks(domain);
+CREATE TABLE IF NOT EXISTS daily_metrics (
+    day TEXT PRIMARY KEY,
+    sessions INTEGER,
+    total_duration REAL,
+    score_sum REAL,
+    best_score REAL,
+    worst_score REAL,
+    relevant INTEGER,
+    irrelevant INTEGER
+);
+"""
+
+_DAILY_COLUMNS = (
+    "sessions", "total_duration", "score_sum", "best_score", "worst_score", "relevant", "irrelevant",
+)
+
+
+def _domain_of(url: str) -> str:
+    host = (urlparse(url if "//" in url else "//" + url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class SqliteStorage:
+    """
+    SQLite 存储（WAL 模式）
+
+    网站检查实时写入 website_checks 表，会话在结束时写入 sessions 表。
+    load() 不把历史读入内存，统计与历史通过 query_* 方法走索引查询。
+    新建数据库时若存在旧的 JSON 快照，会自动导入
+    """
+
+    compaction_clears_journal = False
+
+    def __init__(self, data_file: str, db_file: str = None):
+        """
+        参数:
+            data_file: 原 JSON 数据文件路径（用于推导数据库路径与导入旧数据）
+            db_file: 数据库路径，默认把 data_file 的扩展名换成 .db
+        """
+        self.data_file = Path(data_file)
+        self.db_file = Path(db_file) if db_file else self.data_file.with_suffix(".db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def load(self) -> List[Dict]:
+        with self._lock, self._conn:
+            empty = self._conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None
+            if empty and self.data_file.exists():
+                for session in _inline_checks(self.data_file, _read_snapshot(self.data_file)):
+                    self._upsert_session(session)
+                    for check in session.get('website_checks') or []:
+                        self._insert_check(session['session_id'], check)
+        return []
+
+    def append_check(self, session_id: str, check: Dict) -> None:
+        with self._lock, self._conn:
+            self._insert_check(session_id, check)
+
+    def append_session(self, session: Dict) -> None:
+        with self._lock, self._conn:
+            self._upsert_session(session)
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    def files(self) -> List[Path]:
+        """数据库文件及其 WAL 旁路文件（导入来源 data_file 不属于本存储）"""
+        return [self.db_file] + [self.db_file.with_name(self.db_file.name + suffix) for suffix in ("-wal", "-shm")]
+
+    def save_all(self, sessions: List[Dict]) -> None:
+        """写入会话表头（网站检查已在 append_check 时写入）"""
+        with self._lock, self._conn:
+            for session in sessions:
+                self._upsert_session(session)
+
+    def load_daily(self) -> Dict[str, Dict]:
+        """读取统计桶；与 sessions 表不一致（如写入会话后崩溃）时用 SQL 重建"""
+        with self._lock, self._conn:
+            bucketed = self._conn.execute("SELECT SUM(sessions) FROM daily_metrics").fetchone()[0] or 0
+            finished = self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE end_time IS NOT NULL"
+            ).fetchone()[0]
+            if bucketed != finished:
+                self._rebuild_daily()
+        return self.query_daily()
+
+    def save_daily(self, buckets: Dict[str, Dict], day: str = None) -> None:
+        """
+        从 sessions 表重新计算统计桶（指定 day 时只算这一天）
+
+        多个进程共用数据库时各自内存中的统计桶只包含本进程结束的会话，不能直接写入；
+        在同一事务内按 sessions 表重算，并把结果写回 buckets
+        """
+        with self._lock, self._conn:
+            self._rebuild_daily(day)
+            rows = self._daily_rows("WHERE day = ?" if day is not None else "", (day,) if day is not None else ())
+        buckets.update(rows)
+
+    def query_daily(self, first_day: str = None) -> Dict[str, Dict]:
+        """读取 first_day（含）之后的统计桶，None 表示全部"""
+        with self._lock:
+            if first_day is None:
+                return self._daily_rows("", ())
+            return self._daily_rows("WHERE day >= ?", (first_day,))
+
+    def _daily_rows(self, clause: str, params: tuple) -> Dict[str, Dict]:
+        rows = self._conn.execute(
+            f"SELECT day, {', '.join(_DAILY_COLUMNS)} FROM daily_metrics {clause}", params
+        ).fetchall()
+        return {row["day"]: {column: row[column] for column in _DAILY_COLUMNS} for row in rows}
+
+    def _rebuild_daily(self, day: str = None) -> None:
+        """按 sessions 表重建统计桶（调用方持有锁并处于事务中）"""
+        day_expr = "date(start_time, 'unixepoch', 'localtime')"
+        if day is None:
+            self._conn.execute("DELETE FROM daily_metrics")
+            where, params = "", ()
+        else:
+            self._conn.execute("DELETE FROM daily_metrics WHERE day = ?", (day,))
+            where, params = f"AND {day_expr} = ?", (day,)
+        self._conn.execute(
+            "INSERT INTO daily_metrics (day, sessions, total_duration, score_sum, "
+            "best_score, worst_score, relevant, irrelevant) "
+            f"SELECT {day_expr}, COUNT(*), "
+            "SUM(total_duration), SUM(focus_score), MAX(focus_score), MIN(focus_score), "
+            "SUM(relevant_websites), SUM(irrelevant_websites) "
+            f"FROM sessions WHERE end_time IS NOT NULL {where} GROUP BY 1",
+            params,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ---- 查询 ----
+
+    def query_history(self, limit: int = 10) -> List[Dict]:
+        """按开始时间倒序返回最近 limit 个已结束会话（不含网站检查）"""
+        return self._query_sessions(
+            "WHERE end_time IS NOT NULL ORDER BY start_time DESC LIMIT ?", (limit,)
+        )
+
+    def query_sessions_between(self, start: float, end: float) -> List[Dict]:
+        """返回 start（含）到 end（不含）之间开始的已结束会话（不含网站检查）"""
+        return self._query_sessions(
+            "WHERE end_time IS NOT NULL AND start_time >= ? AND start_time < ?", (start, end)
+        )
+
+    def query_task_sessions(self, task_id: str) -> List[Dict]:
+        """返回某个任务的全部会话（不含网站检查）"""
+        return self._query_sessions("WHERE task_id = ? ORDER BY start_time", (task_id,))
+
+    def query_domains(self, limit: int = 10) -> List[Dict]:
+        """返回检查次数最多的域名及其相关/无关次数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT domain, COUNT(*) AS checks, SUM(is_relevant) AS relevant "
+                "FROM website_checks GROUP BY domain ORDER BY checks DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {"domain": row["domain"], "checks": row["checks"],
+             "relevant": row["relevant"], "irrelevant": row["checks"] - row["relevant"]}
+            for row in rows
+        ]
+
+    def load_checks(self, session_id: str) -> List[Dict]:
+        """读取某个会话的网站检查记录"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT timestamp, website_url, is_relevant, confidence, reason "
+                "FROM website_checks WHERE session_id = ? ORDER BY id",
+                (session_id,),
+            ).fetchall()
+        return [dict(row, is_relevant=bool(row["is_relevant"])) for row in rows]
+
+    def _query_sessions(self, clause: str, params: tuple) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_SESSION_COLUMNS)} FROM sessions {clause}", params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _insert_check(self, session_id: str, check: Dict) -> None:
+        url = check.get('website_url', '')
+        self._conn.execute(
+            "INSERT INTO website_checks (session_id, timestamp, website_url, domain, "
+            "is_relevant, confidence, reason) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (session_id, check.get('timestamp'), url, _domain_of(url),
+             1 if check.get('is_relevant') else 0, check.get('confidence'), check.get('reason')),
+        )
+
+    def _upsert_session(self, session: Dict) -> None:
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO sessions ({', '.join(_SESSION_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _SESSION_COLUMNS)})",
+            tuple(session.get(column) for column in _SESSION_COLUMNS),
+        )
+
+
+STORAGE_BACKENDS = {
+    "json": JsonFileStorage,
+    "journal": JournalStorage,
+    "sqlite": SqliteStorage,
+}
+
+
+def create_storage(data_file: str, backend: str = None):
+    """
+    按名称创建存储后端
+
+    参数:
+        data_file: 数据文件路径
+        backend: 后端名称（journal/json/sqlite），默认读取 FOCUS_STORAGE，否则为 "journal"
+    """
+    backend = backend or os.environ.get("FOCUS_STORAGE", "journal")
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"未知的存储后端: {backend}（可选: {', '.join(STORAGE_BACKENDS)}）")
+    return STORAGE_BACKENDS[backend](data_file)
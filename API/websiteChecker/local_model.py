@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+本地相关性模型（纯 Python，无需网络与第三方依赖）
+- 特征：URL 主机名/路径、网页标题、任务文本的分词，以及“任务词 × 网站词”的交叉特征，
+  经 CRC32 哈希到固定维度（hashing trick）
+- 模型：逻辑回归（SGD + L2），用 logs/classification_results.jsonl 中的 LLM 判定训练
+- 只有概率足够确定（>= threshold）且主机名在训练数据中出现过时才给出判定，否则交给 LLM
+
+用法：
+    python3 local_model.py train                       # 训练并保存到 local_model.json
+    python3 local_model.py train --holdout 0.2         # 留出 20% 评估覆盖率与准确率
+    python3 local_model.py predict "写数学作业" https://www.youtube.com
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from log_segments import read_range
+from verdict_cache import canonicalize_url
+
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_MODEL_FILE = os.environ.get("WEBCHECKER_LOCAL_MODEL", str(BASE_DIR / "local_model.json"))
+DEFAULT_RESULT_LOG = BASE_DIR / "logs" / "classification_results.jsonl"
+# 概率（或 1 - 概率）不低于该值时才直接给出判定
+DEFAULT_THRESHOLD = float(os.environ.get("WEBCHECKER_LOCAL_MODEL_THRESHOLD", "0.9"))
+# 概率不低于该值时置信度为 high，否则为 medium
+HIGH_CONFIDENCE = 0.97
+DEFAULT_DIM = 1 << 18
+# 训练数据少于该条数时不保存模型
+MIN_EXAMPLES = 50
+
+# 本地模型给出的判定在结果中的来源标记，训练时跳过这些记录，避免模型学习自己的输出
+SOURCE = "local_model"
+
+_ASCII_RE = re.compile(r"[a-z0-9]+")
+_CJK_RE = re.compile(r"[一-鿿]+")
+_TASK_PREFIX_RE = re.compile(r"^\s*任务\s*[:：]\s*")
+# 主机名中不区分网站的部分
+_HOST_STOPWORDS = {"www", "m", "com", "org", "net", "cn", "io", "edu", "gov", "co", "html", "htm", "php"}
+_MAX_TASK_TOKENS = 16
+_MAX_SITE_TOKENS = 16
+
+
+def tokenize(text: str) -> List[str]:
+    """分词：英文/数字按单词，连续汉字按相邻两字（单个汉字保留本身），保持出现顺序并去重"""
+    text = (text or "").lower()
+    tokens = [t for t in _ASCII_RE.findall(text) if len(t) > 1]
+    for run in _CJK_RE.findall(text):
+        tokens.extend([run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)])
+    return list(dict.fromkeys(tokens))
+
+
+def task_text(task_description: str) -> str:
+    """从监控器的任务描述（“任务: xxx\\n相关资源: ...”）中取任务名"""
+    first_line = (task_description or "").strip().splitlines()[0] if (task_description or "").strip() else ""
+    return _TASK_PREFIX_RE.sub("", first_line)
+
+
+def site_host(url: str) -> str:
+    canonical = canonicalize_url(url)
+    return (urlsplit(canonical).hostname or "") if canonical else ""
+
+
+def extract_features(task: str, url: str, title: Optional[str] = None) -> List[str]:
+    """
+    生成特征名列表（哈希前）
+
+    参数:
+        task: 任务名（或监控器的任务描述）
+        url: 网站 URL
+        title: 网页标题 / 网站描述（可选）
+    """
+    canonical = canonicalize_url(url)
+    parts = urlsplit(canonical) if canonical else None
+    host = (parts.hostname or "") if parts else ""
+    labels = [label for label in host.split(".") if label and label not in _HOST_STOPWORDS]
+    path_tokens = [t for t in tokenize(parts.path if parts else "") if t not in _HOST_STOPWORDS][:8]
+
+    site = [f"h={host}"] + [f"d={label}" for label in labels]
+    site += [f"p={t}" for t in path_tokens]
+    site += [f"t={t}" for t in tokenize(title or "")][:_MAX_SITE_TOKENS]
+
+    features = ["bias_site"] + site
+    for task_token in tokenize(task_text(task))[:_MAX_TASK_TOKENS]:
+        features.append(f"k={task_token}")
+        features.extend(f"x={task_token}|{s}" for s in site[:_MAX_SITE_TOKENS])
+    return features
+
+
+def _hash(feature: str, dim: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) & (dim - 1)
+
+
+def _sigmoid(z: float) -> float:
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+
+Example = Tuple[str, str, Optional[str], bool]
+
+
+def load_examples(result_log: Path = None, days: float = None) -> List[Example]:
+    """
+    从判定日志读取训练样本
+
+    跳过出错的判定与本地模型自己给出的判定
+
+    参数:
+        result_log: classification_results.jsonl 路径（包含已轮转的段）
+        days: 只取最近若干天，None 表示全部
+
+    返回:
+        list: (任务名, url, 标题, 是否相关) 列表
+    """
+    start = datetime.utcnow() - timedelta(days=days) if days else None
+    examples = []
+    for record in read_range(result_log or DEFAULT_RESULT_LOG, start=start):
+        task = (record.get("task") or {}).get("name")
+        website = record.get("website") or {}
+        result = record.get("result") or {}
+        if not task or not website.get("url") or "is_relevant" not in result:
+            continue
+        if result.get("action") == "error" or result.get("source") == SOURCE:
+            continue
+        examples.append((task, website["url"], website.get("title") or None, bool(result["is_relevant"])))
+    return examples
+
+
+class LocalRelevanceModel:
+    """哈希特征 + 逻辑回归的相关性判定模型（预测线程安全）"""
+
+    def __init__(self, dim: int = DEFAULT_DIM, threshold: float = None):
+        """
+        参数:
+            dim: 哈希维度（2 的幂）
+            threshold: 直接给出判定所需的最低概率，默认 WEBCHECKER_LOCAL_MODEL_THRESHOLD 或 0.9
+        """
+        self.dim = dim
+        self.threshold = threshold if threshold is not None else DEFAULT_THRESHOLD
+        self.weights: Dict[int, float] = {}
+        self.bias = 0.0
+        self.known_hosts = set()
+        self.trained_on = 0
+
+        self._lock = threading.Lock()
+        self.decisions = 0
+        self.abstentions = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["LocalRelevanceModel"]:
+        """加载 WEBCHECKER_LOCAL_MODEL（默认 local_model.json），文件不存在或损坏时返回 None"""
+        model_file = Path(DEFAULT_MODEL_FILE)
+        if not model_file.exists():
+            return None
+        try:
+            return cls.load(model_file)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARN] 加载本地模型失败，判定全部交给 LLM: {e}")
+            return None
+
+    def _vector(self, task: str, url: str, title: Optional[str]) -> List[int]:
+        return list({_hash(f, self.dim) for f in extract_features(task, url, title)})
+
+    def _score(self, indices: Sequence[int]) -> float:
+        scale = 1.0 / math.sqrt(len(indices)) if indices else 0.0
+        return self.bias + scale * sum(self.weights.get(i, 0.0) for i in indices)
+
+    def fit(self, examples: Sequence[Example], epochs: int = 10, learning_rate: float = 0.5,
+            l2: float = 1e-5, seed: int = 0) -> Dict:
+        """
+        训练（覆盖已有参数）
+
+        参数:
+            examples: (任务, url, 标题, 是否相关) 列表
+            epochs: 训练轮数
+            learning_rate: 初始学习率（按轮次衰减）
+            l2: L2 正则系数
+            seed: 打乱样本的随机种子
+
+        返回:
+            dict: {"examples", "train_accuracy"}
+        """
+        data = [(self._vector(task, url, title), 1.0 if label else 0.0) for task, url, title, label in examples]
+        self.weights, self.bias = {}, 0.0
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1.0 + epoch)
+            for indices, label in data:
+                gradient = _sigmoid(self._score(indices)) - label
+                scale = 1.0 / math.sqrt(len(indices))
+                for i in indices:
+                    w = self.weights.get(i, 0.0)
+                    self.weights[i] = w - rate * (gradient * scale + l2 * w)
+                self.bias -= rate * gradient * 0.1
+
+        self.known_hosts = {site_host(url) for _, url, _, _ in examples} - {""}
+        self.trained_on = len(data)
+        correct = sum(1 for indices, label in data if (_sigmoid(self._score(indices)) >= 0.5) == (label == 1.0))
+        return {"examples": len(data), "train_accuracy": correct / len(data) if data else 0.0}
+
+    def predict_proba(self, task: str, url: str, title: Optional[str] = None) -> Optional[float]:
+        """
+        相关的概率
+
+        返回:
+            float: 概率；模型未训练或主机名在训练数据中未出现过时返回 None
+        """
+        if not self.trained_on or site_host(url) not in self.known_hosts:
+            return None
+        return _sigmoid(self._score(self._vector(task, url, title)))
+
+    def classify(self, task: str, url: str, title: Optional[str] = None) -> Optional[Dict]:
+        """
+        足够确定时给出判定
+
+        返回:
+            dict: 与 check_website 相同格式的结果（附 "source": "local_model"），不确定时返回 None
+        """
+        probability = self.predict_proba(task, url, title)
+        certainty = None if probability is None else max(probability, 1.0 - probability)
+        with self._lock:
+            if certainty is None or certainty < self.threshold:
+                self.abstentions += 1
+                return None
+            self.decisions += 1
+        is_relevant = probability >= 0.5
+        return {
+            "is_relevant": is_relevant,
+            "action": "allow" if is_relevant else "block",
+            "reason": f"本地模型判定（{'相关' if is_relevant else '不相关'}概率 {certainty:.2f}）",
+            "confidence": "high" if certainty >= HIGH_CONFIDENCE else "medium",
+            "source": SOURCE,
+        }
+
+    def evaluate(self, examples: Sequence[Example]) -> Dict:
+        """
+        评估：覆盖率（直接给出判定的比例）与这些判定的准确率
+
+        返回:
+            dict: {"examples", "covered", "coverage", "accuracy"}
+        """
+        covered = correct = 0
+        for task, url, title, label in examples:
+            probability = self.predict_proba(task, url, title)
+            if probability is None or max(probability, 1.0 - probability) < self.threshold:
+                continue
+            covered += 1
+            correct += (probability >= 0.5) == label
+        return {
+            "examples": len(examples),
+            "covered": covered,
+            "coverage": covered / len(examples) if examples else 0.0,
+            "accuracy": correct / covered if covered else 0.0,
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.decisions + self.abstentions
+            return {
+                "trained_on": self.trained_on,
+                "threshold": self.threshold,
+                "decisions": self.decisions,
+                "abstentions": self.abstentions,
+                "coverage": self.decisions / total if total else 0.0,
+            }
+
+    def save(self, model_file: str = None) -> None:
+        path = Path(model_file or DEFAULT_MODEL_FILE)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": 1,
+                "dim": self.dim,
+                "bias": self.bias,
+                "weights": {str(i): round(w, 6) for i, w in self.weights.items() if abs(w) > 1e-6},
+                "known_hosts": sorted(self.known_hosts),
+                "trained_on": self.trained_on,
+                "trained_at": datetime.now().isoformat(),
+            }, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, model_file: str, threshold: float = None) -> "LocalRelevanceModel":
+        with open(model_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        model = cls(dim=int(data["dim"]), threshold=threshold)
+        model.bias = float(data["bias"])
+        model.weights = {int(i): float(w) for i, w in data["weights"].items()}
+        model.known_hosts = set(data.get("known_hosts", []))
+        model.trained_on = int(data.get("trained_on", 0))
+        return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练 / 使用本地相关性模型")
+    sub = parser.add_subparsers(dest="command")
+
+    train_parser = sub.add_parser("train", help="用判定日志训练模型")
+    train_parser.add_argument("--log", default=str(DEFAULT_RESULT_LOG), help="判定日志路径")
+    train_parser.add_argument("--out", default=DEFAULT_MODEL_FILE, help="模型保存路径")
+    train_parser.add_argument("--days", type=float, help="只用最近若干天的记录")
+    train_parser.add_argument("--holdout", type=float, default=0.0, help="留作评估的比例（0~1）")
+    train_parser.add_argument("--threshold", type=float, help="评估时使用的概率阈值")
+
+    predict_parser = sub.add_parser("predict", help="用已保存的模型判定一个网站")
+    predict_parser.add_argument("task", help="任务名")
+    predict_parser.add_argument("url", help="网站URL")
+    predict_parser.add_argument("--title", help="网页标题")
+    predict_parser.add_argument("--model", default=DEFAULT_MODEL_FILE, help="模型路径")
+
+    args = parser.parse_args()
+    if args.command == "train":
+        examples = load_examples(Path(args.log), args.days)
+        if len(examples) < MIN_EXAMPLES:
+            print(f"❌ 训练样本不足（{len(examples)} < {MIN_EXAMPLES}），先积累更多判定记录")
+            return
+        random.Random(0).shuffle(examples)
+        split = int(len(examples) * (1.0 - min(max(args.holdout, 0.0), 0.9)))
+        model = LocalRelevanceModel(threshold=args.threshold)
+        report = model.fit(examples[:split])
+        print(f"✓ 训练样本 {report['examples']} 条，训练集准确率 {report['train_accuracy'] * 100:.1f}%")
+        if split < len(examples):
+            evaluation = model.evaluate(examples[split:])
+            print(f"  留出集 {evaluation['examples']} 条：覆盖率 {evaluation['coverage'] * 100:.1f}%，"
+                  f"准确率 {evaluation['accuracy'] * 100:.1f}%（阈值 {model.threshold}）")
+        model.save(args.out)
+        print(f"✓ 模型已保存到 {args.out}")
+    elif args.command == "predict":
+        model = LocalRelevanceModel.load(args.model)
+        probability = model.predict_proba(args.task, args.url, args.title)
+        if probability is None:
+            print("主机名未在训练数据中出现过，交给 LLM 判定")
+            return
+        result = model.classify(args.task, args.url, args.title)
+        print(f"相关概率: {probability:.3f}")
+        print(json.dumps(result, ensure_ascii=False) if result else f"不够确定（阈值 {model.threshold}），交给 LLM 判定")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
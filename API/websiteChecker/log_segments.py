@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+分段轮转的 JSONL 日志
+- 当前段始终写在原路径（如 logs/classification_results.jsonl），按大小或时间轮转
+- 关闭的段压缩为 <stem>.<时间>.jsonl.gz（安装了 zstandard 时可选 .jsonl.zst），
+  每 N 条记录单独压缩为一个 gzip 成员 / zstd 帧，整体仍可用 zcat 读取
+- 每个关闭的段旁边有 .idx.json 索引：首/末时间戳与每个块的偏移、长度、时间范围
+- read_range() 按时间范围读取，只解压时间上有交集的段和块
+- 多个 worker 进程写同一日志时，追加与轮转都在 <路径>.lock 的文件锁内进行，
+  并以文件的实际大小判断是否轮转（不支持 fcntl 的平台不加锁）
+"""
+
+import gzip
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import zstandard
+    _has_zstd = True
+except ImportError:
+    zstandard = None
+    _has_zstd = False
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+DEFAULT_SEGMENT_BYTES = int(os.environ.get("WEBCHECKER_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# 按时间轮转的间隔（秒），0 表示只按大小轮转
+DEFAULT_SEGMENT_SECONDS = float(os.environ.get("WEBCHECKER_LOG_SEGMENT_SECONDS", "0"))
+DEFAULT_BLOCK_RECORDS = int(os.environ.get("WEBCHECKER_LOG_BLOCK_RECORDS", "1000"))
+DEFAULT_COMPRESSION = os.environ.get("WEBCHECKER_LOG_COMPRESSION", "gzip")
+
+# 记录中作为时间戳的字段（按顺序取第一个存在的）
+TIME_FIELDS = ("timestamp", "received_at")
+
+_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def record_time(record: Dict) -> Optional[str]:
+    """取记录的 ISO 时间戳"""
+    for field in TIME_FIELDS:
+        value = record.get(field)
+        if value:
+            return value
+    return None
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def _decompress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        if not _has_zstd:
+            raise RuntimeError("读取 .zst 日志段需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _to_iso(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        value = datetime.fromtimestamp(value, tz=timezone.utc)
+    if value.tzinfo is not None:
+        # 日志中的时间为不带时区的 UTC（datetime.utcnow）
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+class SegmentedLog:
+    """单个 JSONL 日志的分段写入（每个进程只应由一个写入线程调用，多进程之间用文件锁互斥）"""
+
+    def __init__(self, path: Path, max_bytes: int = None, max_age: float = None,
+                 block_records: int = None, compression: str = None):
+        """
+        参数:
+            path: 当前段路径
+            max_bytes: 当前段超过该大小时轮转，默认 WEBCHECKER_LOG_SEGMENT_BYTES 或 64MB
+            max_age: 当前段存在超过该秒数时轮转，默认 WEBCHECKER_LOG_SEGMENT_SECONDS，0 表示不按时间
+            block_records: 压缩块的记录数（也是索引粒度），默认 WEBCHECKER_LOG_BLOCK_RECORDS 或 1000
+            compression: "gzip" 或 "zstd"（需安装 zstandard，否则退回 gzip）
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_SEGMENT_BYTES
+        self.max_age = max_age if max_age is not None else DEFAULT_SEGMENT_SECONDS
+        self.block_records = max(1, block_records or DEFAULT_BLOCK_RECORDS)
+        compression = compression or DEFAULT_COMPRESSION
+        if compression == "zstd" and not _has_zstd:
+            print("[WARN] 未安装 zstandard，日志段改用 gzip 压缩")
+            compression = "gzip"
+        self.compression = compression
+
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        self._size = 0
+        self._opened_at = None
+        # 当前段的 inode，变化说明已被其他进程轮转
+        self._inode = None
+        try:
+            self._observe(self.path.stat())
+        except FileNotFoundError:
+            pass
+        self.rotations = 0
+
+    def append(self, lines: Sequence[str], fsync: bool = False) -> None:
+        """追加若干行（每行以换行结尾），写入前按需轮转"""
+        data = "".join(lines).encode("utf-8")
+        closed = None
+        with self._locked():
+            f = open(self.path, "ab")
+            try:
+                self._observe(os.fstat(f.fileno()))
+                if self._should_rotate():
+                    f.close()
+                    closed = self._detach()
+                    f = open(self.path, "ab")
+                    self._observe(os.fstat(f.fileno()))
+                f.write(data)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                f.close()
+            self._size += len(data)
+            if self._opened_at is None:
+                self._opened_at = time.time()
+        if closed is not None:
+            self._close_segment(closed)
+
+    def rotate(self) -> Optional[Path]:
+        """
+        关闭当前段：压缩为独立块并写入索引，原路径重新开始
+
+        返回:
+            Path: 压缩后的段文件，当前段为空时返回 None
+        """
+        with self._locked():
+            try:
+                self._observe(self.path.stat())
+            except FileNotFoundError:
+                self._size = 0
+            closed = self._detach()
+        if closed is None:
+            return None
+        return self._close_segment(closed)
+
+    @contextmanager
+    def _locked(self):
+        """持有日志的跨进程文件锁"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _observe(self, stat: os.stat_result) -> None:
+        """以当前段的实际状态为准（其他进程可能已追加或轮转）"""
+        if stat.st_ino != self._inode:
+            self._inode = stat.st_ino
+            # 无法得知当前段的创建时间，以最后修改时间近似
+            self._opened_at = stat.st_mtime if stat.st_size else None
+        self._size = stat.st_size
+        if not self._size:
+            self._opened_at = None
+
+    def _detach(self) -> Optional[Path]:
+        """把当前段改名移开（需持有锁），当前段为空时返回 None"""
+        if not self._size:
+            return None
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        closed = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        os.replace(self.path, closed)
+        self._size = 0
+        self._opened_at = None
+        self._inode = None
+        return closed
+
+    def _close_segment(self, closed: Path) -> Path:
+        """压缩已移开的段并写入索引（不需要持有锁）"""
+        segment = closed.with_name(closed.name + _SUFFIXES[self.compression])
+        self._compress_segment(closed, segment)
+        closed.unlink()
+        self.rotations += 1
+        return segment
+
+    def _should_rotate(self) -> bool:
+        if not self._size:
+            return False
+        if self.max_bytes and self._size >= self.max_bytes:
+            return True
+        return bool(self.max_age and self._opened_at is not None
+                    and time.time() - self._opened_at >= self.max_age)
+
+    def _compress_segment(self, source: Path, segment: Path) -> None:
+        blocks: List[Dict] = []
+        tmp_segment = segment.with_name(segment.name + ".tmp")
+        with open(source, "rb") as src, open(tmp_segment, "wb") as dst:
+            batch: List[bytes] = []
+            for line in src:
+                if line.strip():
+                    batch.append(line)
+                if len(batch) >= self.block_records:
+                    blocks.append(self._write_block(dst, batch))
+                    batch = []
+            if batch:
+                blocks.append(self._write_block(dst, batch))
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        times = [t for b in blocks for t in (b["first_ts"], b["last_ts"]) if t]
+        index = {
+            "compression": self.compression,
+            "records": sum(b["records"] for b in blocks),
+            "first_ts": min(times) if times else None,
+            "last_ts": max(times) if times else None,
+            "blocks": blocks,
+        }
+        idx_tmp = segment.with_name(segment.name + ".idx.json.tmp")
+        with open(idx_tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_segment, segment)
+        os.replace(idx_tmp, segment.with_name(segment.name + ".idx.json"))
+
+    def _write_block(self, dst, lines: List[bytes]) -> Dict:
+        times = []
+        for line in lines:
+            try:
+                ts = record_time(json.loads(line))
+            except ValueError:
+                ts = None
+            if ts:
+                times.append(ts)
+        payload = _compress(b"".join(lines), self.compression)
+        offset = dst.tell()
+        dst.write(payload)
+        return {
+            "offset": offset,
+            "length": len(payload),
+            "records": len(lines),
+            "first_ts": min(times) if times else None,
+            "last_ts": max(times) if times else None,
+        }
+
+
+def list_segments(path: Path) -> List[Dict]:
+    """
+    列出某个日志已关闭的段（按首条时间排序）
+
+    返回:
+        list: 每项为索引内容，另含 "path"
+    """
+    path = Path(path)
+    segments = []
+    for idx_file in path.parent.glob(f"{path.stem}.*{path.suffix}.*.idx.json"):
+        try:
+            with open(idx_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            continue
+        index["path"] = idx_file.with_name(idx_file.name[:-len(".idx.json")])
+        segments.append(index)
+    segments.sort(key=lambda s: (s.get("first_ts") or "", str(s["path"])))
+    return segments
+
+
+def _overlaps(first: Optional[str], last: Optional[str], start: Optional[str], end: Optional[str]) -> bool:
+    if first is None or last is None:
+        # 没有时间戳的块无法判断，只能读取
+        return True
+    if start is not None and last < start:
+        return False
+    if end is not None and first > end:
+        return False
+    return True
+
+
+def _in_range(record: Dict, start: Optional[str], end: Optional[str]) -> bool:
+    if start is None and end is None:
+        return True
+    ts = record_time(record)
+    if ts is None:
+        return False
+    return (start is None or ts >= start) and (end is None or ts <= end)
+
+
+def _parse_lines(lines: Iterable[bytes]) -> Iterator[Dict]:
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def read_range(path: Path, start=None, end=None) -> Iterator[Dict]:
+    """
+    按时间范围读取日志记录（包含已关闭的压缩段与当前段）
+
+    参数:
+        path: 日志路径（当前段路径）
+        start: 起始时间（含），ISO 字符串 / datetime / Unix 时间戳，None 表示不限
+        end: 结束时间（含），同上
+
+    返回:
+        Iterator[dict]: 按段的先后顺序产出记录
+    """
+    path = Path(path)
+    start, end = _to_iso(start), _to_iso(end)
+
+    for segment in list_segments(path):
+        if not _overlaps(segment.get("first_ts"), segment.get("last_ts"), start, end):
+            continue
+        compression = segment.get("compression", "gzip")
+        with open(segment["path"], "rb") as f:
+            for block in segment["blocks"]:
+                if not _overlaps(block.get("first_ts"), block.get("last_ts"), start, end):
+                    continue
+                f.seek(block["offset"])
+                data = _decompress(f.read(block["length"]), compression)
+                for record in _parse_lines(data.splitlines()):
+                    if _in_range(record, start, end):
+                        yield record
+
+    try:
+        with open(path, "rb") as f:
+            for record in _parse_lines(f):
+                if _in_range(record, start, end):
+                    yield record
+    except FileNotFoundError:
+        return
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+后台 JSONL 日志写入器
+- 请求线程只把序列化好的行放入有界队列，不再打开/写入文件
+- 后台线程批量写入（每个文件每批只打开一次），可配置刷新间隔与 fsync 策略
+- 队列满时丢弃并计数，磁盘变慢不会拖住请求；进程退出时自动刷新
+- 每个文件经 SegmentedLog 写入，按大小/时间轮转并压缩关闭的段（见 log_segments.py）
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from log_segments import SegmentedLog
+from metrics import LOG_WRITE_LATENCY, record_error
+
+
+DEFAULT_QUEUE_SIZE = int(os.environ.get("WEBCHECKER_LOG_QUEUE", "10000"))
+DEFAULT_BATCH_SIZE = int(os.environ.get("WEBCHECKER_LOG_BATCH", "256"))
+DEFAULT_FLUSH_INTERVAL = float(os.environ.get("WEBCHECKER_LOG_FLUSH_INTERVAL", "0.5"))
+# none: 交给操作系统；batch: 每批写入后 fsync
+DEFAULT_FSYNC = os.environ.get("WEBCHECKER_LOG_FSYNC", "none")
+
+
+class _FlushMarker:
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class LogWriter:
+    """按文件批量追加 JSONL 记录的后台写入器（线程安全）"""
+
+    def __init__(self, max_queue: int = None, batch_size: int = None,
+                 flush_interval: float = None, fsync: str = None,
+                 segment_options: Dict[str, Any] = None):
+        """
+        参数:
+            max_queue: 队列容量，默认 WEBCHECKER_LOG_QUEUE 或 10000
+            batch_size: 单批最多写入的记录数，默认 WEBCHECKER_LOG_BATCH 或 256
+            flush_interval: 攒批的最长等待时间（秒），默认 WEBCHECKER_LOG_FLUSH_INTERVAL 或 0.5
+            fsync: "none" 或 "batch"，默认 WEBCHECKER_LOG_FSYNC 或 "none"
+            segment_options: 传给 SegmentedLog 的轮转参数（max_bytes/max_age/block_records/compression）
+        """
+        self.batch_size = max(1, batch_size or DEFAULT_BATCH_SIZE)
+        self.flush_interval = flush_interval if flush_interval is not None else DEFAULT_FLUSH_INTERVAL
+        self.fsync = (fsync or DEFAULT_FSYNC) == "batch"
+        self.segment_options = segment_options or {}
+        self._segments: Dict[Path, SegmentedLog] = {}
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue or DEFAULT_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+
+        atexit.register(self.close)
+
+    def write(self, path: Path, obj: Dict[str, Any]) -> bool:
+        """
+        追加一条记录（不阻塞）
+
+        参数:
+            path: 目标 JSONL 文件
+            obj: 记录内容（在调用线程中序列化，之后修改 obj 不影响写入内容）
+
+        返回:
+            bool: 是否成功入队；队列已满或写入器已关闭时返回 False
+        """
+        if self._closed:
+            return False
+        line = json.dumps(obj, ensure_ascii=False) + "\n"
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((Path(path), line))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                print(f"[WARN] 日志队列已满，已丢弃 {self.dropped} 条记录")
+            return False
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        等待此前入队的记录全部写入磁盘
+
+        返回:
+            bool: 是否在 timeout 内完成
+        """
+        if self._thread is None or self._closed:
+            return True
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """刷新剩余记录并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        """返回已写入、丢弃、批次、失败计数与当前排队数量"""
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "errors": self.errors,
+            "queued": self._queue.qsize(),
+            "rotations": sum(segment.rotations for segment in list(self._segments.values())),
+        }
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name="jsonl-log-writer", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch: List[Tuple[Path, str]] = []
+            markers: List[_FlushMarker] = []
+            stop = False
+
+            # 攒批：直到达到 batch_size、等待超过 flush_interval、或遇到刷新/停止请求
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, _FlushMarker):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                # 停止前写完队列中剩余的记录
+                rest, markers = [], []
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, _FlushMarker):
+                        markers.append(item)
+                    elif item is not None:
+                        rest.append(item)
+                if rest:
+                    self._write_batch(rest)
+                for marker in markers:
+                    marker.done.set()
+                return
+
+    def _write_batch(self, batch: List[Tuple[Path, str]]) -> None:
+        by_path: Dict[Path, List[str]] = {}
+        for path, line in batch:
+            by_path.setdefault(path, []).append(line)
+
+        for path, lines in by_path.items():
+            start = time.perf_counter()
+            try:
+                segment = self._segments.get(path)
+                if segment is None:
+                    segment = self._segments[path] = SegmentedLog(path, **self.segment_options)
+                segment.append(lines, fsync=self.fsync)
+                self.written += len(lines)
+            except Exception as e:
+                self.errors += 1
+                record_error("log_write", e)
+                print(f"[WARN] 写入日志失败 {path}: {e}")
+            LOG_WRITE_LATENCY.labels(path.name).observe(time.perf_counter() - start)
+        self.batches += 1
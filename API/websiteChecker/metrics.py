@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+进程内指标（Prometheus 文本格式）
+- Counter / Gauge / Histogram，支持标签；热路径上只有一次加锁与整数/浮点累加
+- 已有统计（缓存命中、日志丢弃等）通过回调在抓取时读取，不增加热路径开销
+- instrument_app() 为 Flask 应用加上请求计数、耗时、在途数量与 /metrics 路由
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认耗时分桶（秒）：覆盖本地缓存命中到慢速 LLM 调用
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    @contextmanager
+    def track_inprogress(self) -> Iterator[None]:
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class _HistogramChild:
+    __slots__ = ("_upper_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self._upper_bounds = upper_bounds
+        # 最后一格为 +Inf
+        self._counts = [0] * (len(upper_bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values, **kwargs):
+        """
+        取某组标签值对应的子指标（首次使用时创建）
+
+        参数:
+            values / kwargs: 按位置或名称给出的标签值
+        """
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def track_inprogress(self):
+        return self._default.track_inprogress()
+
+
+class Histogram(_Metric):
+    """按固定分桶累计的耗时分布"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != float("inf")))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._items():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _CallbackMetric:
+    """抓取时通过回调读取的指标（回调返回数值，或 {标签值: 数值}）"""
+
+    def __init__(self, name: str, documentation: str, kind: str,
+                 callback: Callable[[], object], labelname: Optional[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.callback = callback
+        self.labelname = labelname
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"[WARN] 读取指标 {self.name} 失败: {e}")
+            return []
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if isinstance(value, dict):
+            for label, item in sorted(value.items()):
+                lines.append(f'{self.name}{{{self.labelname}="{_escape(label)}"}} {_format_value(item)}')
+        else:
+            lines.append(f"{self.name} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """指标注册表：同名指标只创建一次，重复获取返回同一实例"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {type(metric).__name__}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_callback(self, name: str, documentation: str, kind: str,
+                          callback: Callable[[], object], labelname: Optional[str] = None) -> None:
+        """
+        注册抓取时读取的指标（同名时替换原回调）
+
+        参数:
+            kind: "counter" 或 "gauge"
+            callback: 返回数值，或 {标签值: 数值}（此时需给出 labelname）
+        """
+        with self._lock:
+            self._metrics[name] = _CallbackMetric(name, documentation, kind, callback, labelname)
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式输出全部指标"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---- 各模块共用的指标 ----
+
+LLM_LATENCY = REGISTRY.histogram(
+    "webchecker_llm_request_seconds", "LLM 对话补全调用耗时（秒）", ("mode",))
+FLOWSTATE_LATENCY = REGISTRY.histogram(
+    "webchecker_flowstate_seconds", "FlowStateBridge 查询耗时（秒）", ("backend",))
+LOG_WRITE_LATENCY = REGISTRY.histogram(
+    "webchecker_log_write_seconds", "JSONL 日志批量写入耗时（秒）", ("log",))
+PIPELINE_STAGE_LATENCY = REGISTRY.histogram(
+    "webchecker_pipeline_stage_seconds", "判定流水线各阶段耗时（秒）", ("stage",))
+PIPELINE_STAGE_OUTCOMES = REGISTRY.counter(
+    "webchecker_pipeline_stage_total", "判定流水线各阶段结果数（hit / pass / error）", ("stage", "outcome"))
+VERDICT_PARSE = REGISTRY.counter(
+    "webchecker_verdict_parse_total", "单个网站判定的解析结果数（ok / repaired / failed）", ("outcome",))
+ERRORS = REGISTRY.counter(
+    "webchecker_errors_total", "按阶段与异常类型统计的错误数", ("stage", "type"))
+
+
+def record_error(stage: str, error) -> None:
+    """记录一次错误（error 为异常实例或类型名）"""
+    name = error if isinstance(error, str) else type(error).__name__
+    ERRORS.labels(stage, name).inc()
+
+
+def register_cache_metrics(get_cache: Callable[[], object], registry: Registry = REGISTRY) -> None:
+    """
+    注册判定缓存的命中/未命中/条目数指标
+
+    参数:
+        get_cache: 返回 VerdictCache 的函数（每次抓取时调用，监控器被替换后仍读取新的缓存）
+    """
+    for name, key, kind, documentation in (
+        ("webchecker_verdict_cache_hits_total", "hits", "counter", "判定缓存命中次数"),
+        ("webchecker_verdict_cache_misses_total", "misses", "counter", "判定缓存未命中次数"),
+        ("webchecker_verdict_cache_entries", "entries", "gauge", "判定缓存条目数"),
+    ):
+        registry.register_callback(name, documentation, kind,
+                                   lambda key=key: get_cache().stats()[key])
+
+
+def instrument_app(app, registry: Registry = REGISTRY, path: str = "/metrics") -> None:
+    """
+    为 Flask 应用加上请求指标与指标路由
+
+    参数:
+        app: Flask 应用
+        registry: 指标注册表
+        path: 指标路由路径
+    """
+    from flask import Response, g, request
+
+    requests_total = registry.counter(
+        "webchecker_http_requests_total", "HTTP 请求数", ("method", "endpoint", "status"))
+    request_latency = registry.histogram(
+        "webchecker_http_request_seconds", "HTTP 请求处理耗时（秒）", ("endpoint",))
+    in_flight = registry.gauge("webchecker_http_requests_in_flight", "正在处理的 HTTP 请求数")
+
+    def _endpoint() -> str:
+        # 用路由模板而非实际路径作为标签，避免标签基数无限增长
+        rule = request.url_rule
+        return rule.rule if rule is not None else "unmatched"
+
+    @app.before_request
+    def _metrics_before_request():
+        g._metrics_start = time.perf_counter()
+        in_flight.inc()
+
+    @app.after_request
+    def _metrics_after_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            endpoint = _endpoint()
+            request_latency.labels(endpoint).observe(time.perf_counter() - start)
+            requests_total.labels(request.method, endpoint, response.status_code).inc()
+            if response.status_code >= 500:
+                record_error("http", f"status_{response.status_code}")
+            in_flight.dec()
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown_request(exc):
+        # 未处理的异常不会经过 after_request
+        if g.pop("_metrics_start", None) is not None:
+            requests_total.labels(request.method, _endpoint(), 500).inc()
+            record_error("http", exc if exc is not None else "aborted")
+            in_flight.dec()
+
+    @app.get(path)
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
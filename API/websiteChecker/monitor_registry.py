@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+按客户端区分的监控器注册表
+- 每个客户端（请求头 X-Client-Id 或请求体 client_id）有自己的 TaskFocusMonitor：
+  当前任务、检查历史与专注会话互不干扰
+- 每个条目一把锁，只串行化同一客户端的请求；注册表的锁只在查找/创建条目时短暂持有
+- 空闲超过 idle_timeout 的客户端被淘汰（结束其专注会话），条目数超过 max_clients 时先淘汰最久未用的
+- 未带客户端标识的请求使用默认客户端，对应调用方提供的模块级 monitor，不会被淘汰，
+  且与原来一样不串行化（单用户部署的并发请求不受影响）
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+DEFAULT_CLIENT_ID = "default"
+DEFAULT_IDLE_TIMEOUT = float(os.environ.get("WEBCHECKER_CLIENT_IDLE", "1800"))
+DEFAULT_MAX_CLIENTS = int(os.environ.get("WEBCHECKER_MAX_CLIENTS", "1000"))
+# 两次空闲淘汰之间的最短间隔（秒）
+DEFAULT_SWEEP_INTERVAL = 60.0
+MAX_CLIENT_ID_LENGTH = 128
+
+
+def client_id_from_request(request, data: Optional[Dict] = None) -> str:
+    """
+    从 Flask 请求中取客户端标识：X-Client-Id 请求头 > 请求体 client_id > 查询参数 client_id
+
+    返回:
+        str: 客户端标识，未提供时为 DEFAULT_CLIENT_ID
+    """
+    client_id = request.headers.get("X-Client-Id")
+    if not client_id and isinstance(data, dict):
+        client_id = data.get("client_id")
+    if not client_id:
+        client_id = request.args.get("client_id")
+    client_id = str(client_id or "").strip()[:MAX_CLIENT_ID_LENGTH]
+    return client_id or DEFAULT_CLIENT_ID
+
+
+class _Entry:
+    __slots__ = ("monitor", "lock", "last_used")
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.lock = threading.RLock()
+        self.last_used = time.monotonic()
+
+
+class MonitorRegistry:
+    """客户端标识 -> 监控器（线程安全）"""
+
+    def __init__(self, factory: Callable[[str], object], default: Callable[[], object],
+                 idle_timeout: float = None, max_clients: int = None,
+                 sweep_interval: float = DEFAULT_SWEEP_INTERVAL):
+        """
+        参数:
+            factory: 为新客户端创建监控器的函数，参数为客户端标识
+            default: 返回默认客户端监控器的函数（每次调用时取，便于替换模块级 monitor）
+            idle_timeout: 客户端空闲多少秒后淘汰，默认 WEBCHECKER_CLIENT_IDLE 或 1800
+            max_clients: 最多保留的客户端数（不含默认客户端），默认 WEBCHECKER_MAX_CLIENTS 或 1000
+            sweep_interval: 两次空闲淘汰之间的最短间隔（秒）
+        """
+        self.factory = factory
+        self.default = default
+        self.idle_timeout = idle_timeout if idle_timeout is not None else DEFAULT_IDLE_TIMEOUT
+        self.max_clients = max_clients if max_clients is not None else DEFAULT_MAX_CLIENTS
+        self.sweep_interval = sweep_interval
+
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+        self.created = 0
+        self.evicted = 0
+
+    @contextmanager
+    def acquire(self, client_id: str = DEFAULT_CLIENT_ID) -> Iterator[object]:
+        """
+        取得客户端的监控器，并在 with 块内独占它（默认客户端不加锁）
+
+        用法:
+            with registry.acquire(client_id) as monitor:
+                monitor.check_from_flowstate(task, website)
+        """
+        if client_id == DEFAULT_CLIENT_ID:
+            yield self.default()
+            return
+
+        self._maybe_sweep()
+        while True:
+            entry = self._get_entry(client_id)
+            with entry.lock:
+                # 等锁期间条目可能已被淘汰，此时重新创建
+                if self._entries.get(client_id) is not entry:
+                    continue
+                entry.last_used = time.monotonic()
+                try:
+                    yield entry.monitor
+                finally:
+                    entry.last_used = time.monotonic()
+                return
+
+    def get(self, client_id: str = DEFAULT_CLIENT_ID):
+        """
+        取得已有客户端的监控器（不加锁、不创建，只读用途）
+
+        返回:
+            监控器，客户端不存在时返回 None
+        """
+        if client_id == DEFAULT_CLIENT_ID:
+            return self.default()
+        entry = self._entries.get(client_id)
+        return entry.monitor if entry is not None else None
+
+    def __contains__(self, client_id: str) -> bool:
+        return client_id == DEFAULT_CLIENT_ID or client_id in self._entries
+
+    def evict_idle(self, now: float = None) -> int:
+        """
+        淘汰空闲超时且当前没有请求在处理的客户端
+
+        返回:
+            int: 淘汰的客户端数
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_sweep = now
+            idle = [(cid, e) for cid, e in self._entries.items() if now - e.last_used >= self.idle_timeout]
+        return sum(1 for client_id, entry in idle if self._evict(client_id, entry))
+
+    def stats(self) -> Dict:
+        """返回当前客户端数与创建/淘汰计数"""
+        with self._lock:
+            return {
+                "clients": len(self._entries),
+                "max_clients": self.max_clients,
+                "created": self.created,
+                "evicted": self.evicted,
+            }
+
+    def _get_entry(self, client_id: str) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry is not None:
+                return entry
+            full = len(self._entries) >= self.max_clients
+            if full:
+                victims = sorted(self._entries.items(), key=lambda item: item[1].last_used)
+        if full:
+            # 条目已满：淘汰最久未用、且没有请求在处理的客户端
+            for victim_id, victim in victims:
+                if self._evict(victim_id, victim):
+                    break
+
+        # 在注册表锁外创建监控器，避免慢速初始化阻塞其他客户端
+        monitor = self.factory(client_id)
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry is None:
+                entry = self._entries[client_id] = _Entry(monitor)
+                self.created += 1
+            return entry
+
+    def _evict(self, client_id: str, entry: _Entry) -> bool:
+        if not entry.lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                if self._entries.get(client_id) is not entry:
+                    return False
+                del self._entries[client_id]
+                self.evicted += 1
+            _retire(entry.monitor)
+            return True
+        finally:
+            entry.lock.release()
+
+    def _maybe_sweep(self) -> None:
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.evict_idle()
+
+
+def _retire(monitor) -> None:
+    """结束被淘汰客户端的任务，使其专注会话写入存储"""
+    try:
+        if getattr(monitor, "current_task", None):
+            monitor.end_task()
+    except Exception as e:
+        print(f"[WARN] 结束空闲客户端的任务失败: {e}")
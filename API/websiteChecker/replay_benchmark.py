@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+离线回放基准测试
+- 读取 logs/website_events.jsonl（含已轮转的压缩段）中记录的真实访问
+- 按记录的时间间隔（可加速）经 check_from_flowstate 回放，LLM 使用本地桩（可设置延迟）
+- 报告吞吐量、p50/p95/p99 延迟、缓存命中率与上游调用次数，全程无需网络
+
+用法：
+    python replay_benchmark.py --speedup 0 --latency 0.3 --concurrency 8
+    python replay_benchmark.py --synthetic 500 --json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from focus_score_calculator import FocusScoreCalculator
+from log_segments import read_range
+from single_flight import SingleFlight
+from stub_llm import StubLLMClient
+from task_focus_monitor import TaskFocusMonitor
+from verdict_cache import VerdictCache, canonicalize_url
+
+
+DEFAULT_EVENTS = Path(__file__).parent / "logs" / "website_events.jsonl"
+
+
+def load_events(path: Path, limit: int = None) -> List[Dict]:
+    """读取可回放的事件（需包含任务与网站 URL）"""
+    events = []
+    for record in read_range(path):
+        task = record.get("task_brief") or record.get("task")
+        website = record.get("website") or {}
+        if not task or not website.get("url"):
+            continue
+        events.append(record)
+        if limit and len(events) >= limit:
+            break
+    return events
+
+
+def synthetic_events(count: int, seed: int = 0) -> List[Dict]:
+    """生成合成事件：少量任务、重复访问的网站，事件间隔 0~2 秒"""
+    rng = random.Random(seed)
+    tasks = [
+        {"id": "task_py", "name": "学习Python编程"},
+        {"id": "task_report", "name": "写季度报告"},
+        {"id": "task_math", "name": "写数学作业"},
+    ]
+    sites = [
+        "https://docs.python.org/3/tutorial/", "https://stackoverflow.com/questions/1",
+        "https://www.youtube.com/watch?v=abc", "https://github.com/python/cpython",
+        "https://www.bilibili.com/video/1", "https://docs.google.com/document/d/1",
+        "https://www.khanacademy.org/math", "https://twitter.com/home",
+        "https://www.wikipedia.org/wiki/Report", "https://www.taobao.com/",
+    ]
+    events, ts, task = [], 1_700_000_000.0, tasks[0]
+    for _ in range(count):
+        if rng.random() < 0.05:
+            task = rng.choice(tasks)
+        ts += rng.random() * 2
+        url = rng.choice(sites)
+        if rng.random() < 0.3:
+            url += f"?utm_source=feed{rng.randint(1, 3)}"
+        events.append({
+            "received_at": datetime.utcfromtimestamp(ts).isoformat(),
+            "task_brief": task,
+            "website": {"url": url, "title": "", "app_id": "browser"},
+        })
+    return events
+
+
+def _event_time(event: Dict) -> Optional[float]:
+    value = event.get("received_at") or event.get("timestamp")
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """最近秩百分位数（sorted_values 需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def build_monitor(client, workdir: Path, cache_file: str = "") -> TaskFocusMonitor:
+    """创建使用桩客户端、临时会话存储的监控器"""
+    monitor = TaskFocusMonitor(api_key="offline-benchmark", verdict_cache=VerdictCache(cache_file=cache_file),
+                               focus_calculator=FocusScoreCalculator(str(workdir / "bench_sessions.json")))
+    monitor.client = client
+    return monitor
+
+
+def replay(events: Iterable[Dict], monitor: TaskFocusMonitor, speedup: float = 0.0,
+           concurrency: int = 1, coalesce: bool = False) -> Dict:
+    """
+    回放事件并统计（延迟从事件的计划到达时刻算起，包含排队时间）
+
+    参数:
+        events: 事件列表
+        monitor: 监控器（client 应为桩）
+        speedup: 回放倍速，0 表示不等待、尽快回放
+        concurrency: 同时处理的请求数（模拟多线程 API 服务）
+        coalesce: 是否像 api_server 一样合并相同 (任务, URL) 的并发请求
+
+    返回:
+        dict: 统计结果
+    """
+    events = list(events)
+    flight = SingleFlight() if coalesce else None
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def handle(event: Dict, scheduled: float) -> None:
+        nonlocal errors
+        task = event.get("task_brief") or event.get("task")
+        website = event["website"]
+
+        def classify():
+            return monitor.check_from_flowstate(task, website)
+
+        if flight is not None:
+            key = (TaskFocusMonitor.flowstate_task_key(task), canonicalize_url(website["url"]))
+            result, _ = flight.do(key, classify)
+        else:
+            result = classify()
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies.append(elapsed)
+            if result.get("action") == "error":
+                errors += 1
+
+    times = [_event_time(e) for e in events]
+    first = next((t for t in times if t is not None), None)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for event, ts in zip(events, times):
+            if speedup > 0 and ts is not None and first is not None:
+                delay = start + (ts - first) / speedup - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(handle, event, time.perf_counter())
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    cache = monitor.verdict_cache.stats()
+    report = {
+        "events": len(events),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_s": round(len(events) / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        "cache_hits": cache["hits"],
+        "cache_misses": cache["misses"],
+        "cache_hit_rate": cache["hit_rate"],
+        "upstream_calls": getattr(monitor.client, "calls", None),
+    }
+    if flight is not None:
+        report["coalesced"] = flight.stats()["coalesced"]
+    return report
+
+
+def print_report(report: Dict) -> None:
+    latency = report["latency_ms"]
+    print("=" * 60)
+    print("回放基准测试结果")
+    print("=" * 60)
+    print(f"事件数:       {report['events']}（失败 {report['errors']}）")
+    print(f"耗时:         {report['wall_seconds']:.3f} 秒")
+    print(f"吞吐量:       {report['throughput_per_s']:.2f} 次/秒")
+    print(f"延迟 (ms):    p50 {latency['p50']} | p95 {latency['p95']} | p99 {latency['p99']} | max {latency['max']}")
+    print(f"缓存命中率:   {report['cache_hit_rate'] * 100:.1f}%（命中 {report['cache_hits']} / 未命中 {report['cache_misses']}）")
+    print(f"上游调用次数: {report['upstream_calls']}")
+    if "coalesced" in report:
+        print(f"合并请求数:   {report['coalesced']}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线回放 website_events.jsonl 的基准测试")
+    parser.add_argument("--events", default=str(DEFAULT_EVENTS), help="事件日志路径（默认 logs/website_events.jsonl）")
+    parser.add_argument("--synthetic", type=int, help="不读日志，生成指定数量的合成事件")
+    parser.add_argument("--limit", type=int, help="最多回放的事件数")
+    parser.add_argument("--speedup", type=float, default=0.0, help="回放倍速，0 表示尽快回放（默认）")
+    parser.add_argument("--concurrency", type=int, default=1, help="并发处理数（默认 1）")
+    parser.add_argument("--latency", type=float, default=0.2, help="桩 LLM 单次调用延迟（秒，默认 0.2）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="桩 LLM 延迟的随机抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="桩 LLM 调用失败概率")
+    parser.add_argument("--coalesce", action="store_true", help="合并相同 (任务, URL) 的并发请求")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    parser.add_argument("--verbose", action="store_true", help="显示监控器的输出")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        events = synthetic_events(args.synthetic, seed=args.seed)
+    else:
+        events = load_events(Path(args.events), limit=args.limit)
+        if not events:
+            parser.error(f"没有可回放的事件: {args.events}（可使用 --synthetic N）")
+
+    client = StubLLMClient(latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, seed=args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        monitor = build_monitor(client, Path(workdir))
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            report = replay(events, monitor, speedup=args.speedup,
+                            concurrency=args.concurrency, coalesce=args.coalesce)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
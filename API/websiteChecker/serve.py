@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+生产环境入口
+- 多 worker 进程运行 api_server（或 web_monitor），不开调试器与自动重载
+- 优先使用 gunicorn（gthread worker，每个进程多线程）；未安装时依次退回 waitress、Werkzeug
+- 多个 worker 通过 shared_state.py 的 SQLite 数据库共享判定缓存、计数与活跃会话，
+  专注会话存储改为可多进程写入的 SQLite 后端
+
+用法：
+    python3 serve.py --workers 4 --threads 8
+    python3 serve.py --app web_monitor --port 5000
+    gunicorn -w 4 --threads 8 -b 127.0.0.1:5001 wsgi:application   # 直接使用 gunicorn
+"""
+
+import argparse
+import importlib
+import os
+from pathlib import Path
+
+try:
+    import gunicorn.app.base
+    _has_gunicorn = True
+except ImportError:
+    _has_gunicorn = False
+
+try:
+    import waitress
+    _has_waitress = True
+except ImportError:
+    _has_waitress = False
+
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_SHARED_STATE_FILE = BASE_DIR / "shared_state.db"
+DEFAULT_WORKERS = int(os.environ.get("WEBCHECKER_WORKERS", str(min(4, os.cpu_count() or 1))))
+DEFAULT_THREADS = int(os.environ.get("WEBCHECKER_THREADS", "8"))
+# worker 处理单个请求的最长时间（秒），应大于 LLM 调用超时
+DEFAULT_WORKER_TIMEOUT = int(os.environ.get("WEBCHECKER_WORKER_TIMEOUT", "60"))
+
+
+def configure_shared_state() -> None:
+    """为多进程部署设置默认的共享状态（已设置的环境变量不会被覆盖）"""
+    os.environ.setdefault("WEBCHECKER_SHARED_STATE", str(DEFAULT_SHARED_STATE_FILE))
+    # journal/json 后端由单个进程独占，多进程写入需使用 SQLite
+    os.environ.setdefault("FOCUS_STORAGE", "sqlite")
+
+
+def load_app(name: str):
+    """导入应用模块并返回其中的 Flask app"""
+    return importlib.import_module(name).app
+
+
+def _serve_gunicorn(app_name: str, host: str, port: int, workers: int, threads: int) -> None:
+    class _Application(gunicorn.app.base.BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("timeout", DEFAULT_WORKER_TIMEOUT)
+            self.cfg.set("accesslog", "-")
+
+        def load(self):
+            # 不预加载：每个 worker 进程各自导入应用，SQLite 连接与后台线程不跨 fork
+            return load_app(app_name)
+
+    _Application().run()
+
+
+def _serve_waitress(app_name: str, host: str, port: int, workers: int, threads: int) -> None:
+    if workers > 1:
+        print(f"[WARN] waitress 只支持单进程，忽略 --workers {workers}，改用 {threads * workers} 个线程")
+    waitress.serve(load_app(app_name), host=host, port=port, threads=threads * workers)
+
+
+def _serve_werkzeug(app_name: str, host: str, port: int, workers: int, threads: int) -> None:
+    from werkzeug.serving import run_simple
+
+    print("[WARN] 未安装 gunicorn / waitress，使用 Werkzeug 服务器（pip install gunicorn 以获得更好的性能）")
+    options = {"processes": workers} if workers > 1 else {"threaded": True}
+    run_simple(host, port, load_app(app_name), use_reloader=False, use_debugger=False, **options)
+
+
+_SERVERS = {
+    "gunicorn": _serve_gunicorn,
+    "waitress": _serve_waitress,
+    "werkzeug": _serve_werkzeug,
+}
+
+
+def choose_server(requested: str = "auto") -> str:
+    """
+    选择 WSGI 服务器
+
+    参数:
+        requested: "auto"、"gunicorn"、"waitress" 或 "werkzeug"
+
+    返回:
+        str: 实际使用的服务器名
+
+    异常:
+        ValueError: 指定的服务器未安装
+    """
+    available = {"gunicorn": _has_gunicorn and os.name == "posix", "waitress": _has_waitress, "werkzeug": True}
+    if requested == "auto":
+        return next(name for name in ("gunicorn", "waitress", "werkzeug") if available[name])
+    if not available.get(requested):
+        raise ValueError(f"{requested} 不可用（未安装或不支持当前系统）")
+    return requested
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以多 worker 方式运行 Website Checker 服务")
+    parser.add_argument("--app", default="api_server", choices=["api_server", "web_monitor"], help="要运行的应用")
+    parser.add_argument("--host", default=os.environ.get("WEBCHECKER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("WEBCHECKER_PORT", "5001")))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker 进程数")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="每个 worker 的线程数")
+    parser.add_argument("--server", default="auto", choices=["auto"] + list(_SERVERS), help="WSGI 服务器")
+    args = parser.parse_args()
+
+    try:
+        server = choose_server(args.server)
+    except ValueError as e:
+        parser.error(str(e))
+
+    configure_shared_state()
+    print(f"{args.app} on http://{args.host}:{args.port} "
+          f"({server}, {args.workers} workers x {args.threads} threads, "
+          f"shared state: {os.environ['WEBCHECKER_SHARED_STATE']})")
+    _SERVERS[server](args.app, args.host, args.port, max(1, args.workers), max(1, args.threads))
+
+
+if __name__ == "__main__":
+    main()
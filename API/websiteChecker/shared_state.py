@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+进程间共享状态（SQLite，WAL 模式）
+- 多个 worker 进程（gunicorn 等）共用同一个数据库文件
+- 判定缓存：SharedVerdictCache 与 VerdictCache 接口相同，一个 worker 判定过的网站其他 worker 直接命中；
+  命中时刷新 last_used，超出容量时按最近使用时间淘汰（LRU）
+- 计数器：检查总数、相关/不相关数量（checks:total / checks:relevant / checks:irrelevant）跨进程累加，
+  另按客户端累加（client:<客户端>:checks:...，见 client_counts）
+- 活跃会话：同一客户端的同一任务指纹只开一个专注会话（键由 session_key 生成），各 worker 的网站检查记入同一会话
+设置 WEBCHECKER_SHARED_STATE=<数据库路径> 启用（serve.py / wsgi.py 会自动设置）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from verdict_cache import VerdictCache
+
+
+DEFAULT_SHARED_STATE = os.environ.get("WEBCHECKER_SHARED_STATE", "")
+# 活跃会话超过该秒数没有新的检查时视为已结束，同一任务再次出现时开新会话
+DEFAULT_SESSION_IDLE = float(os.environ.get("WEBCHECKER_SHARED_SESSION_IDLE", "1800"))
+# 数据库被其他进程锁住时的最长等待（毫秒）
+_BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    last_used REAL NOT NULL DEFAULT 0,
+    result TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS active_sessions (
+    task_key TEXT PRIMARY KEY,
+    session TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SharedStateStore:
+    """基于 SQLite 的共享状态（线程安全、多进程安全）"""
+
+    def __init__(self, db_file: str, session_idle: float = None):
+        """
+        参数:
+            db_file: 数据库路径
+            session_idle: 活跃会话的空闲超时（秒），默认 WEBCHECKER_SHARED_SESSION_IDLE 或 1800
+        """
+        self.db_file = Path(db_file)
+        self.session_idle = session_idle if session_idle is not None else DEFAULT_SESSION_IDLE
+        # 每个线程一个连接；连接不跨 fork 使用，worker 进程各自打开
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """为旧版数据库补上 verdicts.last_used 列（以写入时间作为最近使用时间）"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(verdicts)")}
+        if "last_used" not in columns:
+            try:
+                conn.execute("ALTER TABLE verdicts ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+                conn.execute("UPDATE verdicts SET last_used = stored_at")
+            except sqlite3.OperationalError as e:
+                # 其他 worker 同时完成了迁移
+                if "duplicate column" not in str(e):
+                    raise
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_last_used ON verdicts (last_used)")
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedStateStore"]:
+        """按 WEBCHECKER_SHARED_STATE 创建，未设置时返回 None"""
+        db_file = os.environ.get("WEBCHECKER_SHARED_STATE", DEFAULT_SHARED_STATE)
+        return cls(db_file) if db_file else None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(str(self.db_file), timeout=_BUSY_TIMEOUT_MS / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---- 判定缓存 ----
+
+    def get_verdict(self, key: str, ttl: float, touch: bool = True) -> Optional[Dict]:
+        """
+        读取未过期的判定结果
+
+        参数:
+            touch: 命中时是否刷新最近使用时间（影响 LRU 淘汰顺序）
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT stored_at, result FROM verdicts WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or now - row[0] > ttl:
+            return None
+        if touch:
+            with conn:
+                conn.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[1])
+
+    def put_verdict(self, key: str, value: Dict, max_entries: int) -> int:
+        """
+        写入判定结果，超过 max_entries 时删除最久未使用的条目
+
+        返回:
+            int: 被删除的条目数
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, stored_at, last_used, result) VALUES (?, ?, ?, ?)",
+                (key, now, now, json.dumps(value, ensure_ascii=False)),
+            )
+            count = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            if count <= max_entries:
+                return 0
+            conn.execute(
+                "DELETE FROM verdicts WHERE key IN "
+                "(SELECT key FROM verdicts ORDER BY last_used LIMIT ?)",
+                (count - max_entries,),
+            )
+            return count - max_entries
+
+    def clear_verdicts(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM verdicts")
+
+    def verdict_count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    # ---- 计数器 ----
+
+    def incr(self, amounts: Dict[str, int]) -> None:
+        """在一个事务中累加多个计数器"""
+        with self._connect() as conn:
+            self._incr(conn, amounts)
+
+    @staticmethod
+    def _incr(conn: sqlite3.Connection, amounts: Dict[str, int]) -> None:
+        conn.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            list(amounts.items()),
+        )
+
+    def counters(self, prefix: str = "") -> Dict[str, int]:
+        """读取计数器（可按名称前缀过滤）"""
+        rows = self._connect().execute(
+            "SELECT name, value FROM counters WHERE name LIKE ? ESCAPE '\\'",
+            (prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",),
+        ).fetchall()
+        return dict(rows)
+
+    # ---- 活跃会话 ----
+
+    def claim_session(self, task_key: str, candidate: Dict) -> Dict:
+        """
+        取得任务的活跃会话：已有未过期的会话时返回它，否则登记 candidate
+
+        参数:
+            task_key: 活跃会话的键（session_key(客户端标识, 任务指纹)）
+            candidate: 本进程准备开启的会话表头（FocusSession.to_dict(include_checks=False)）
+
+        返回:
+            dict: 所有 worker 共用的会话表头
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE 保证“读取-登记”不会被其他进程插入
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT session, updated_at FROM active_sessions WHERE task_key = ?", (task_key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= self.session_idle:
+                return json.loads(row[0])
+            conn.execute(
+                "INSERT OR REPLACE INTO active_sessions (task_key, session, updated_at) VALUES (?, ?, ?)",
+                (task_key, json.dumps(candidate, ensure_ascii=False), now),
+            )
+        return candidate
+
+    def release_session(self, task_key: str, session_id: str) -> None:
+        """任务结束时注销活跃会话（只注销仍指向 session_id 的登记）"""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM active_sessions WHERE task_key = ? AND json_extract(session, '$.session_id') = ?",
+                (task_key, session_id),
+            )
+
+    def record_check(self, task_key: str, session_id: str, is_relevant: bool, client_id: str = None) -> None:
+        """
+        记录一次网站检查：累加全局、客户端与会话计数，并刷新活跃会话的时间
+
+        参数:
+            task_key: 活跃会话的键（session_key 的结果）
+            client_id: 客户端标识，None 时只累加全局与会话计数
+        """
+        outcome = "relevant" if is_relevant else "irrelevant"
+        amounts = {"checks:total": 1, f"checks:{outcome}": 1, f"session:{session_id}:{outcome}": 1}
+        if client_id is not None:
+            amounts.update({f"client:{client_id}:checks:total": 1, f"client:{client_id}:checks:{outcome}": 1})
+        with self._connect() as conn:
+            self._incr(conn, amounts)
+            conn.execute(
+                "UPDATE active_sessions SET updated_at = ? WHERE task_key = ?", (time.time(), task_key)
+            )
+
+    def client_counts(self, client_id: str) -> Dict[str, int]:
+        """返回某个客户端的检查总数与相关/不相关数（包含所有 worker 的记录）"""
+        prefix = f"client:{client_id}:checks:"
+        counts = self.counters(prefix)
+        return {name: counts.get(prefix + name, 0) for name in ("total", "relevant", "irrelevant")}
+
+    def session_counts(self, session_id: str) -> Dict[str, int]:
+        """返回会话的相关/不相关检查数（包含所有 worker 的记录）"""
+        prefix = f"session:{session_id}:"
+        counts = self.counters(prefix)
+        return {
+            "relevant": counts.get(prefix + "relevant", 0),
+            "irrelevant": counts.get(prefix + "irrelevant", 0),
+        }
+
+
+def session_key(client_id: str, task_key: str) -> str:
+    """活跃会话的键：按客户端区分，不同客户端执行同一任务时各有自己的会话"""
+    return f"{client_id}|{task_key}"
+
+
+class SharedVerdictCache:
+    """
+    存放在 SharedStateStore 中的判定缓存，接口与 VerdictCache 相同
+
+    命中/未命中计数为本进程的统计；条目数为所有进程共用的数量
+    """
+
+    def __init__(self, store: SharedStateStore, ttl: float = None, max_entries: int = None):
+        """
+        参数:
+            store: 共享状态
+            ttl: 条目有效期（秒），默认读取 VERDICT_CACHE_TTL，否则 24 小时
+            max_entries: 最大条目数，默认读取 VERDICT_CACHE_SIZE，否则 5000
+        """
+        self.store = store
+        self.ttl = float(ttl if ttl is not None else os.environ.get("VERDICT_CACHE_TTL", 24 * 3600))
+        self.max_entries = int(max_entries if max_entries is not None else os.environ.get("VERDICT_CACHE_SIZE", 5000))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    make_key = staticmethod(VerdictCache.make_key)
+
+    def get(self, task_key: str, website_url: str) -> Optional[Dict]:
+        result = self.store.get_verdict(self.make_key(task_key, website_url), self.ttl)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def contains(self, task_key: str, website_url: str) -> bool:
+        """是否有未过期的条目（不计入命中率、不刷新最近使用时间）"""
+        return self.store.get_verdict(self.make_key(task_key, website_url), self.ttl, touch=False) is not None
+
+    def put(self, task_key: str, website_url: str, result: Dict) -> None:
+        value = {
+            "is_relevant": result.get("is_relevant", False),
+            "action": result.get("action", "block"),
+            "reason": result.get("reason", ""),
+            "confidence": result.get("confidence", "medium"),
+        }
+        evicted = self.store.put_verdict(self.make_key(task_key, website_url), value, self.max_entries)
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def clear(self) -> None:
+        self.store.clear_verdicts()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self.store.verdict_count(),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": 0,
+                "shared": True,
+            }
+
+    def save(self) -> None:
+        """写入即落盘，无需额外保存"""
@@ -10,8 +10,9 @@ from groq import Groq
 class SimpleFocusMonitor:
     """简化版任务专注度监控器"""
     
-    def __init__(self):
-        self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+    def __init__(self, base_url=None):
+        # base_url 可指向本地桩服务（stub_llm.py），默认读取环境变量 GROQ_BASE_URL
+        self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"), base_url=base_url)
         self.task = None
     
     def set_task(self, task):
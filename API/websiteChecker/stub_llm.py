@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+离线 LLM 桩 - 用于基准测试与离线开发
+- 按规则给出确定性的判定，回答格式与真实模型一致（判断/置信度/理由；
+  请求带 response_format=json_object 时单个网站的判定输出 JSON 对象）
+- 支持单个网站、编号批量判定以及 SimpleFocusMonitor 的“是/否”提示词
+- StubLLMClient 实现 client.chat.completions.create，可直接替换 monitor.client；
+  AsyncStubLLMClient 是异步版本（接口同 AsyncGroq），可传给 AsyncClassificationEngine；
+  测试需要固定回答时传入 responder
+- StubLLMServer 是兼容 Groq/OpenAI chat-completions 协议的本地 HTTP 服务，
+  可设置延迟、错误率与限流（429），监控器通过 base_url / GROQ_BASE_URL 指向它
+
+用法：
+    python stub_llm.py --port 8765 --latency 0.2 --error-rate 0.01 --rate-limit 50
+    export GROQ_BASE_URL=http://127.0.0.1:8765
+    export GROQ_API_KEY=stub
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from verdict_protocol import REPAIR_MARKER
+
+
+# 娱乐、社交、购物类域名（判定为不相关）
+DISTRACTING_DOMAINS = (
+    "youtube.com", "bilibili.com", "netflix.com", "twitch.tv", "tiktok.com", "douyin.com",
+    "facebook.com", "instagram.com", "twitter.com", "x.com", "weibo.com", "reddit.com",
+    "taobao.com", "jd.com", "amazon.com", "iqiyi.com", "youku.com", "steampowered.com",
+)
+
+# 搜索引擎与通用工具类域名（视为相关，置信度中）
+TOOL_DOMAINS = (
+    "google.com", "bing.com", "baidu.com", "duckduckgo.com", "github.com",
+    "stackoverflow.com", "wikipedia.org", "translate.google.com", "chatgpt.com",
+)
+
+_TASK_RE = re.compile(r"我正在执行的任务是：(.*?)\n\n现在我想打开", re.S)
+_BATCH_ITEM_RE = re.compile(r"^(\d+)\. URL: (\S+)(?: \| 网站描述: (.*))?$", re.M)
+_SINGLE_URL_RE = re.compile(r"^URL: (\S+)$", re.M)
+_SINGLE_DESC_RE = re.compile(r"^(?:网站描述|标题): (.*)$", re.M)
+# SimpleFocusMonitor 的提示词：任务: ...\n网站: ...，要求回答“是”或“否”
+_YES_NO_RE = re.compile(r"^任务: (.*)\n网站: (\S+)", re.M)
+_ASCII_WORD_RE = re.compile(r"[a-z0-9]{3,}")
+_CJK_RE = re.compile(r"[一-鿿]+")
+_JSON_CONFIDENCE = {"高": "high", "中": "medium", "低": "low"}
+_IGNORED_KEYWORDS = {"http", "https", "www", "com", "org", "net", "html", "任务", "相关", "资源"}
+
+
+def _domain_matches(host: str, domains) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+def _task_keywords(task: str) -> List[str]:
+    """任务中的英文单词与中文二元组"""
+    task = task.lower()
+    keywords = _ASCII_WORD_RE.findall(task)
+    for run in _CJK_RE.findall(task):
+        keywords.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return [k for k in keywords if k not in _IGNORED_KEYWORDS]
+
+
+def judge(task: str, url: str, description: Optional[str] = None) -> Tuple[bool, str, str]:
+    """
+    规则判定
+
+    返回:
+        tuple: (是否相关, 置信度 高/中/低, 理由)
+    """
+    host = (urlparse(url if "//" in url else "//" + url).hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    haystack = f"{url} {description or ''}".lower()
+
+    if any(keyword in haystack for keyword in _task_keywords(task or "")):
+        return True, "高", "网站内容与任务关键词吻合"
+    if _domain_matches(host, DISTRACTING_DOMAINS):
+        return False, "高", "娱乐、社交或购物网站，容易分心"
+    if _domain_matches(host, TOOL_DOMAINS) or host.startswith("docs."):
+        return True, "中", "搜索或工具类网站，可用于完成任务"
+    return False, "低", "未发现与任务有关的内容"
+
+
+def answer(prompt: str, json_mode: bool = False) -> str:
+    """按提示词类型（单个/批量/是否）生成回答文本，json_mode 时单个网站的判定输出 JSON"""
+    yes_no = _YES_NO_RE.search(prompt)
+    if yes_no:
+        is_relevant, _, reason = judge(yes_no.group(1), yes_no.group(2))
+        return f"{'是' if is_relevant else '否'}，{reason}"
+
+    match = _TASK_RE.search(prompt)
+    task = match.group(1) if match else ""
+
+    items = _BATCH_ITEM_RE.findall(prompt)
+    if items:
+        lines = []
+        for number, url, description in items:
+            is_relevant, confidence, reason = judge(task, url, description)
+            verdict = "相关" if is_relevant else "不相关"
+            lines.append(f"{number}. 判断：{verdict} | 置信度：{confidence} | 理由：{reason}")
+        return "\n".join(lines)
+
+    url_match = _SINGLE_URL_RE.search(prompt)
+    desc_match = _SINGLE_DESC_RE.search(prompt)
+    is_relevant, confidence, reason = judge(
+        task, url_match.group(1) if url_match else "", desc_match.group(1) if desc_match else None
+    )
+    if json_mode:
+        return json.dumps({"relevant": is_relevant, "confidence": _JSON_CONFIDENCE[confidence],
+                           "reason": reason}, ensure_ascii=False)
+    verdict = "相关" if is_relevant else "不相关"
+    return f"判断：{verdict}\n置信度：{confidence}\n理由：{reason}"
+
+
+class StubLLMError(Exception):
+    """桩模拟的上游错误"""
+
+
+class StubLLMClient:
+    """进程内的 chat.completions 桩（线程安全），可设置延迟与错误率"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0, responder: Callable[..., str] = None):
+        """
+        参数:
+            latency: 每次调用的基础延迟（秒）
+            jitter: 在基础延迟上随机增加 0~jitter 秒
+            error_rate: 调用失败（抛出 StubLLMError）的概率
+            seed: 随机数种子，保证多次运行结果一致
+            responder: 自定义回答，以 (messages, model=..., **create 的其余参数) 调用，返回回答文本；
+                       可在其中记录请求或抛出异常。默认按规则作答（见 answer）
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.responder = responder
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages: List[Dict], model: str = None, temperature: float = None,
+               max_tokens: int = None, **kwargs):
+        delay, fail = self._begin()
+        if delay:
+            time.sleep(delay)
+        return self._complete(fail, messages, model, dict(kwargs, temperature=temperature, max_tokens=max_tokens))
+
+    def _begin(self) -> Tuple[float, bool]:
+        """计数并决定本次调用的延迟与是否失败"""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0.0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return delay, fail
+
+    def _complete(self, fail: bool, messages: List[Dict], model: Optional[str], kwargs: Dict):
+        if fail:
+            raise StubLLMError("stub upstream error")
+
+        if self.responder is not None:
+            content = self.responder(messages, model=model, **kwargs)
+        else:
+            # 修复追问时按原提示词重新作答
+            prompt = next((m["content"] for m in reversed(messages)
+                           if m.get("role") == "user" and REPAIR_MARKER not in m["content"]),
+                          messages[-1]["content"])
+            json_mode = (kwargs.get("response_format") or {}).get("type") == "json_object"
+            content = answer(prompt, json_mode=json_mode)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content))],
+        )
+
+
+class AsyncStubLLMClient(StubLLMClient):
+    """StubLLMClient 的异步版本（create 为协程，延迟期间不阻塞事件循环）"""
+
+    async def create(self, messages: List[Dict], model: str = None, temperature: float = None,
+                     max_tokens: int = None, **kwargs):
+        delay, fail = self._begin()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._complete(fail, messages, model, dict(kwargs, temperature=temperature, max_tokens=max_tokens))
+
+
+class _TokenBucket:
+    """简单令牌桶：rate 为每秒请求数，burst 为桶容量"""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class StubLLMServer:
+    """
+    本地 chat-completions 桩服务
+
+    路由:
+        POST /openai/v1/chat/completions   Groq SDK 使用的路径
+        POST /v1/chat/completions          OpenAI 兼容客户端使用的路径
+        GET  /openai/v1/models, /v1/models
+        GET  /health
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, rate_limit: float = 0.0,
+                 seed: int = 0):
+        """
+        参数:
+            host: 监听地址
+            port: 监听端口，0 表示随机可用端口
+            latency/jitter/error_rate/seed: 同 StubLLMClient，失败时返回 500
+            rate_limit: 每秒允许的请求数，超出返回 429（带 Retry-After），0 表示不限
+        """
+        self.client = StubLLMClient(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed)
+        self.bucket = _TokenBucket(rate_limit) if rate_limit else None
+        self.rate_limited = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLLMServer":
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict:
+        return {"calls": self.client.calls, "errors": self.client.errors, "rate_limited": self.rate_limited}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path in ("/openai/v1/models", "/v1/models"):
+                    self._send(200, {"object": "list", "data": [
+                        {"id": "llama-3.3-70b-versatile", "object": "model", "owned_by": "stub"},
+                        {"id": "llama-3.1-8b-instant", "object": "model", "owned_by": "stub"},
+                    ]})
+                elif self.path == "/health":
+                    self._send(200, {"ok": True, **server.stats()})
+                else:
+                    self._send(404, _error_body("not found", "invalid_request_error"))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                if self.path not in ("/openai/v1/chat/completions", "/v1/chat/completions"):
+                    self._send(404, _error_body("not found", "invalid_request_error"))
+                    return
+                try:
+                    payload = json.loads(body)
+                    messages = payload["messages"]
+                except (ValueError, KeyError, TypeError):
+                    self._send(400, _error_body("invalid request body", "invalid_request_error"))
+                    return
+
+                if server.bucket is not None and not server.bucket.take():
+                    server.rate_limited += 1
+                    self._send(429, _error_body("Rate limit reached", "rate_limit_exceeded"),
+                               {"Retry-After": "1"})
+                    return
+
+                model = payload.get("model", "stub")
+                try:
+                    completion = server.client.create(messages=messages, model=model,
+                                                      response_format=payload.get("response_format"))
+                except StubLLMError as e:
+                    self._send(500, _error_body(str(e), "server_error"))
+                    return
+
+                content = completion.choices[0].message.content
+                prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 2
+                completion_tokens = len(content) // 2
+                self._send(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+            def _send(self, status: int, body: Dict, headers: Dict = None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def _error_body(message: str, error_type: str) -> Dict:
+    return {"error": {"message": message, "type": error_type}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 chat-completions 桩服务（离线开发与压测）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口（默认 8765）")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次调用的延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="每秒允许的请求数，超出返回 429")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, rate_limit=args.rate_limit, seed=args.seed)
+    print(f"✓ 桩 LLM 服务已启动: {server.base_url}")
+    print(f"  export GROQ_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,51 +4,139 @@
 """
 
 import os
+import re
 import json
 import time
+import uuid
+import asyncio
 from datetime import datetime
 from groq import Groq
+from check_history import CheckHistory
+from decision_pipeline import DecisionPipeline
 from focus_score_calculator import FocusScoreCalculator
+from metrics import LLM_LATENCY, VERDICT_PARSE, record_error
+from tracing import span
+from monitor_registry import DEFAULT_CLIENT_ID
+from shared_state import SharedVerdictCache, session_key
+from verdict_cache import VerdictCache, task_fingerprint
+from verdict_protocol import (
+    JSON_RESPONSE_FORMAT, VerdictParseError, max_tokens_for, output_instructions,
+    parse_verdict, repair_messages, response_format_mode,
+)
+
+
+SYSTEM_PROMPT = "你是一个专业的任务专注度助手，帮助用户判断网站是否与当前任务相关，从而保持专注。"
+
+JUDGE_CRITERIA = """判断标准：
+1. 如果网站内容直接有助于完成任务，判定为"相关"
+2. 如果网站是娱乐、社交、购物等与任务无关的内容，判定为"不相关"
+3. 如果网站是搜索引擎、工具类网站，需要根据任务判断"""
+
+# 单次批量判定最多包含的网站数量
+DEFAULT_BATCH_SIZE = int(os.environ.get("WEBCHECKER_BATCH_SIZE", "20"))
+
+# 批量响应的单行格式：1. 判断：相关 | 置信度：高 | 理由：...
+_BATCH_LINE_RE = re.compile(
+    r"^\s*(\d+)\s*[.、:：)）]\s*判断\s*[：:]\s*(不相关|相关)\s*[|｜]"
+    r"\s*置信度\s*[：:]\s*(高|中|低)\s*[|｜]\s*理由\s*[：:]\s*(.*?)\s*$"
+)
+_CONFIDENCE_MAP = {"高": "high", "中": "medium", "低": "low"}
 
 
 class TaskFocusMonitor:
     """任务专注度监控器 - 帮助用户保持专注于当前任务"""
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, verdict_cache=None, base_url=None, shared_state=None, parent=None,
+                 warmup=None, local_model=None, pipeline=None, response_format=None, client_id=None,
+                 focus_calculator=None):
         """
         初始化任务专注度监控器
         
         参数:
             api_key: Groq API密钥，如果不提供则从环境变量GROQ_API_KEY读取
+            verdict_cache: 判定结果缓存（VerdictCache），不提供则使用默认的持久化缓存
+            base_url: API 地址（如本地桩服务 stub_llm.py），不提供则读取环境变量GROQ_BASE_URL
+            shared_state: 多进程共享状态（SharedStateStore），提供时判定缓存、计数与活跃会话由各进程共用
+            parent: 已有的监控器；提供时共用它的 API 客户端、判定缓存、共享状态、异步引擎与会话存储，
+                    只有当前任务与会话是独立的（用于按客户端区分的监控器，见 monitor_registry.py）
+            warmup: 判定缓存预热（TaskWarmup），提供时每次设置任务后在后台预判定任务资源与常访问域名
+            local_model: 本地相关性模型（LocalRelevanceModel），缓存未命中时先由它判定，不确定时才调用 LLM
+            pipeline: 分级判定流水线（DecisionPipeline），默认按 WEBCHECKER_PIPELINE 配置
+            response_format: 单个网站判定的输出格式（json / text），默认 WEBCHECKER_RESPONSE_FORMAT 或 json
+            client_id: 客户端标识（见 monitor_registry.py），启用共享状态时活跃会话与计数按客户端区分
+            focus_calculator: 专注度计算器（FocusScoreCalculator），不提供则使用默认的会话数据文件
         """
+        self.current_task = None
+        self.current_task_key = None
+        self.client_id = client_id or DEFAULT_CLIENT_ID
+        self.check_history = CheckHistory()
+        self.session_start_time = None
+        self._engine = None
+        self._parent = parent
+        
+        if parent is not None:
+            self.client = parent.client
+            self.focus_calculator = parent.focus_calculator.fork()
+            self.shared_state = parent.shared_state
+            self.verdict_cache = parent.verdict_cache
+            self.warmup = parent.warmup
+            self.local_model = parent.local_model
+            self.pipeline = parent.pipeline
+            self.response_format = parent.response_format
+            return
+        
         if api_key:
-            self.client = Groq(api_key=api_key)
+            self.client = Groq(api_key=api_key, base_url=base_url)
         else:
-            self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+            self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"), base_url=base_url)
         
-        self.current_task = None
-        self.check_history = []
-        self.focus_calculator = FocusScoreCalculator()
-        self.session_start_time = None
+        self.focus_calculator = focus_calculator if focus_calculator is not None else FocusScoreCalculator()
+        self.shared_state = shared_state
+        if verdict_cache is None:
+            verdict_cache = SharedVerdictCache(shared_state) if shared_state is not None else VerdictCache()
+        self.verdict_cache = verdict_cache
+        self.warmup = warmup
+        self.local_model = local_model
+        self.pipeline = pipeline if pipeline is not None else DecisionPipeline()
+        self.response_format = response_format_mode(response_format)
     
-    def set_task(self, task_description):
+    def set_task(self, task_description, task_key=None, resources=None):
         """
         设置当前任务
         
         参数:
             task_description: 任务描述，例如"写作业"、"学习Python编程"
+            task_key: 任务指纹（可选），用作判定缓存的键，默认由任务描述计算
+            resources: 任务资源（可选，FlowState 格式），启用预热时其中的网址会被预先判定
         """
         self.current_task = task_description
-        self.check_history = []
+        self.current_task_key = task_key or task_fingerprint(task_description)
+        self.check_history.clear()
         self.session_start_time = time.time()
         
         # 开始专注会话
         task_id = f"task_{int(time.time())}"
-        self.focus_calculator.start_session(task_id, task_description)
+        if self.shared_state is not None:
+            # 多个 worker 进程对同一任务共用一个会话
+            now = time.time()
+            candidate = {
+                "session_id": f"session_{int(now)}_{os.getpid()}_{uuid.uuid4().hex[:6]}",
+                "task_id": task_id,
+                "task_name": task_description,
+                "start_time": now,
+            }
+            self.focus_calculator.resume_session(
+                self.shared_state.claim_session(self._shared_session_key(), candidate)
+            )
+        else:
+            self.focus_calculator.start_session(task_id, task_description)
         
         print(f"\n✓ 已设置当前任务: {task_description}")
         print(f"现在会监控打开的网站是否与此任务相关")
         print(f"专注会话已开始，将记录您的专注时长和网站访问情况\n")
+        
+        if self.warmup is not None:
+            self.warmup.start(self, resources)
     
     def check_website(self, website_url, website_description=None):
         """
@@ -64,6 +152,16 @@ class TaskFocusMonitor:
                 - action: str, 建议的操作（"allow" 或 "block"）
                 - reason: str, 判断理由
                 - confidence: str, 置信度（high/medium/low）
+                - stage: str, 给出判定的流水线阶段（rules/cache/local/small_llm/large_llm）
+                - cached: bool, 仅在命中判定缓存时出现
+        """
+        return self._check(self.pipeline.decide, website_url, website_description)
+    
+    def _check(self, decide, website_url, website_description=None):
+        """
+        用 decide（流水线的 decide 或 decide_llm）判定网站并记入检查历史
+        
+        未设置任务或判定出错时返回 action 为 "error" 的结果（格式同 check_website）
         """
         if not self.current_task:
             return {
@@ -73,7 +171,42 @@ class TaskFocusMonitor:
                 "confidence": "none"
             }
         
-        # 构建提示词
+        try:
+            # 规则 → 判定缓存 → 本地模型 → 小模型 → 大模型（见 decision_pipeline.py）
+            result = decide(self, website_url, website_description)
+            self._record_check(website_url, result)
+            return result
+            
+        except Exception as e:
+            return {
+                "is_relevant": False,
+                "action": "error",
+                "reason": f"API调用出错: {str(e)}",
+                "confidence": "none"
+            }
+    
+    def _local_verdict(self, website_url, website_description=None):
+        """
+        由本地模型判定（未配置或不够确定时返回 None）
+        
+        本地判定不写入判定缓存：重新训练模型后立即生效，且缓存中只保存 LLM 的判定
+        """
+        if self.local_model is None:
+            return None
+        with span("local"):
+            return self.local_model.classify(self.current_task, website_url, website_description)
+    
+    def _build_check_prompt(self, website_url, website_description=None):
+        """
+        构建单个网站判定的提示词
+        
+        参数:
+            website_url: 网站URL
+            website_description: 网站描述（可选）
+        
+        返回:
+            str: 提示词
+        """
         website_info = f"URL: {website_url}"
         if website_description:
             website_info += f"\n网站描述: {website_description}"
@@ -85,60 +218,372 @@ class TaskFocusMonitor:
 
 请判断这个网站是否与我的任务主题相关。
 
-判断标准：
-1. 如果网站内容直接有助于完成任务，判定为"相关"
-2. 如果网站是娱乐、社交、购物等与任务无关的内容，判定为"不相关"
-3. 如果网站是搜索引擎、工具类网站，需要根据任务判断
+{JUDGE_CRITERIA}
 
-请按以下格式回答：
-判断：相关 / 不相关
-置信度：高 / 中 / 低
-理由：[简短说明为什么相关或不相关]
+{output_instructions(self.response_format)}"""
+        return prompt
+    
+    def check_websites(self, websites, max_batch=None):
+        """
+        批量检查多个网站是否属于当前任务主题
+        
+        规则/缓存/本地模型能判定的网站直接返回；其余网站每 max_batch 个合并为一次 LLM 调用，
+        置信度不足的条目再合并升级到下一级模型，只有无法解析的条目才回退为逐个调用 LLM。
+        
+        参数:
+            websites: 网站列表，元素为 URL 字符串或 (url, description) 元组
+            max_batch: 单次 LLM 调用最多判定的网站数量，默认 DEFAULT_BATCH_SIZE
+        
+        返回:
+            list: 与输入顺序一致的结果字典列表（格式同 check_website）
+        """
+        items = [
+            (website, None) if isinstance(website, str) else (website[0], website[1])
+            for website in websites
+        ]
+        results = [None] * len(items)
+        
+        if not self.current_task:
+            return [self.check_website(url, description) for url, description in items]
+        
+        pending = []
+        for index, (url, description) in enumerate(items):
+            result = self.pipeline.pre_llm(self, url, description)
+            if result is not None:
+                self._record_check(url, result)
+                results[index] = result
+            else:
+                pending.append(index)
+        
+        decided, unparsed = self._batch_llm(
+            [items[i] for i in pending], self.current_task, self.current_task_key, max_batch
+        )
+        for position, result in decided.items():
+            index = pending[position]
+            self._record_check(items[index][0], result)
+            results[index] = result
+        
+        # 回退：批量响应中缺失或格式错误的条目单独判定（LLM 之前的阶段已执行过，不再重复）
+        for position in unparsed:
+            index = pending[position]
+            results[index] = self._check(self.pipeline.decide_llm, *items[index])
+        
+        return results
+    
+    def _batch_llm(self, items, task, task_key, max_batch=None, should_stop=None):
+        """
+        按流水线的 LLM 阶段批量判定：每 max_batch 个网站一次调用，置信度不足的条目合并升级到下一级
+        
+        判定结果写入判定缓存（不记入检查历史）
+        
+        参数:
+            items: (url, description) 元组列表
+            task: 任务描述
+            task_key: 任务指纹
+            max_batch: 单次 LLM 调用最多判定的网站数量，默认 DEFAULT_BATCH_SIZE
+            should_stop: 每次调用前检查的函数，返回 True 时停止（剩余条目既不判定也不算无法解析）
+        
+        返回:
+            tuple: (items 下标 -> 结果, 第一级无法解析的下标列表)；
+                   不传 should_stop 时第一级中单独成批的条目也归入无法解析，由调用方逐个判定
+        """
+        max_batch = max(1, max_batch or DEFAULT_BATCH_SIZE)
+        decided, unparsed = {}, []
+        pending = list(range(len(items)))
+        for level, (stage, model) in enumerate(self.pipeline.llm_stages):
+            escalate = []
+            for start in range(0, len(pending), max_batch):
+                if should_stop is not None and should_stop():
+                    return decided, unparsed
+                chunk = pending[start:start + max_batch]
+                if level == 0 and len(chunk) == 1 and should_stop is None:
+                    unparsed.extend(chunk)
+                    continue
+                began = time.perf_counter()
+                try:
+                    response_content = self._chat(
+                        self._build_batch_prompt([items[i] for i in chunk], task=task),
+                        max_tokens=min(4096, 96 * len(chunk) + 64),
+                        model=model
+                    )
+                    parsed = self._parse_batch_response(response_content, len(chunk))
+                except Exception as e:
+                    print(f"[WARN] 批量判定失败（{stage}）: {e}")
+                    self.pipeline.observe(stage, "error", count=len(chunk))
+                    parsed = {}
+                self.pipeline.record_latency(stage, time.perf_counter() - began)
+                
+                for position, index in enumerate(chunk, 1):
+                    result = parsed.get(position)
+                    if result is None:
+                        # 第一级无法解析的条目交给调用方；升级时失败则沿用上一级的判定
+                        if level == 0:
+                            unparsed.append(index)
+                        continue
+                    result["stage"] = stage
+                    if self.pipeline.accepts(result, level):
+                        self.pipeline.observe(stage, "hit")
+                    else:
+                        self.pipeline.observe(stage, "pass")
+                        escalate.append(index)
+                    decided[index] = result
+                    self.verdict_cache.put(task_key, items[index][0], result)
+            pending = escalate
+            if not pending:
+                break
+        return decided, unparsed
+    
+    def prefetch(self, websites, max_batch=None):
+        """
+        预先判定网站并写入判定缓存（不计入检查历史与专注会话，供 TaskWarmup 在后台调用）
+        
+        规则/缓存/本地模型能判定的网站跳过；其余按流水线的 LLM 阶段批量判定。当前任务在途中切换时停止。
+        
+        参数:
+            websites: 网站列表，元素为 URL 字符串或 (url, description) 元组
+            max_batch: 单次 LLM 调用最多判定的网站数量，默认 DEFAULT_BATCH_SIZE
+        
+        返回:
+            int: 新写入缓存的网站数
+        """
+        task, task_key = self.current_task, self.current_task_key
+        if not task:
+            return 0
+        items = [
+            (website, None) if isinstance(website, str) else (website[0], website[1])
+            for website in websites
+        ]
+        pending = [
+            (url, description) for url, description in items
+            if self.pipeline.pre_llm(self, url, description, task_key) is None
+        ]
+        decided, _ = self._batch_llm(
+            pending, task, task_key, max_batch, should_stop=lambda: self.current_task_key != task_key
+        )
+        return len(decided)
+    
+    def _build_batch_prompt(self, items, task=None):
+        """
+        构建批量判定的提示词
+        
+        参数:
+            items: (url, description) 元组列表
+            task: 任务描述，默认为当前任务
+        
+        返回:
+            str: 提示词
+        """
+        lines = []
+        for number, (url, description) in enumerate(items, 1):
+            line = f"{number}. URL: {url}"
+            if description:
+                line += f" | 网站描述: {description}"
+            lines.append(line)
+        website_list = "\n".join(lines)
+        
+        return f"""我正在执行的任务是：{task or self.current_task}
 
-只回答以上内容，不要添加其他说明。"""
+现在我想打开以下 {len(items)} 个网站：
+{website_list}
+
+请逐个判断这些网站是否与我的任务主题相关。
 
+{JUDGE_CRITERIA}
+
+请按编号逐行回答，每个网站一行，严格使用以下格式：
+编号. 判断：相关 / 不相关 | 置信度：高 / 中 / 低 | 理由：[简短说明]
+
+例如：
+1. 判断：相关 | 置信度：高 | 理由：官方文档，直接有助于完成任务
+
+只回答以上内容，不要添加其他说明。"""
+    
+    def _parse_batch_response(self, response_content, count):
+        """
+        解析批量判定的响应
+        
+        参数:
+            response_content: API返回的文本内容
+            count: 本批网站数量
+        
+        返回:
+            dict: 编号(从1开始) -> 结果字典；无法解析的编号不出现在结果中
+        """
+        parsed = {}
+        for line in response_content.splitlines():
+            match = _BATCH_LINE_RE.match(line)
+            if not match:
+                continue
+            number = int(match.group(1))
+            if not 1 <= number <= count or number in parsed:
+                continue
+            is_relevant = match.group(2) == "相关"
+            parsed[number] = {
+                "is_relevant": is_relevant,
+                "action": "allow" if is_relevant else "block",
+                "reason": match.group(4),
+                "confidence": _CONFIDENCE_MAP[match.group(3)],
+                "raw_response": line.strip()
+            }
+        return parsed
+    
+    def _chat(self, prompt, max_tokens=512, model=None, messages=None, json_mode=False):
+        """
+        调用 Groq 对话接口
+        
+        参数:
+            prompt: 用户提示词
+            max_tokens: 最大输出长度
+            model: 使用的模型，默认 llama-3.3-70b-versatile
+            messages: 完整的消息列表（修复追问时使用），提供时忽略 prompt
+            json_mode: 是否要求模型只输出 JSON 对象（response_format=json_object）
+        
+        返回:
+            str: 模型返回的文本内容
+        """
+        extra = {"response_format": JSON_RESPONSE_FORMAT} if json_mode else {}
+        start = time.perf_counter()
+        try:
+            with span("llm"):
+                chat_completion = self.client.chat.completions.create(
+                    messages=messages or self._build_messages(prompt),
+                    model=model or "llama-3.3-70b-versatile",
+                    temperature=0.2,  # 低温度以获得更一致的判断
+                    max_tokens=max_tokens,
+                    **extra
+                )
+        except Exception as e:
+            record_error("llm", e)
+            raise
+        finally:
+            LLM_LATENCY.labels("sync").observe(time.perf_counter() - start)
+        return chat_completion.choices[0].message.content
+    
+    def _ask_verdict(self, prompt, website_url, model=None):
+        """
+        调用 LLM 判定单个网站并严格解析；回答无法解析时带上错误的回答追问一次
+        
+        参数:
+            prompt: _build_check_prompt 生成的提示词
+            website_url: 网站URL
+            model: 使用的模型
+        
+        返回:
+            dict: 解析后的结果
+        
+        异常:
+            VerdictParseError: 追问后仍无法解析
+        """
+        json_mode = self.response_format == "json"
+        max_tokens = max_tokens_for(self.response_format)
+        messages = self._build_messages(prompt)
+        response_content = self._chat(prompt, max_tokens=max_tokens, model=model, messages=messages,
+                                      json_mode=json_mode)
         try:
-            # 调用 Groq API
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的任务专注度助手，帮助用户判断网站是否与当前任务相关，从而保持专注。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.2,  # 低温度以获得更一致的判断
-                max_tokens=512
+            return self._parse_verdict(response_content, website_url)
+        except VerdictParseError as e:
+            messages = repair_messages(messages, response_content, e, self.response_format)
+        response_content = self._chat(prompt, max_tokens=max_tokens, model=model, messages=messages,
+                                      json_mode=json_mode)
+        return self._parse_verdict(response_content, website_url, repaired=True)
+    
+    async def _ask_verdict_async(self, prompt, website_url, model=None, timeout=None):
+        """
+        _ask_verdict 的异步版本，经由异步判定引擎
+        
+        参数:
+            timeout: 含追问在内的截止时间（秒），None 使用引擎默认值
+        
+        异常:
+            VerdictParseError: 追问后仍无法解析
+            asyncio.TimeoutError: 超过截止时间
+        """
+        json_mode = self.response_format == "json"
+        extra = {"response_format": JSON_RESPONSE_FORMAT} if json_mode else {}
+        max_tokens = max_tokens_for(self.response_format)
+        deadline = None if not timeout else time.monotonic() + timeout
+        messages = self._build_messages(prompt)
+        with span("llm"):
+            response_content = await self.engine.complete(
+                messages, max_tokens=max_tokens, timeout=timeout, model=model, **extra
             )
-            
-            # 获取响应内容
-            response_content = chat_completion.choices[0].message.content
-            
-            # 解析响应
-            result = self._parse_check_response(response_content, website_url)
-            
-            # 记录检查历史
-            self.check_history.append({
-                "timestamp": datetime.now().isoformat(),
-                "website_url": website_url,
-                "task": self.current_task,
-                "result": result
-            })
-            
-            # 记录到专注度计算器
-            self.focus_calculator.record_website_check(
-                website_url=website_url,
-                is_relevant=result["is_relevant"],
-                confidence=result["confidence"],
-                reason=result["reason"]
+        try:
+            return self._parse_verdict(response_content, website_url)
+        except VerdictParseError as e:
+            messages = repair_messages(messages, response_content, e, self.response_format)
+        remaining = timeout if deadline is None else deadline - time.monotonic()
+        if deadline is not None and remaining <= 0:
+            raise asyncio.TimeoutError()
+        with span("llm"):
+            response_content = await self.engine.complete(
+                messages, max_tokens=max_tokens, timeout=remaining, model=model, **extra
             )
-            
-            return result
-            
+        return self._parse_verdict(response_content, website_url, repaired=True)
+    
+    def _parse_verdict(self, response_content, website_url, repaired=False):
+        """解析单个网站的判定并记录解析结果（ok / repaired / failed）"""
+        try:
+            with span("parse"):
+                result = self._parse_check_response(response_content, website_url)
+        except VerdictParseError:
+            if repaired:
+                VERDICT_PARSE.labels("failed").inc()
+            raise
+        VERDICT_PARSE.labels("repaired" if repaired else "ok").inc()
+        return result
+    
+    @staticmethod
+    def _build_messages(prompt):
+        """构建发送给模型的消息列表"""
+        return [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    @property
+    def engine(self):
+        """异步判定引擎（首次使用时创建，与同步客户端共用 API 密钥与地址；有 parent 时共用它的引擎）"""
+        if self._engine is None and self._parent is not None:
+            return self._parent.engine
+        if self._engine is None:
+            from async_engine import AsyncClassificationEngine
+            self._engine = AsyncClassificationEngine(
+                api_key=self.client.api_key, base_url=getattr(self.client, "base_url", None)
+            )
+        return self._engine
+    
+    async def check_website_async(self, website_url, website_description=None, timeout=None):
+        """
+        check_website 的异步版本，LLM 调用经由异步判定引擎
+        
+        参数:
+            website_url: 要检查的网站URL
+            website_description: 网站描述（可选）
+            timeout: 截止时间（秒），None 使用引擎默认值
+        
+        返回:
+            dict: 格式同 check_website；超时返回 action 为 "error" 的结果
+        """
+        if not self.current_task:
+            return self.check_website(website_url, website_description)
+        
+        try:
+            result = await self.pipeline.decide_async(self, website_url, website_description, timeout=timeout)
+        except asyncio.TimeoutError:
+            return {
+                "is_relevant": False,
+                "action": "error",
+                "reason": "API调用超时",
+                "confidence": "none"
+            }
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             return {
                 "is_relevant": False,
@@ -146,10 +591,61 @@ class TaskFocusMonitor:
                 "reason": f"API调用出错: {str(e)}",
                 "confidence": "none"
             }
+        
+        self._record_check(website_url, result)
+        return result
+    
+    async def check_many_async(self, websites, timeout=None):
+        """
+        并发检查多个网站（并发度由引擎的信号量限制）
+        
+        参数:
+            websites: 网站列表，元素为 URL 字符串或 (url, description) 元组
+            timeout: 每个网站的截止时间（秒）
+        
+        返回:
+            list: 与输入顺序一致的结果列表
+        """
+        items = [
+            (website, None) if isinstance(website, str) else (website[0], website[1])
+            for website in websites
+        ]
+        return await asyncio.gather(*(
+            self.check_website_async(url, description, timeout=timeout)
+            for url, description in items
+        ))
+    
+    def _shared_session_key(self):
+        """共享状态中活跃会话的键（客户端 + 任务指纹）"""
+        return session_key(self.client_id, self.current_task_key)
+    
+    def _record_check(self, website_url, result):
+        """记录检查历史，并同步到专注度计算器"""
+        self.check_history.append({
+            "timestamp": datetime.now().isoformat(),
+            "website_url": website_url,
+            "task": self.current_task,
+            "result": result
+        })
+        
+        self.focus_calculator.record_website_check(
+            website_url=website_url,
+            is_relevant=result["is_relevant"],
+            confidence=result["confidence"],
+            reason=result["reason"]
+        )
+        
+        session = self.focus_calculator.current_session
+        if self.shared_state is not None and session is not None:
+            try:
+                self.shared_state.record_check(self._shared_session_key(), session.session_id,
+                                               result["is_relevant"], client_id=self.client_id)
+            except Exception as e:
+                print(f"[WARN] 更新共享计数失败: {e}")
     
     def _parse_check_response(self, response_content, website_url):
         """
-        解析API响应内容
+        解析API响应内容（JSON 对象或“判断/置信度/理由”三行文本，见 verdict_protocol.py）
         
         参数:
             response_content: API返回的文本内容
@@ -157,34 +653,11 @@ class TaskFocusMonitor:
         
         返回:
             dict: 解析后的结果
-        """
-        # 判断是否相关
-        is_relevant = "相关" in response_content and "不相关" not in response_content.split("\n")[0]
-        
-        # 提取置信度
-        confidence = "medium"
-        if "高" in response_content:
-            confidence = "high"
-        elif "低" in response_content:
-            confidence = "low"
-        
-        # 提取理由
-        reason = response_content
-        lines = response_content.split("\n")
-        for line in lines:
-            if "理由" in line:
-                reason = line.replace("理由：", "").replace("理由:", "").strip()
-                break
         
-        result = {
-            "is_relevant": is_relevant,
-            "action": "allow" if is_relevant else "block",
-            "reason": reason,
-            "confidence": confidence,
-            "raw_response": response_content
-        }
-        
-        return result
+        异常:
+            VerdictParseError: 回答不符合约定的格式
+        """
+        return parse_verdict(response_content)
     
     def print_check_result(self, website_url, result):
         """
@@ -215,9 +688,18 @@ class TaskFocusMonitor:
         获取检查历史记录
         
         返回:
-            list: 历史记录列表
+            list: 历史记录列表（最近 WEBCHECKER_HISTORY_SIZE 条）
         """
-        return self.check_history
+        return self.check_history.snapshot()
+    
+    def get_check_stats(self):
+        """
+        获取当前任务的检查统计（写入时累计，不遍历历史）
+        
+        返回:
+            dict: total / relevant / irrelevant / by_confidence / top_domains / retained / spilled
+        """
+        return self.check_history.stats()
     
     def save_history(self, filename="task_focus_history.json"):
         """
@@ -229,7 +711,7 @@ class TaskFocusMonitor:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump({
                 "task": self.current_task,
-                "history": self.check_history
+                "history": self.check_history.snapshot()
             }, f, ensure_ascii=False, indent=2)
         print(f"✓ 历史记录已保存到 {filename}")
     
@@ -244,8 +726,17 @@ class TaskFocusMonitor:
             print("❌ 没有活跃的任务")
             return None
         
+        session = self.focus_calculator.current_session
+        if self.shared_state is not None and session is not None:
+            # 会话计数以所有 worker 的记录为准
+            counts = self.shared_state.session_counts(session.session_id)
+            session.relevant_websites = counts["relevant"]
+            session.irrelevant_websites = counts["irrelevant"]
+            self.shared_state.release_session(self._shared_session_key(), session.session_id)
+        
         # 结束专注会话
         ended_session = self.focus_calculator.end_session()
+        self.check_history.flush()
         
         if ended_session:
             # 打印任务总结
@@ -275,6 +766,7 @@ class TaskFocusMonitor:
             
             # 清除当前任务
             self.current_task = None
+            self.current_task_key = None
             self.session_start_time = None
             
             return {
@@ -310,9 +802,10 @@ class TaskFocusMonitor:
             print("暂无检查记录")
             return
         
-        total = len(self.check_history)
-        relevant = sum(1 for h in self.check_history if h['result']['is_relevant'])
-        irrelevant = total - relevant
+        stats = self.check_history.stats()
+        total = stats["total"]
+        relevant = stats["relevant"]
+        irrelevant = stats["irrelevant"]
         
         print("\n" + "=" * 70)
         print("任务专注度统计")
@@ -357,7 +850,66 @@ class TaskFocusMonitor:
                 "confidence": "none"
             }
         
-        # 构建任务描述
+        with span("task"):
+            self._apply_flowstate_task(task_data)
+            website_url, website_description = self._describe_website(website_data)
+        
+        # 检查网站
+        return self.check_website(website_url, website_description)
+    
+    async def check_from_flowstate_async(self, task_data, website_data, timeout=None):
+        """
+        check_from_flowstate 的异步版本
+        
+        参数:
+            task_data: FlowState 任务数据
+            website_data: FlowState 网站数据
+            timeout: 截止时间（秒）
+        
+        返回:
+            dict: 检查结果
+        """
+        if not task_data or not website_data:
+            return self.check_from_flowstate(task_data, website_data)
+        
+        with span("task"):
+            self._apply_flowstate_task(task_data)
+            website_url, website_description = self._describe_website(website_data)
+        return await self.check_website_async(website_url, website_description, timeout=timeout)
+    
+    def check_websites_from_flowstate(self, task_data, websites_data, max_batch=None):
+        """
+        从 FlowState 数据批量检查网站相关性
+        
+        参数:
+            task_data: FlowState 任务数据
+            websites_data: FlowState 网站数据列表
+            max_batch: 单次 LLM 调用最多判定的网站数量
+        
+        返回:
+            list: 与输入顺序一致的检查结果列表
+        """
+        if not task_data:
+            return [{
+                "is_relevant": False,
+                "action": "error",
+                "reason": "FlowState 数据不完整",
+                "confidence": "none"
+            } for _ in websites_data]
+        
+        self._apply_flowstate_task(task_data)
+        return self.check_websites(
+            [self._describe_website(website) for website in websites_data],
+            max_batch=max_batch
+        )
+    
+    def _apply_flowstate_task(self, task_data):
+        """
+        根据 FlowState 任务数据设置当前任务（任务未变化时不重开会话）
+        
+        参数:
+            task_data: FlowState 任务数据
+        """
         task_name = task_data.get('name', '未知任务')
         resources = task_data.get('resources', [])
         
@@ -384,21 +936,41 @@ class TaskFocusMonitor:
             if resource_descriptions:
                 task_description += f"\n相关资源: {', '.join(resource_descriptions)}"
         
-        # 设置任务
-        self.set_task(task_description)
+        # 任务未变化时沿用当前会话，避免每次检查都重开专注会话
+        task_key = self.flowstate_task_key(task_data)
+        if task_key != self.current_task_key:
+            self.set_task(task_description, task_key=task_key, resources=resources)
+    
+    @staticmethod
+    def flowstate_task_key(task_data):
+        """
+        FlowState 任务数据的任务指纹（与 check_from_flowstate 设置的 current_task_key 一致）
+        
+        参数:
+            task_data: FlowState 任务数据
+        
+        返回:
+            str: 任务指纹
+        """
+        return task_fingerprint(task_data.get('name', '未知任务'), task_data.get('resources', []))
+    
+    @staticmethod
+    def _describe_website(website_data):
+        """
+        从 FlowState 网站数据提取 URL 与网站描述
         
-        # 获取网站信息
+        返回:
+            tuple: (url, description)，无描述时 description 为 None
+        """
         website_url = website_data.get('url', '')
         website_title = website_data.get('title', '')
         app_id = website_data.get('app_id', '')
         
-        # 构建网站描述
         website_description = website_title if website_title else ""
         if app_id and app_id != "browser":
             website_description += f" (应用: {app_id})"
         
-        # 检查网站
-        return self.check_website(website_url, website_description if website_description else None)
+        return website_url, website_description if website_description else None
 
 
 def main():
@@ -12,10 +12,13 @@ API 后端测试（基于 pytest）
 """
 
 import importlib
+import json
 import sys
 from pathlib import Path
 import pytest
 
+from verdict_cache import VerdictCache
+
 
 @pytest.fixture(scope="module")
 def api():
@@ -40,6 +43,12 @@ def client(api, monkeypatch, tmp_path):
     monkeypatch.setattr(api, "EVENT_LOG", log_dir / "website_events.jsonl", raising=False)
     monkeypatch.setattr(api, "RESULT_LOG", log_dir / "classification_results.jsonl", raising=False)
 
+    # 不在后台预热判定缓存（预热线程会调用真实的 API 客户端）
+    monkeypatch.setattr(api.monitor, "warmup", None, raising=True)
+    monkeypatch.setattr(api.monitor, "local_model", None, raising=True)
+    # 使用内存中的判定缓存，桩判定不写入仓库里的 verdict_cache.json，也不会命中上次运行留下的缓存
+    monkeypatch.setattr(api.monitor, "verdict_cache", VerdictCache(cache_file=""), raising=True)
+
     # 打桩 FlowStateBridge.get_current_task
     fake_task = {
         "id": "task_1",
@@ -96,6 +105,14 @@ def test_classify_missing_website_url(client):
     assert resp2.status_code == 400
 
 
+def test_classify_rejects_invalid_timeout(client):
+    c, _ = client
+    for timeout in ("abc", 0, -1, True, [5], "inf"):
+        resp = c.post("/classify_website", json={"url": "https://docs.python.org", "timeout": timeout})
+        assert resp.status_code == 400
+        assert resp.get_json() == {"ok": False, "error": "invalid timeout"}
+
+
 def test_classify_uses_bridge_task_when_task_not_provided(client):
     c, api = client
     payload = {
@@ -110,7 +127,8 @@ def test_classify_uses_bridge_task_when_task_not_provided(client):
     assert data["is_relevant"] is True
     assert data["action"] == "allow"
     assert data["confidence"] in {"high", "medium", "low"}
-    # 验证日志文件写入
+    # 验证日志文件写入（日志由后台线程写盘，先等待刷新）
+    assert api.log_writer.flush(timeout=5)
     assert api.EVENT_LOG.exists()
     assert api.RESULT_LOG.exists()
     assert api.EVENT_LOG.read_text(encoding="utf-8").strip() != ""
@@ -156,12 +174,13 @@ def test_classify_respects_explicit_task_over_bridge(client, monkeypatch):
 def test_stats_reflects_history(client, monkeypatch):
     c, api = client
 
-    fake_history = [
-        {"result": {"is_relevant": True}},
-        {"result": {"is_relevant": False}},
-        {"result": {"is_relevant": True}},
-    ]
-    monkeypatch.setattr(api.monitor, "get_history", lambda: fake_history, raising=True)
+    from check_history import CheckHistory
+
+    history = CheckHistory(max_entries=2, spill_file="")
+    for url, is_relevant in [("https://docs.python.org/3/", True), ("https://www.bilibili.com", False),
+                             ("https://docs.python.org/3/library/", True)]:
+        history.append({"website_url": url, "result": {"is_relevant": is_relevant, "confidence": "high"}})
+    monkeypatch.setattr(api.monitor, "check_history", history, raising=True)
 
     resp = c.get("/stats")
     assert resp.status_code == 200
@@ -170,3 +189,163 @@ def test_stats_reflects_history(client, monkeypatch):
     assert data["total_checks"] == 3
     assert data["relevant"] == 2
     assert data["irrelevant"] == 1
+    assert data["by_confidence"] == {"high": 3}
+    assert set(data["pipeline"]) == set(api.monitor.pipeline.stages)
+    assert data["top_domains"][0] == {"domain": "docs.python.org", "relevant": 2, "irrelevant": 0}
+
+
+def test_classify_websites_batch(client, monkeypatch):
+    c, api = client
+
+    captured = {}
+
+    def fake_batch(task, websites):
+        captured["task"] = task
+        captured["websites"] = websites
+        return [
+            {"is_relevant": "python" in w["url"], "action": "allow" if "python" in w["url"] else "block",
+             "reason": "批量判定", "confidence": "high"}
+            for w in websites
+        ]
+
+    monkeypatch.setattr(api.monitor, "check_websites_from_flowstate", fake_batch, raising=True)
+
+    payload = {
+        "websites": [
+            {"url": "https://docs.python.org", "title": "Python 文档"},
+            "https://www.youtube.com",
+        ],
+        "source": "pytest",
+    }
+    resp = c.post("/classify_websites", json=payload)
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["ok"] is True
+    assert [r["is_relevant"] for r in data["results"]] == [True, False]
+    assert data["results"][1]["url"] == "https://www.youtube.com"
+    assert captured["task"]["id"] == "task_1"
+    assert captured["websites"][1]["url"] == "https://www.youtube.com"
+    assert api.log_writer.flush(timeout=5)
+    assert len(api.RESULT_LOG.read_text(encoding="utf-8").strip().splitlines()) == 2
+
+
+def test_classify_websites_rejects_bad_input(client, monkeypatch):
+    c, api = client
+    assert c.post("/classify_websites", json={}).status_code == 400
+    assert c.post("/classify_websites", json={"websites": [{"title": "no url"}]}).status_code == 400
+
+    monkeypatch.setattr(api, "MAX_BATCH_WEBSITES", 2, raising=True)
+    resp = c.post("/classify_websites", json={"websites": ["a.com", "b.com", "c.com"]})
+    assert resp.status_code == 400
+
+
+def test_concurrent_identical_requests_are_coalesced(client, monkeypatch):
+    import threading
+    import time
+
+    _, api = client
+    monkeypatch.setattr(api, "inflight", api.SingleFlight(), raising=True)
+
+    calls = []
+    release = threading.Event()
+
+    def slow_check(task, website):
+        calls.append(website["url"])
+        release.wait(2)
+        return {"is_relevant": True, "action": "allow", "reason": "学习资源", "confidence": "high"}
+
+    monkeypatch.setattr(api.monitor, "check_from_flowstate", slow_check, raising=True)
+
+    responses = []
+
+    def post(url):
+        resp = api.app.test_client().post("/classify_website", json={"website": {"url": url}})
+        responses.append(resp.get_json())
+
+    urls = ["https://docs.python.org/3/", "https://www.docs.python.org/3", "http://docs.python.org/3#intro"]
+    threads = [threading.Thread(target=post, args=(u,)) for u in urls]
+    for t in threads:
+        t.start()
+    deadline = time.time() + 2
+    while api.inflight.stats()["coalesced"] < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r["ok"] and r["is_relevant"] for r in responses)
+    assert sorted(r["coalesced"] for r in responses) == [False, True, True]
+    stats = api.app.test_client().get("/stats").get_json()
+    assert stats["coalescing"]["coalesced"] == 2
+    assert stats["coalescing"]["executed"] == 1
+
+
+def test_metrics_endpoint(client):
+    c, api = client
+
+    assert c.post("/classify_website", json={"website": {"url": "https://docs.python.org"}}).status_code == 200
+    assert c.post("/classify_website", json={}).status_code == 400
+
+    resp = c.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.content_type.startswith("text/plain")
+    text = resp.get_data(as_text=True)
+    assert 'webchecker_http_requests_total{method="POST",endpoint="/classify_website",status="200"}' in text
+    assert 'webchecker_http_requests_total{method="POST",endpoint="/classify_website",status="400"}' in text
+    assert 'webchecker_http_request_seconds_count{endpoint="/classify_website"}' in text
+    # 正在处理的只有 /metrics 本身
+    assert "webchecker_http_requests_in_flight 1" in text
+    assert "webchecker_verdict_cache_hits_total" in text
+    assert "webchecker_log_queue_depth" in text
+
+    api.log_writer.flush(timeout=5)
+    text = c.get("/metrics").get_data(as_text=True)
+    assert 'webchecker_log_write_seconds_count{log="website_events.jsonl"}' in text
+
+
+def test_server_timing_header_and_trace_log(client, monkeypatch):
+    c, api = client
+    monkeypatch.setattr(api, "TRACE_ENABLED", True)
+    monkeypatch.setattr(api, "TRACE_LOG", api.LOG_DIR / "request_traces.jsonl")
+
+    resp = c.post("/classify_website", json={"website": {"url": "https://docs.python.org"}},
+                  headers={"X-Request-Id": "req-1"})
+    assert resp.status_code == 200
+    names = [part.split(";")[0] for part in resp.headers["Server-Timing"].split(", ")]
+    assert names == ["bridge", "log", "classify", "total"]
+    assert names[-1] == "total"
+
+    api.log_writer.flush(timeout=5)
+    lines = (api.LOG_DIR / "request_traces.jsonl").read_text(encoding="utf-8").splitlines()
+    record = json.loads(lines[-1])
+    assert record["trace_id"] == "req-1"
+    assert record["path"] == "/classify_website" and record["status"] == 200
+    assert {s["name"] for s in record["spans"]} >= {"bridge", "classify", "log"}
+
+
+def test_clients_are_isolated_by_client_id(client, monkeypatch, tmp_path):
+    from focus_score_calculator import FocusScoreCalculator
+    from monitor_registry import MonitorRegistry
+    from stub_llm import StubLLMClient
+
+    c, api = client
+    monkeypatch.setattr(api.monitor, "client", StubLLMClient())
+    monkeypatch.setattr(api.monitor, "focus_calculator", FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monkeypatch.setattr(api, "monitors", MonitorRegistry(
+        factory=lambda client_id: api.TaskFocusMonitor(parent=api.monitor, client_id=client_id),
+        default=lambda: api.monitor))
+
+    for client_id, task in (("alice", "学习Python编程"), ("bob", "写数学作业")):
+        resp = c.post("/classify_website", headers={"X-Client-Id": client_id},
+                      json={"task": {"id": client_id, "name": task}, "website": {"url": "https://docs.python.org"}})
+        assert resp.status_code == 200
+    resp = c.post("/classify_website", json={"client_id": "bob", "task": {"id": "bob", "name": "写数学作业"},
+                                             "website": {"url": "https://www.bilibili.com"}})
+    assert resp.get_json()["is_relevant"] is False
+
+    assert api.monitors.get("alice").current_task == "任务: 学习Python编程"
+    assert api.monitors.get("bob").current_task == "任务: 写数学作业"
+    assert c.get("/stats", headers={"X-Client-Id": "bob"}).get_json()["total_checks"] == 2
+    stats = c.get("/stats?client_id=alice").get_json()
+    assert stats["total_checks"] == 1 and stats["clients"]["clients"] == 2
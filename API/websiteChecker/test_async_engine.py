@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步判定引擎测试（基于 pytest）
+- 信号量限制并发、截止时间、取消
+- TaskFocusMonitor 的异步检查路径
+运行：
+    pytest -q API/websiteChecker/test_async_engine.py
+"""
+
+import asyncio
+import concurrent.futures
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from async_engine import AsyncClassificationEngine
+from focus_score_calculator import FocusScoreCalculator
+from stub_llm import AsyncStubLLMClient
+from task_focus_monitor import TaskFocusMonitor
+from verdict_cache import VerdictCache
+
+
+def fake_async_client(delay=0.05):
+    """模拟 AsyncGroq：固定延迟后返回固定内容"""
+    content = "判断：相关\n置信度：高\n理由：官方文档"
+    return AsyncStubLLMClient(latency=delay, responder=lambda messages, **kwargs: content)
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_concurrency_is_bounded_by_semaphore():
+    engine = AsyncClassificationEngine(client=fake_async_client(delay=0.05), max_concurrency=4)
+
+    async def many():
+        return await asyncio.gather(*(engine.complete(MESSAGES) for _ in range(12)))
+
+    started = time.time()
+    results = engine.run(many())
+    elapsed = time.time() - started
+    engine.close()
+
+    assert len(results) == 12
+    assert engine.stats()["max_in_flight"] == 4
+    assert engine.stats()["completed"] == 12
+    # 12 个调用、并发 4 => 至少 3 轮
+    assert elapsed >= 0.15
+
+
+def test_deadline_raises_timeout_and_counts_it():
+    engine = AsyncClassificationEngine(client=fake_async_client(delay=1.0))
+    with pytest.raises(asyncio.TimeoutError):
+        engine.run(engine.complete(MESSAGES, timeout=0.05))
+    engine.close()
+    assert engine.stats()["timeouts"] == 1
+
+
+def test_submitted_call_can_be_cancelled():
+    engine = AsyncClassificationEngine(client=fake_async_client(delay=1.0))
+    future = engine.submit(engine.complete(MESSAGES, timeout=0))
+    time.sleep(0.05)
+    future.cancel()
+    with pytest.raises(concurrent.futures.CancelledError):
+        future.result(1)
+    time.sleep(0.05)
+    engine.close()
+    assert engine.stats()["cancelled"] == 1
+
+
+def test_monitor_async_checks_share_cache_and_history(tmp_path):
+    client = fake_async_client(delay=0.01)
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor._engine = AsyncClassificationEngine(client=client, max_concurrency=8)
+    monitor.set_task("学习Python编程")
+
+    urls = ["https://docs.python.org", "https://realpython.com", "https://pypi.org"]
+    results = monitor.engine.run(monitor.check_many_async(urls))
+    again = monitor.engine.run(monitor.check_website_async("https://docs.python.org/"))
+    monitor.engine.close()
+
+    assert all(r["is_relevant"] for r in results)
+    assert again["cached"] is True
+    assert client.calls == 3
+    assert len(monitor.get_history()) == 4
+
+
+def test_monitor_async_timeout_returns_error_result(tmp_path):
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor._engine = AsyncClassificationEngine(client=fake_async_client(delay=1.0))
+    task = {"id": "task_1", "name": "学习Python编程", "resources": []}
+
+    result = monitor.engine.run(
+        monitor.check_from_flowstate_async(task, {"url": "https://docs.python.org"}, timeout=0.05)
+    )
+    monitor.engine.close()
+
+    assert result["action"] == "error"
+    assert monitor.verdict_cache.stats()["entries"] == 0
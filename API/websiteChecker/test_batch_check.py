@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量判定测试（基于 pytest）
+- 多个网站合并为一次 LLM 调用
+- 无法解析的条目回退为单独调用
+- 已缓存的条目不进入批量请求
+运行：
+    pytest -q API/websiteChecker/test_batch_check.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from focus_score_calculator import FocusScoreCalculator
+from stub_llm import StubLLMClient
+from task_focus_monitor import TaskFocusMonitor
+from verdict_cache import VerdictCache
+
+
+def make_monitor(tmp_path, answer):
+    calls = []
+
+    def respond(messages, **kwargs):
+        prompt = messages[-1]["content"]
+        calls.append(prompt)
+        return answer(prompt)
+
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.client = StubLLMClient(responder=respond)
+    monitor.set_task("学习Python编程")
+    return monitor, calls
+
+
+def test_batch_parses_numbered_verdicts_in_one_call(tmp_path):
+    def answer(prompt):
+        return ("1. 判断：相关 | 置信度：高 | 理由：官方文档\n"
+                "2. 判断：不相关 | 置信度：高 | 理由：视频娱乐\n"
+                "3、判断: 相关｜置信度: 中｜理由: 编程问答")
+
+    monitor, calls = make_monitor(tmp_path, answer)
+    results = monitor.check_websites(["https://docs.python.org", "https://youtube.com", "https://stackoverflow.com"])
+
+    assert len(calls) == 1
+    assert [r["is_relevant"] for r in results] == [True, False, True]
+    assert [r["confidence"] for r in results] == ["high", "high", "medium"]
+    assert results[1]["action"] == "block"
+    assert results[2]["reason"] == "编程问答"
+    assert len(monitor.get_history()) == 3
+
+
+def test_batch_falls_back_only_for_unparsed_items(tmp_path):
+    def answer(prompt):
+        if "逐个判断" in prompt:
+            return "1. 判断：相关 | 置信度：高 | 理由：官方文档\n2. 我不确定"
+        return "判断：不相关\n置信度：高\n理由：社交网站"
+
+    monitor, calls = make_monitor(tmp_path, answer)
+    results = monitor.check_websites(["https://docs.python.org", "https://reddit.com"])
+
+    assert len(calls) == 2
+    assert "reddit.com" in calls[1] and "docs.python.org" not in calls[1]
+    assert results[0]["is_relevant"] is True
+    assert results[1]["is_relevant"] is False
+    # 回退的条目不再重复查询规则与缓存
+    assert monitor.verdict_cache.stats()["misses"] == 2
+    assert monitor.pipeline.stats()["cache"]["entered"] == 2
+
+
+def test_batch_skips_cached_items_and_respects_batch_size(tmp_path):
+    def answer(prompt):
+        count = prompt.count("URL:")
+        return "\n".join(f"{i}. 判断：相关 | 置信度：低 | 理由：x" for i in range(1, count + 1))
+
+    monitor, calls = make_monitor(tmp_path, answer)
+    monitor.check_websites(["https://a.com", "https://b.com"])
+    assert len(calls) == 1
+
+    results = monitor.check_websites(
+        ["https://a.com", "https://c.com", "https://d.com", "https://e.com", "https://f.com"], max_batch=2
+    )
+    assert results[0]["cached"] is True
+    assert all(r["is_relevant"] for r in results)
+    # c,d 一批，e,f 一批
+    assert len(calls) == 3
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+check_history 的测试：环形缓冲区、累计计数与溢出到磁盘
+"""
+
+import json
+
+from check_history import OTHER_DOMAIN, CheckHistory
+
+
+def _entry(url, is_relevant, confidence="high"):
+    return {
+        "timestamp": "2025-10-18T15:30:00",
+        "website_url": url,
+        "task": "学习Python",
+        "result": {"is_relevant": is_relevant, "action": "allow" if is_relevant else "block",
+                   "reason": "", "confidence": confidence, "raw_response": "是，相关"},
+    }
+
+
+def test_buffer_is_bounded_but_counters_cover_everything():
+    history = CheckHistory(max_entries=3, spill_file="")
+    for i in range(10):
+        history.append(_entry(f"https://www.site{i % 2}.com/page{i}", i % 2 == 0, "high" if i < 6 else "low"))
+
+    assert len(history) == 3
+    assert [h["website_url"] for h in history] == [f"https://www.site{i % 2}.com/page{i}" for i in (7, 8, 9)]
+    assert "raw_response" not in history[-1]["result"]
+
+    stats = history.stats()
+    assert (stats["total"], stats["relevant"], stats["irrelevant"]) == (10, 5, 5)
+    assert stats["by_confidence"] == {"high": 6, "low": 4}
+    assert {d["domain"]: d["relevant"] for d in stats["top_domains"]} == {"site0.com": 5, "site1.com": 0}
+    assert stats["retained"] == 3 and stats["spilled"] == 7
+
+    history.clear()
+    assert not history and history.stats()["total"] == 0
+
+
+def test_domain_counters_are_capped():
+    history = CheckHistory(max_entries=10, spill_file="", max_domains=2)
+    for url in ["https://a.com", "https://b.com", "https://c.com", "https://d.com", "https://a.com"]:
+        history.append(_entry(url, True))
+    domains = {d["domain"]: d["relevant"] for d in history.stats()["top_domains"]}
+    assert domains == {"a.com": 2, "b.com": 1, OTHER_DOMAIN: 2}
+
+
+def test_evicted_entries_spill_to_disk(tmp_path):
+    spill = tmp_path / "history.jsonl"
+    history = CheckHistory(max_entries=2, spill_file=str(spill))
+    for i in range(5):
+        history.append(_entry(f"https://docs.python.org/{i}", True))
+    history.flush()
+
+    spilled = [json.loads(line) for line in spill.read_text(encoding="utf-8").splitlines()]
+    assert [r["website_url"] for r in spilled] == [f"https://docs.python.org/{i}" for i in range(3)]
+    assert [h["website_url"] for h in history] == ["https://docs.python.org/3", "https://docs.python.org/4"]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+decision_pipeline 的测试：阶段配置、域名规则、小模型升级到大模型、批量升级与各阶段统计
+"""
+
+import pytest
+
+from decision_pipeline import DecisionPipeline, DomainRules, parse_stages
+from focus_score_calculator import FocusScoreCalculator
+from stub_llm import AsyncStubLLMClient, StubLLMClient
+from task_focus_monitor import TaskFocusMonitor
+from verdict_cache import VerdictCache
+
+SMALL, LARGE = "small-model", "large-model"
+
+
+def scripted_client(answers):
+    """按模型返回不同答案的桩客户端，client.models 记录每次调用的模型"""
+    models = []
+
+    def respond(messages, model=None, **kwargs):
+        models.append(model)
+        answer = answers[model]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer(messages[-1]["content"]) if callable(answer) else answer
+
+    client = StubLLMClient(responder=respond)
+    client.models = models
+    return client
+
+
+def _monitor(tmp_path, answers, stages="rules,cache,small_llm,large_llm", rules=None):
+    pipeline = DecisionPipeline(stages=stages, rules=rules or DomainRules(), small_model=SMALL,
+                                large_model=LARGE, min_confidence="medium")
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""), pipeline=pipeline,
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.client = scripted_client(answers)
+    monitor.set_task("任务: 写数学作业")
+    return monitor
+
+
+def test_parse_stages_validates():
+    assert parse_stages("rules, cache,large_llm") == ["rules", "cache", "large_llm"]
+    for spec in ("cache,gpt", "cache,cache,large_llm", "rules,cache"):
+        with pytest.raises(ValueError):
+            parse_stages(spec)
+
+
+def test_domain_rules_task_scope_wins():
+    rules = DomainRules(allow=["youtube.com"], block=["www.taobao.com"],
+                        tasks={"数学": {"block": ["youtube.com"]}})
+    assert rules.match("写数学作业", "https://m.youtube.com/watch")["is_relevant"] is False
+    assert rules.match("学习Python", "https://www.youtube.com")["is_relevant"] is True
+    assert rules.match("学习Python", "https://taobao.com/item")["action"] == "block"
+    assert rules.match("学习Python", "https://docs.python.org") is None
+
+
+def test_small_model_answers_confident_cases_and_escalates_the_rest(tmp_path):
+    monitor = _monitor(tmp_path, {
+        SMALL: lambda prompt: "判断：不相关\n置信度：高\n理由：视频网站" if "bilibili" in prompt
+        else "判断：相关\n置信度：低\n理由：不确定",
+        LARGE: "判断：不相关\n置信度：高\n理由：与数学无关",
+    }, rules=DomainRules(block=["taobao.com"]))
+
+    assert monitor.check_website("https://www.taobao.com")["stage"] == "rules"
+    assert monitor.check_website("https://www.bilibili.com")["stage"] == "small_llm"
+    escalated = monitor.check_website("https://news.example.com")
+    assert escalated["stage"] == "large_llm" and escalated["is_relevant"] is False
+    assert monitor.check_website("https://news.example.com")["stage"] == "cache"
+    assert monitor.client.models == [SMALL, SMALL, LARGE]
+
+    stats = monitor.pipeline.stats()
+    assert (stats["rules"]["hits"], stats["rules"]["passed"]) == (1, 3)
+    assert (stats["small_llm"]["entered"], stats["small_llm"]["hits"], stats["small_llm"]["passed"]) == (2, 1, 1)
+    assert stats["large_llm"]["hits"] == 1 and stats["cache"]["hits"] == 1
+    assert stats["large_llm"]["latency_ms"]["p95"] >= 0
+
+
+def test_failed_escalation_keeps_small_model_verdict(tmp_path):
+    monitor = _monitor(tmp_path, {SMALL: "判断：相关\n置信度：低\n理由：可能有用", LARGE: RuntimeError("503")})
+    result = monitor.check_website("https://example.org")
+    assert result["stage"] == "small_llm" and result["is_relevant"] is True
+    assert monitor.pipeline.stats()["large_llm"]["errors"] == 1
+
+
+def test_batch_escalates_only_low_confidence_items(tmp_path):
+    def small(prompt):
+        return "1. 判断：相关 | 置信度：高 | 理由：数学\n2. 判断：相关 | 置信度：低 | 理由：不确定\n3. 判断：不相关 | 置信度：中 | 理由：视频"
+
+    monitor = _monitor(tmp_path, {SMALL: small, LARGE: "1. 判断：不相关 | 置信度：高 | 理由：新闻"})
+    results = monitor.check_websites(["https://www.khanacademy.org", "https://news.example.com", "https://www.bilibili.com"])
+    assert [r["stage"] for r in results] == ["small_llm", "large_llm", "small_llm"]
+    assert results[1]["is_relevant"] is False
+    assert monitor.client.models == [SMALL, LARGE]
+    assert monitor.pipeline.stats()["small_llm"]["entered"] == 3
+
+
+def test_async_path_escalates_through_engine(tmp_path):
+    from async_engine import AsyncClassificationEngine
+
+    models = []
+
+    def respond(messages, model=None, **kwargs):
+        models.append(model)
+        return "判断：相关\n置信度：低\n理由：不确定" if model == SMALL else "判断：相关\n置信度：高\n理由：数学资料"
+
+    monitor = _monitor(tmp_path, {})
+    monitor._engine = AsyncClassificationEngine(client=AsyncStubLLMClient(responder=respond))
+    try:
+        result = monitor.engine.run(monitor.check_website_async("https://www.mathsisfun.com", timeout=5))
+    finally:
+        monitor.engine.close()
+    assert result["stage"] == "large_llm" and models == [SMALL, LARGE]
+    assert len(monitor.get_history()) == 1
+
+
+def test_prefetch_skips_sites_decided_before_llm(tmp_path):
+    rules = DomainRules(block=["bilibili.com"])
+    monitor = _monitor(tmp_path, {SMALL: "1. 判断：相关 | 置信度：高 | 理由：数学工具"}, rules=rules)
+    monitor.verdict_cache.put(monitor.current_task_key, "https://www.khanacademy.org",
+                              {"is_relevant": True, "action": "allow", "reason": "数学课程", "confidence": "high"})
+
+    seeded = monitor.prefetch(["https://www.bilibili.com", "https://www.khanacademy.org", "https://www.desmos.com"])
+    assert seeded == 1
+    assert monitor.client.models == [SMALL]
+    assert monitor.verdict_cache.contains(monitor.current_task_key, "https://www.desmos.com")
+    assert not monitor.verdict_cache.contains(monitor.current_task_key, "https://www.bilibili.com")
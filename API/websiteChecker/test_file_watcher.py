@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件变化监听测试（基于 pytest）
+运行：
+    pytest -q API/websiteChecker/test_file_watcher.py
+"""
+
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from file_watcher import FileWatcher
+
+
+def write_later(path, text, delay=0.1):
+    def _write():
+        time.sleep(delay)
+        path.write_text(text, encoding="utf-8")
+    thread = threading.Thread(target=_write)
+    thread.start()
+    return thread
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_wait_returns_changed_file(tmp_path, use_inotify):
+    store = tmp_path / "store.json"
+    feed = tmp_path / "website_events.jsonl"
+    store.write_text("{}", encoding="utf-8")
+    watcher = FileWatcher([store, feed], poll_interval=0.05, use_inotify=use_inotify)
+    try:
+        assert watcher.wait(timeout=0.1) == []
+
+        thread = write_later(feed, '{"website": {"url": "https://a.com"}}\n')
+        changed = watcher.wait(timeout=2)
+        thread.join()
+        assert changed == [feed.absolute()]
+
+        # 无关文件的变化不会唤醒
+        (tmp_path / "other.txt").write_text("x", encoding="utf-8")
+        assert watcher.wait(timeout=0.2) == []
+    finally:
+        watcher.close()
+
+
+def test_inotify_wakes_without_polling_delay(tmp_path):
+    store = tmp_path / "store.json"
+    watcher = FileWatcher([store], poll_interval=10)
+    if watcher.mode != "inotify":
+        watcher.close()
+        pytest.skip("inotify 不可用")
+    try:
+        thread = write_later(store, "{}")
+        started = time.monotonic()
+        assert watcher.wait(timeout=5) == [store.absolute()]
+        assert time.monotonic() - started < 2
+        thread.join()
+    finally:
+        watcher.close()
+
+
+def test_missing_directory_falls_back_to_polling(tmp_path):
+    missing = tmp_path / "not_yet" / "store.json"
+    watcher = FileWatcher([missing], poll_interval=0.05)
+    try:
+        assert watcher.mode in ("mixed", "poll")
+        missing.parent.mkdir()
+        missing.write_text("{}", encoding="utf-8")
+        assert watcher.wait(timeout=2) == [missing.absolute()]
+    finally:
+        watcher.close()
+
+
+def test_integration_reads_latest_website_from_feed(tmp_path):
+    from flowstate_integration import FlowStateIntegration
+
+    feed = tmp_path / "website_events.jsonl"
+    feed.write_text(
+        json.dumps({"website": {"url": "https://a.com"}}) + "\n" +
+        json.dumps({"website": {"url": "https://docs.python.org", "title": "Python"}}) + "\n",
+        encoding="utf-8"
+    )
+    integration = FlowStateIntegration(watch=True, website_feed=str(feed))
+    assert integration._get_current_website()["url"] == "https://docs.python.org"
+
+    integration.website_feed = tmp_path / "missing.jsonl"
+    assert integration._get_current_website() is None
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+store.json 直读后端测试（基于 pytest）
+- 任务索引按 updatedAt 排序，与 `flow task:list` 一致
+- 只在 mtime/大小变化时重新解析
+- 文件缺失时回退到 worker/CLI
+运行：
+    pytest -q API/websiteChecker/test_flowstate_store.py
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from flowstate_bridge import FlowStateBridge, FlowStateStoreError, FlowStateStoreReader
+
+
+def write_store(path, tasks):
+    path.write_text(json.dumps({"tasks": tasks, "sessions": []}), encoding="utf-8")
+
+
+TASKS = [
+    {"id": "task_old", "name": "写作业", "resources": [], "createdAt": 1, "updatedAt": 10},
+    {"id": "task_new", "name": "学习Python编程", "createdAt": 2, "updatedAt": 20,
+     "resources": [{"kind": "url", "id": "https://docs.python.org", "title": "Python 文档"}]},
+]
+
+
+def test_reader_indexes_tasks_and_reparses_only_on_change(tmp_path):
+    store = tmp_path / "store.json"
+    write_store(store, TASKS)
+    reader = FlowStateStoreReader(str(store))
+
+    assert reader.current_task()["id"] == "task_new"
+    assert reader.get_task("task_old")["name"] == "写作业"
+    assert reader.get_task("missing") is None
+    assert [t["id"] for t in reader.list_tasks()] == ["task_new", "task_old"]
+    assert reader.reloads == 1
+
+    tasks = [dict(TASKS[0], updatedAt=30), TASKS[1]]
+    write_store(store, tasks)
+    stat = store.stat()
+    os.utime(store, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert reader.current_task()["id"] == "task_old"
+    assert reader.reloads == 2
+
+
+def test_reader_keeps_last_index_on_partial_write(tmp_path):
+    store = tmp_path / "store.json"
+    write_store(store, TASKS)
+    reader = FlowStateStoreReader(str(store))
+    assert reader.current_task()["id"] == "task_new"
+
+    store.write_text('{"tasks": [', encoding="utf-8")
+    assert reader.current_task()["id"] == "task_new"
+
+    with pytest.raises(FlowStateStoreError):
+        FlowStateStoreReader(str(store)).current_task()
+    with pytest.raises(FlowStateStoreError):
+        FlowStateStoreReader(str(tmp_path / "missing.json")).current_task()
+
+
+def test_bridge_reads_store_without_subprocess(tmp_path, monkeypatch):
+    store = tmp_path / "store.json"
+    write_store(store, TASKS)
+    monkeypatch.setenv("FLOWSTATE_STORE", str(store))
+
+    bridge = FlowStateBridge(backend="store")
+
+    def no_subprocess(*args, **kwargs):
+        raise AssertionError("不应调用 worker 或 CLI")
+
+    monkeypatch.setattr(bridge, "_worker_request", no_subprocess)
+    monkeypatch.setattr(bridge, "_run_flowstate_command", no_subprocess)
+
+    assert bridge.get_current_task()["id"] == "task_new"
+    assert bridge.get_task_resources("task_new")[0]["title"] == "Python 文档"
+    assert "学习Python编程" in bridge.format_task_for_monitor(bridge.get_current_task())
+
+
+def test_bridge_falls_back_when_store_missing(tmp_path, monkeypatch):
+    monkeypatch.setenv("FLOWSTATE_STORE", str(tmp_path / "missing.json"))
+    bridge = FlowStateBridge(backend="store")
+    monkeypatch.setattr(bridge, "_worker_request", lambda cmd, args=None: (True, {"id": "from_worker"}))
+    assert bridge.get_current_task() == {"id": "from_worker"}
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FlowState 常驻 worker 测试（基于 pytest，需要 node）
+- 一次往返获取当前任务
+- worker 崩溃后自动重启
+- worker 不可用时回退到一次性 CLI
+运行：
+    pytest -q API/websiteChecker/test_flowstate_worker.py
+"""
+
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from flowstate_bridge import FlowStateBridge, FlowStateWorker, FlowStateWorkerError
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="需要 node")
+
+
+@pytest.fixture()
+def store_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    store_dir = tmp_path / ".flowstate"
+    store_dir.mkdir()
+    data = {
+        "tasks": [
+            {"id": "task_old", "name": "写作业", "resources": [], "createdAt": 1, "updatedAt": 10},
+            {"id": "task_new", "name": "学习Python编程", "createdAt": 2, "updatedAt": 20,
+             "resources": [{"kind": "url", "id": "https://docs.python.org", "title": "Python 文档"}]},
+        ],
+        "sessions": [],
+    }
+    (store_dir / "store.json").write_text(json.dumps(data), encoding="utf-8")
+    return store_dir / "store.json"
+
+
+def test_worker_returns_latest_task_and_sees_updates(store_home):
+    bridge = FlowStateBridge(backend="worker")
+    try:
+        task = bridge.get_current_task()
+        assert task["id"] == "task_new"
+        assert bridge.get_task_resources("task_new")[0]["id"] == "https://docs.python.org"
+        assert bridge.get_task_resources("missing") == []
+
+        data = json.loads(store_home.read_text(encoding="utf-8"))
+        data["tasks"][0]["updatedAt"] = 30
+        store_home.write_text(json.dumps(data), encoding="utf-8")
+        assert bridge.get_current_task()["id"] == "task_old"
+        assert bridge.worker.starts == 1
+    finally:
+        bridge.worker.close()
+
+
+def test_worker_restarts_after_crash(store_home):
+    bridge = FlowStateBridge(backend="worker")
+    try:
+        assert bridge.get_current_task()["id"] == "task_new"
+        bridge.worker._process.kill()
+        bridge.worker._process.wait()
+        assert bridge.get_current_task()["id"] == "task_new"
+        assert bridge.worker.starts == 2
+    finally:
+        bridge.worker.close()
+
+
+def test_worker_reports_unknown_commands(store_home):
+    worker = FlowStateWorker(Path(FlowStateBridge().flowstate_path))
+    try:
+        assert worker.request("ping") == "pong"
+        with pytest.raises(FlowStateWorkerError):
+            worker.request("nope")
+    finally:
+        worker.close()
+
+
+def test_bridge_falls_back_to_cli_when_worker_missing(store_home, tmp_path):
+    bridge = FlowStateBridge(backend="worker")
+    bridge.worker.script = tmp_path / "missing_worker.js"
+    assert not bridge.worker.available
+    assert bridge.get_current_task()["id"] == "task_new"
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+FocusSession / CheckLog 的测试：按列存储的网站检查记录与字典视图
+"""
+
+from datetime import datetime
+
+from focus_score_calculator import CheckLog, FocusSession
+
+
+def _check(i, relevant=True, confidence="high"):
+    return {
+        "timestamp": datetime(2025, 10, 18, 15, 30, i, 123456).isoformat(),
+        "website_url": f"https://site{i % 2}.com",
+        "is_relevant": relevant,
+        "confidence": confidence,
+        "reason": "理由",
+    }
+
+
+def test_check_log_round_trips_dicts():
+    checks = [_check(0), _check(1, relevant=False, confidence="low"), _check(2, confidence="unknown")]
+    log = CheckLog(checks)
+
+    assert len(log) == 3
+    assert list(log) == checks
+    assert log[-1] == checks[-1]
+    assert log[0:2] == checks[0:2]
+
+
+def test_check_log_interns_strings():
+    log = CheckLog([_check(0), _check(2)])
+    assert log._urls[0] == log._urls[1]
+    assert log._reasons[0] == log._reasons[1]
+
+
+def test_focus_session_dict_round_trip():
+    data = {
+        "session_id": "s1", "task_id": "t1", "task_name": "写报告", "start_time": 1.0,
+        "end_time": 61.0, "total_duration": 60.0, "relevant_websites": 1,
+        "irrelevant_websites": 0, "focus_score": 62.0, "website_checks": [_check(0)],
+    }
+    session = FocusSession.from_dict(data)
+    assert not hasattr(session, "__dict__")
+    assert session.to_dict() == data
+    assert "website_checks" not in session.to_dict(include_checks=False)
+
+    session.add_check(_check(1, relevant=False))
+    assert session.website_checks[1]["is_relevant"] is False
+
+
+def test_check_log_intern_tables_are_per_log():
+    first = CheckLog([_check(0)])
+    second = CheckLog([_check(1)])
+    assert first._url_table is not second._url_table
+    assert first._url_table.values == ["https://site0.com"]
+    assert second[0]["website_url"] == "https://site1.com"
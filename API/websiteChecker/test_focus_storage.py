@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+focus_storage 的测试：追加式日志的重放、压缩与崩溃恢复，SQLite 后端的查询，按天统计桶，检查记录的延迟加载
+"""
+
+import json
+import time
+
+from focus_score_calculator import FocusScoreCalculator
+from focus_storage import JournalStorage, JsonFileStorage, SqliteStorage
+
+
+def _run_session(calculator, task_name, checks):
+    calculator.start_session("task_1", task_name)
+    for url, relevant in checks:
+        calculator.record_website_check(url, relevant, "high", "")
+    return calculator.end_session()
+
+
+def test_journal_appends_without_rewriting_snapshot(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    calculator = FocusScoreCalculator(str(data_file), storage=JournalStorage(str(data_file)))
+    _run_session(calculator, "写报告", [("https://docs.python.org", True), ("https://youtube.com", False)])
+
+    assert not data_file.exists()
+    lines = (tmp_path / "sessions.json.journal").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["type"] for line in lines] == ["check", "check", "session"]
+
+    reloaded = FocusScoreCalculator(str(data_file), storage="journal")
+    assert len(reloaded.sessions) == 1
+    session = reloaded.sessions[0]
+    assert session.task_name == "写报告"
+    assert session.relevant_websites == 1 and session.irrelevant_websites == 1
+    assert [c["website_url"] for c in session.website_checks] == [
+        "https://docs.python.org", "https://youtube.com"
+    ]
+
+
+def test_journal_compacts_into_snapshot(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    storage = JournalStorage(str(data_file), compact_every=4)
+    calculator = FocusScoreCalculator(str(data_file), storage=storage)
+    _run_session(calculator, "A", [("https://a.com", True)])
+    _run_session(calculator, "B", [("https://b.com", False)])
+
+    # 第二个会话结束时达到 4 条记录，压缩为快照
+    assert (tmp_path / "sessions.json.journal").read_text(encoding="utf-8") == ""
+    snapshot = json.loads(data_file.read_text(encoding="utf-8"))
+    assert [s["task_name"] for s in snapshot["sessions"]] == ["A", "B"]
+
+    _run_session(calculator, "C", [])
+    reloaded = FocusScoreCalculator(str(data_file), storage="journal")
+    assert [s.task_name for s in reloaded.sessions] == ["A", "B", "C"]
+    assert reloaded.sessions[1].website_checks[0]["website_url"] == "https://b.com"
+
+
+def test_journal_reads_legacy_file_and_skips_torn_line(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    legacy = FocusScoreCalculator(str(data_file), storage=JsonFileStorage(str(data_file)))
+    _run_session(legacy, "旧会话", [("https://a.com", True)])
+
+    calculator = FocusScoreCalculator(str(data_file), storage="journal")
+    _run_session(calculator, "新会话", [])
+    with open(tmp_path / "sessions.json.journal", "a", encoding="utf-8") as f:
+        f.write('{"type": "session", "sess')
+
+    reloaded = FocusScoreCalculator(str(data_file), storage="journal")
+    assert [s.task_name for s in reloaded.sessions] == ["旧会话", "新会话"]
+
+
+def test_journal_ignores_sessions_already_in_snapshot(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    storage = JournalStorage(str(data_file))
+    calculator = FocusScoreCalculator(str(data_file), storage=storage)
+    _run_session(calculator, "A", [("https://a.com", True)])
+    journal = (tmp_path / "sessions.json.journal").read_text(encoding="utf-8")
+
+    # 模拟压缩写完快照后、清空日志前崩溃
+    calculator.save_data()
+    (tmp_path / "sessions.json.journal").write_text(journal, encoding="utf-8")
+
+    reloaded = FocusScoreCalculator(str(data_file), storage="journal")
+    assert len(reloaded.sessions) == 1
+    assert len(reloaded.sessions[0].website_checks) == 1
+
+
+def test_sqlite_metrics_and_history_use_queries(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    calculator = FocusScoreCalculator(str(data_file), storage="sqlite")
+    _run_session(calculator, "A", [("https://www.github.com/x", True), ("https://youtube.com", False)])
+    _run_session(calculator, "B", [("https://github.com/y", True)])
+    calculator.storage.close()
+
+    reloaded = FocusScoreCalculator(str(data_file), storage=SqliteStorage(str(data_file)))
+    assert reloaded.sessions == []
+    metrics = reloaded.get_focus_metrics(days=1)
+    assert metrics.total_sessions == 2
+    assert metrics.total_relevant_websites == 2
+    assert metrics.total_irrelevant_websites == 1
+    assert abs(metrics.focus_efficiency - 2 / 3) < 1e-9
+
+    history = reloaded.get_session_history(1)
+    assert len(history) == 1 and history[0]["task_name"] == "B"
+
+    storage = reloaded.storage
+    assert [s["task_name"] for s in storage.query_task_sessions("task_1")] == ["A", "B"]
+    assert storage.query_domains(1) == [
+        {"domain": "github.com", "checks": 2, "relevant": 2, "irrelevant": 0}
+    ]
+    first_id = storage.query_task_sessions("task_1")[0]["session_id"]
+    assert [c["website_url"] for c in storage.load_checks(first_id)] == [
+        "https://www.github.com/x", "https://youtube.com"
+    ]
+    assert storage._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_sqlite_imports_legacy_json(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    legacy = FocusScoreCalculator(str(data_file), storage="json")
+    _run_session(legacy, "旧会话", [("https://a.com", True)])
+
+    calculator = FocusScoreCalculator(str(data_file), storage="sqlite")
+    assert calculator.get_focus_metrics(days=1).total_sessions == 1
+    assert calculator.storage.query_domains() == [
+        {"domain": "a.com", "checks": 1, "relevant": 1, "irrelevant": 0}
+    ]
+
+
+def test_daily_buckets_are_persisted_and_rebuilt(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    calculator = FocusScoreCalculator(str(data_file), storage="journal")
+    _run_session(calculator, "A", [("https://a.com", True)])
+    _run_session(calculator, "B", [("https://b.com", False)])
+
+    daily = json.loads((tmp_path / "sessions.json.daily.json").read_text(encoding="utf-8"))
+    (bucket,) = daily["days"].values()
+    assert bucket["sessions"] == 2 and bucket["relevant"] == 1 and bucket["irrelevant"] == 1
+
+    expected = calculator.get_focus_metrics(days=1)
+    assert expected.total_sessions == 2
+    assert expected.best_focus_score >= expected.worst_focus_score
+
+    # 统计文件丢失后从会话重建
+    (tmp_path / "sessions.json.daily.json").unlink()
+    rebuilt = FocusScoreCalculator(str(data_file), storage="journal")
+    assert rebuilt.get_focus_metrics(days=1) == expected
+
+
+def test_daily_buckets_window_excludes_old_days(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    calculator = FocusScoreCalculator(str(data_file), storage="journal")
+    _run_session(calculator, "A", [])
+    (today,) = calculator.daily_buckets.values()
+    calculator.daily_buckets["2000-01-01"] = dict(today)
+
+    assert calculator.get_focus_metrics(days=7).total_sessions == 1
+    assert calculator.get_focus_metrics(days=100000).total_sessions == 2
+
+
+def _run_session_at(calculator, task_name, hours_ago):
+    calculator.start_session("task_1", task_name)
+    calculator.current_session.start_time = time.time() - hours_ago * 3600
+    calculator.record_website_check("https://a.com", True, "high", "")
+    return calculator.end_session()
+
+
+def test_metrics_window_cuts_at_exact_time(tmp_path):
+    for backend in ("journal", "sqlite"):
+        data_file = tmp_path / f"{backend}.json"
+        calculator = FocusScoreCalculator(str(data_file), storage=backend)
+        _run_session_at(calculator, "前天", 47)
+        _run_session_at(calculator, "昨天", 25)
+        _run_session_at(calculator, "今天", 23)
+
+        assert calculator.get_focus_metrics(days=1).total_sessions == 1
+        assert calculator.get_focus_metrics(days=2).total_sessions == 3
+        reloaded = FocusScoreCalculator(str(data_file), storage=backend)
+        assert reloaded.get_focus_metrics(days=1) == calculator.get_focus_metrics(days=1)
+
+
+def test_sqlite_daily_buckets_rebuilt_when_stale(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    calculator = FocusScoreCalculator(str(data_file), storage="sqlite")
+    _run_session(calculator, "A", [("https://a.com", True)])
+    _run_session(calculator, "B", [])
+    calculator.storage._conn.execute("DELETE FROM daily_metrics")
+    calculator.storage._conn.commit()
+    calculator.storage.close()
+
+    reloaded = FocusScoreCalculator(str(data_file), storage="sqlite")
+    metrics = reloaded.get_focus_metrics(days=1)
+    assert metrics.total_sessions == 2
+    assert metrics.total_relevant_websites == 1
+
+
+def test_journal_snapshot_loads_checks_on_demand(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    calculator = FocusScoreCalculator(str(data_file), storage="journal")
+    first = _run_session(calculator, "A", [("https://a.com", True), ("https://b.com", False)])
+    _run_session(calculator, "B", [("https://c.com", True)])
+    calculator.save_data()
+
+    snapshot = json.loads(data_file.read_text(encoding="utf-8"))
+    assert all("website_checks" not in s and "checks_ref" in s for s in snapshot["sessions"])
+
+    reloaded = FocusScoreCalculator(str(data_file), storage="journal")
+    assert not any(s.checks_loaded for s in reloaded.sessions)
+    assert reloaded.get_focus_metrics(days=1).total_sessions == 2
+    assert len(reloaded.get_session_history()) == 2
+    assert not any(s.checks_loaded for s in reloaded.sessions)
+
+    checks = reloaded.get_session_checks(first.session_id)
+    assert [c["website_url"] for c in checks] == ["https://a.com", "https://b.com"]
+    assert reloaded.sessions[0].checks_loaded and not reloaded.sessions[1].checks_loaded
+
+    # 再次压缩不会重写已有的检查记录
+    size = (tmp_path / "sessions.json.checks.jsonl").stat().st_size
+    reloaded.save_data()
+    assert (tmp_path / "sessions.json.checks.jsonl").stat().st_size == size
+
+    # 其他后端读取该快照时直接展开检查记录
+    eager = FocusScoreCalculator(str(data_file), storage="json")
+    assert eager.sessions[1].checks_loaded
+    assert eager.sessions[1].website_checks[0]["website_url"] == "https://c.com"
+
+
+def test_journal_migrates_inline_checks_on_compaction(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    legacy = FocusScoreCalculator(str(data_file), storage="json")
+    _run_session(legacy, "旧会话", [("https://a.com", True)])
+
+    calculator = FocusScoreCalculator(str(data_file), storage="journal")
+    assert calculator.sessions[0].checks_loaded
+    calculator.save_data()
+
+    reloaded = FocusScoreCalculator(str(data_file), storage="journal")
+    assert not reloaded.sessions[0].checks_loaded
+    assert reloaded.sessions[0].website_checks[0]["website_url"] == "https://a.com"
+
+
+def test_sqlite_sessions_from_two_instances_do_not_collide(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    first = FocusScoreCalculator(str(data_file), storage="sqlite")
+    second = FocusScoreCalculator(str(data_file), storage="sqlite")
+    first.start_session("task_1", "A")
+    second.start_session("task_2", "B")
+    assert first.current_session.session_id != second.current_session.session_id
+    first.end_session()
+    second.end_session()
+
+    rows = first.storage._conn.execute("SELECT task_name FROM sessions ORDER BY task_name").fetchall()
+    assert [row[0] for row in rows] == ["A", "B"]
+
+
+def test_sqlite_daily_buckets_count_sessions_from_all_instances(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    first = FocusScoreCalculator(str(data_file), storage="sqlite")
+    second = FocusScoreCalculator(str(data_file), storage="sqlite")
+    _run_session(first, "A", [("https://a.com", True)])
+    _run_session(second, "B", [("https://b.com", False)])
+
+    (sessions,) = first.storage._conn.execute("SELECT SUM(sessions) FROM daily_metrics").fetchone()
+    assert sessions == 2
+    for calculator in (first, second):
+        metrics = calculator.get_focus_metrics(days=1)
+        assert metrics.total_sessions == 2
+        assert (metrics.total_relevant_websites, metrics.total_irrelevant_websites) == (1, 1)
+
+
+def test_json_storage_saves_while_other_clients_are_active(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    base = FocusScoreCalculator(str(data_file), storage="json")
+    alice, bob = base.fork(), base.fork()
+    bob.start_session("task_2", "B")
+    _run_session(alice, "A", [("https://a.com", True)])
+
+    reloaded = FocusScoreCalculator(str(data_file), storage="json")
+    assert [s.task_name for s in reloaded.sessions] == ["A"]
+    assert reloaded.sessions[0].website_checks[0]["website_url"] == "https://a.com"
+
+
+def test_journal_compaction_waits_for_other_clients(tmp_path):
+    data_file = tmp_path / "sessions.json"
+    base = FocusScoreCalculator(str(data_file), storage=JournalStorage(str(data_file), compact_every=1))
+    alice, bob = base.fork(), base.fork()
+    bob.start_session("task_2", "B")
+    bob.record_website_check("https://b.com", True, "high", "")
+    _run_session(alice, "A", [])
+    assert not data_file.exists()
+
+    bob.end_session()
+    reloaded = FocusScoreCalculator(str(data_file), storage="journal")
+    assert sorted(s.task_name for s in reloaded.sessions) == ["A", "B"]
+    assert [s for s in reloaded.sessions if s.task_name == "B"][0].website_checks[0]["website_url"] == "https://b.com"
@@ -10,6 +10,14 @@ from focus_score_calculator import FocusScoreCalculator
 from enhanced_focus_monitor import EnhancedFocusMonitor
 
 
+def _remove_storage_files(calculator):
+    """删除计算器存储写入的全部文件（含日志与统计等旁路文件）"""
+    for path in calculator.storage.files():
+        if path.exists():
+            path.unlink()
+            print(f"🗑️  已清理测试文件: {path}")
+
+
 def test_focus_calculator():
     """测试专注度计算器"""
     print("=" * 70)
@@ -59,6 +67,7 @@ def test_focus_calculator():
     history = calculator.get_session_history(5)
     print(f"   历史记录数量: {len(history)}")
     
+    _remove_storage_files(calculator)
     print("\n✅ 专注度计算器测试完成")
 
 
@@ -68,7 +77,8 @@ def test_enhanced_monitor():
     print("测试增强版监控器")
     print("=" * 70)
     
-    monitor = EnhancedFocusMonitor()
+    # 测试会话不写入真实的 focus_sessions.json
+    monitor = EnhancedFocusMonitor(focus_calculator=FocusScoreCalculator("test_enhanced_sessions.json"))
     
     # 测试1：手动任务监控
     print("\n1. 测试手动任务监控...")
@@ -105,6 +115,7 @@ def test_enhanced_monitor():
     history = monitor.get_focus_history(3)
     print(f"   历史记录数量: {len(history)}")
     
+    _remove_storage_files(monitor.focus_calculator)
     print("\n✅ 增强版监控器测试完成")
 
 
@@ -181,6 +192,7 @@ def test_scoring_algorithm():
         else:
             print(f"   {scenario['name']}: 测试失败")
     
+    _remove_storage_files(calculator)
     print("\n✅ 评分算法测试完成")
 
 
@@ -203,18 +215,6 @@ def main():
         print("🎉 所有测试完成！")
         print("=" * 70)
         
-        # 清理测试文件
-        import os
-        test_files = [
-            "test_focus_sessions.json",
-            "test_scoring.json"
-        ]
-        
-        for file in test_files:
-            if os.path.exists(file):
-                os.remove(file)
-                print(f"🗑️  已清理测试文件: {file}")
-        
     except Exception as e:
         print(f"\n❌ 测试过程中发生错误: {e}")
         import traceback
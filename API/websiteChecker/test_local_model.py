@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+local_model 的测试：特征、训练/评估、保存加载，以及监控器在 LLM 之前使用本地模型
+"""
+
+import json
+import random
+from datetime import datetime
+
+from local_model import SOURCE, LocalRelevanceModel, extract_features, load_examples, task_text, tokenize
+from stub_llm import StubLLMClient, judge
+from focus_score_calculator import FocusScoreCalculator
+from task_focus_monitor import TaskFocusMonitor
+from verdict_cache import VerdictCache
+
+TASKS = ["学习Python编程", "写数学作业", "写季度报告", "学习机器学习"]
+SITES = [
+    "https://docs.python.org/3/tutorial/", "https://stackoverflow.com/questions/1",
+    "https://www.youtube.com/watch?v=abc", "https://github.com/python/cpython",
+    "https://www.bilibili.com/video/1", "https://www.khanacademy.org/math",
+    "https://twitter.com/home", "https://www.taobao.com/", "https://pypi.org/project/requests",
+]
+
+
+def _examples(count, seed=0):
+    rng = random.Random(seed)
+    examples = []
+    for _ in range(count):
+        task, url = rng.choice(TASKS), rng.choice(SITES)
+        examples.append((task, url, None, judge(task, url)[0]))
+    return examples
+
+
+def _trained_model():
+    model = LocalRelevanceModel(threshold=0.9)
+    model.fit(_examples(400))
+    return model
+
+
+def test_tokenize_and_features():
+    assert tokenize("学习Python编程") == ["python", "学习", "编程"]
+    assert task_text("任务: 写数学作业\n相关资源: 课本") == "写数学作业"
+    features = extract_features("写数学作业", "https://www.youtube.com/watch?v=abc", "猫咪视频")
+    assert "h=youtube.com" in features and "d=youtube" in features and "t=猫咪" in features
+    assert "x=数学|h=youtube.com" in features
+
+
+def test_model_is_accurate_where_confident_and_abstains_on_unknown_hosts():
+    model = _trained_model()
+    evaluation = model.evaluate(_examples(200, seed=1))
+    assert evaluation["coverage"] > 0.7 and evaluation["accuracy"] > 0.95
+
+    blocked = model.classify("写数学作业", "https://www.bilibili.com/video/2")
+    assert blocked["is_relevant"] is False and blocked["action"] == "block" and blocked["source"] == SOURCE
+    assert model.classify("写数学作业", "https://never-seen.example.org") is None
+    assert model.stats()["decisions"] == 1 and model.stats()["abstentions"] == 1
+
+
+def test_save_load_and_training_log(tmp_path):
+    model = _trained_model()
+    model.save(str(tmp_path / "model.json"))
+    loaded = LocalRelevanceModel.load(str(tmp_path / "model.json"), threshold=0.9)
+    for task, url, title, _ in _examples(20, seed=2):
+        expected = model.predict_proba(task, url, title)
+        assert abs(loaded.predict_proba(task, url, title) - expected) < 1e-3
+
+    log = tmp_path / "classification_results.jsonl"
+    now = datetime.utcnow().isoformat()
+    rows = [
+        {"is_relevant": True, "action": "allow"},
+        {"is_relevant": False, "action": "error"},
+        {"is_relevant": False, "action": "block", "source": SOURCE},
+    ]
+    with open(log, "w", encoding="utf-8") as f:
+        for result in rows:
+            f.write(json.dumps({"timestamp": now, "task": {"name": "学习Python编程"},
+                                "website": {"url": "https://docs.python.org", "title": "Python"},
+                                "result": result}, ensure_ascii=False) + "\n")
+    assert load_examples(log) == [("学习Python编程", "https://docs.python.org", "Python", True)]
+
+
+def test_monitor_calls_llm_only_when_local_model_is_unsure(tmp_path):
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                               local_model=_trained_model(),
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.client = StubLLMClient()
+    monitor.set_task("任务: 写数学作业")
+
+    result = monitor.check_website("https://www.youtube.com/watch?v=xyz")
+    assert result["source"] == SOURCE and result["is_relevant"] is False
+    assert monitor.client.calls == 0
+
+    monitor.check_website("https://www.mathsisfun.com/algebra")
+    results = monitor.check_websites(["https://www.taobao.com/item", "https://www.desmos.com/calculator"])
+    assert results[0]["source"] == SOURCE
+    assert monitor.client.calls == 2
+    assert len(monitor.get_history()) == 4
+    # 本地判定不写入判定缓存
+    assert not monitor.verdict_cache.contains(monitor.current_task_key, "https://www.youtube.com/watch?v=xyz")
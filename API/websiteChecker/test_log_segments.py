@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+log_segments 的测试：按大小轮转、分块压缩与索引、按时间范围读取
+"""
+
+import gzip
+import json
+import multiprocessing
+
+import log_segments
+from log_segments import SegmentedLog, list_segments, read_range
+from log_writer import LogWriter
+
+
+def _record(i):
+    return {"timestamp": f"2025-10-18T10:{i // 60:02d}:{i % 60:02d}", "i": i}
+
+
+def _append(log, start, stop):
+    log.append([json.dumps(_record(i)) + "\n" for i in range(start, stop)])
+
+
+def test_rotation_compresses_blocks_and_writes_index(tmp_path):
+    path = tmp_path / "results.jsonl"
+    log = SegmentedLog(path, max_bytes=1, block_records=10)
+    _append(log, 0, 25)
+    _append(log, 25, 30)
+
+    (segment,) = list_segments(path)
+    assert segment["path"].name.endswith(".jsonl.gz")
+    assert segment["records"] == 25
+    assert segment["first_ts"] == _record(0)["timestamp"]
+    assert segment["last_ts"] == _record(24)["timestamp"]
+    assert [b["records"] for b in segment["blocks"]] == [10, 10, 5]
+
+    # 多个 gzip 成员拼接后仍是合法的 gzip 文件
+    with gzip.open(segment["path"], "rt", encoding="utf-8") as f:
+        assert [json.loads(line)["i"] for line in f] == list(range(25))
+    # 当前段仍在原路径
+    assert [json.loads(line)["i"] for line in path.read_text().splitlines()] == list(range(25, 30))
+
+
+def test_read_range_only_decompresses_overlapping_blocks(tmp_path, monkeypatch):
+    path = tmp_path / "results.jsonl"
+    log = SegmentedLog(path, max_bytes=1, block_records=10)
+    _append(log, 0, 40)
+    _append(log, 40, 50)
+    log.rotate()
+    _append(log, 100, 105)
+
+    decompressed = []
+    original = log_segments._decompress
+
+    def counting(data, compression):
+        decompressed.append(len(data))
+        return original(data, compression)
+
+    monkeypatch.setattr(log_segments, "_decompress", counting)
+
+    records = list(read_range(path, _record(12)["timestamp"], _record(18)["timestamp"]))
+    assert [r["i"] for r in records] == list(range(12, 19))
+    assert len(decompressed) == 1
+
+    assert [r["i"] for r in read_range(path)] == list(range(0, 50)) + list(range(100, 105))
+    assert [r["i"] for r in read_range(path, start=_record(101)["timestamp"])] == [101, 102, 103, 104]
+
+
+def _append_from_worker(path, worker, count):
+    log = SegmentedLog(path, max_bytes=300, block_records=4)
+    for i in range(count):
+        log.append([json.dumps({"timestamp": _record(i)["timestamp"], "worker": worker, "i": i}) + "\n"])
+
+
+def test_concurrent_workers_do_not_lose_lines(tmp_path):
+    path = tmp_path / "results.jsonl"
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_append_from_worker, args=(path, w, 100)) for w in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(60)
+        assert p.exitcode == 0
+
+    assert len(list_segments(path)) > 1
+    seen = sorted((r["worker"], r["i"]) for r in read_range(path))
+    assert seen == [(w, i) for w in range(4) for i in range(100)]
+
+
+def test_log_writer_rotates_segments(tmp_path):
+    path = tmp_path / "events.jsonl"
+    writer = LogWriter(batch_size=5, flush_interval=0.01,
+                       segment_options={"max_bytes": 200, "block_records": 4})
+    for i in range(30):
+        writer.write(path, _record(i))
+        if i % 5 == 4:
+            writer.flush(timeout=5)
+    writer.close()
+
+    assert writer.stats()["rotations"] >= 1
+    assert [r["i"] for r in read_range(path)] == list(range(30))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+log_writer 的测试：批量写入、刷新、关闭时落盘与队列满时丢弃
+"""
+
+import json
+import threading
+
+from log_writer import LogWriter
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_writes_records_in_order_after_flush(tmp_path):
+    writer = LogWriter(batch_size=4, flush_interval=0.05)
+    events, results = tmp_path / "events.jsonl", tmp_path / "results.jsonl"
+    for i in range(10):
+        assert writer.write(events, {"i": i, "text": "网站"})
+        writer.write(results, {"i": i})
+
+    assert writer.flush(timeout=5)
+    assert [r["i"] for r in _lines(events)] == list(range(10))
+    assert _lines(events)[0]["text"] == "网站"
+    assert len(_lines(results)) == 10
+    stats = writer.stats()
+    assert stats["written"] == 20 and stats["dropped"] == 0 and stats["queued"] == 0
+    writer.close()
+
+
+def test_record_is_serialized_at_write_time(tmp_path):
+    writer = LogWriter(flush_interval=0.05)
+    record = {"value": 1}
+    writer.write(tmp_path / "log.jsonl", record)
+    record["value"] = 2
+    writer.close()
+    assert _lines(tmp_path / "log.jsonl") == [{"value": 1}]
+
+
+def test_close_drains_queue(tmp_path):
+    writer = LogWriter(batch_size=1000, flush_interval=10)
+    for i in range(50):
+        writer.write(tmp_path / "log.jsonl", {"i": i})
+    writer.close()
+    assert len(_lines(tmp_path / "log.jsonl")) == 50
+    assert writer.write(tmp_path / "log.jsonl", {"i": 50}) is False
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path, monkeypatch):
+    writer = LogWriter(max_queue=2, batch_size=1, flush_interval=0.01)
+    release = threading.Event()
+    original = writer._write_batch
+
+    def slow_write(batch):
+        release.wait(5)
+        original(batch)
+
+    monkeypatch.setattr(writer, "_write_batch", slow_write)
+    accepted = [writer.write(tmp_path / "log.jsonl", {"i": i}) for i in range(20)]
+    assert not all(accepted)
+    assert writer.stats()["dropped"] == accepted.count(False)
+
+    release.set()
+    assert writer.flush(timeout=5)
+    assert len(_lines(tmp_path / "log.jsonl")) == accepted.count(True)
+    writer.close()
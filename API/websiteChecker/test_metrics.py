@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+metrics 的测试：指标类型、Prometheus 文本格式与回调指标
+"""
+
+import pytest
+
+from metrics import Registry
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    requests = registry.counter("demo_requests_total", "请求数", ("status",))
+    requests.labels("200").inc()
+    requests.labels(status="200").inc(2)
+    requests.labels("500").inc()
+    in_flight = registry.gauge("demo_in_flight", "在途数")
+    with in_flight.track_inprogress():
+        assert 'demo_in_flight 1' in registry.render()
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{status="200"} 3' in text
+    assert 'demo_requests_total{status="500"} 1' in text
+    assert "demo_in_flight 0" in text
+    # 同名指标重复获取返回同一实例
+    assert registry.counter("demo_requests_total", "请求数", ("status",)) is requests
+    with pytest.raises(ValueError):
+        registry.gauge("demo_requests_total", "冲突")
+    with pytest.raises(ValueError):
+        requests.labels("200", "extra")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("demo_seconds", "耗时", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.labels("llm").observe(value)
+
+    text = registry.render()
+    assert 'demo_seconds_bucket{stage="llm",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{stage="llm",le="1"} 3' in text
+    assert 'demo_seconds_bucket{stage="llm",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{stage="llm"} 4' in text
+    assert 'demo_seconds_sum{stage="llm"} 3.65' in text
+
+
+def test_callback_metrics():
+    registry = Registry()
+    stats = {"hits": 1}
+    registry.register_callback("demo_hits_total", "命中", "counter", lambda: stats["hits"])
+    registry.register_callback("demo_records_total", "记录", "counter",
+                               lambda: {"written": 5, "dropped": 0}, labelname="outcome")
+    stats["hits"] = 7
+    text = registry.render()
+    assert "demo_hits_total 7" in text
+    assert 'demo_records_total{outcome="dropped"} 0' in text
+    assert 'demo_records_total{outcome="written"} 5' in text
+
+    registry.register_callback("demo_broken", "失败的回调", "gauge", lambda: 1 / 0)
+    assert "demo_broken" not in registry.render()
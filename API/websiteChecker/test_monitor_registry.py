@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+monitor_registry 的测试：按客户端区分监控器、条目锁、空闲/容量淘汰
+"""
+
+import threading
+import time
+
+from focus_score_calculator import FocusScoreCalculator
+from monitor_registry import DEFAULT_CLIENT_ID, MonitorRegistry
+from stub_llm import StubLLMClient
+from task_focus_monitor import TaskFocusMonitor
+from verdict_cache import VerdictCache
+
+
+class FakeMonitor:
+    def __init__(self, client_id=None):
+        self.client_id = client_id
+        self.current_task = None
+        self.ended = 0
+
+    def end_task(self):
+        self.ended += 1
+        self.current_task = None
+
+
+def _registry(**kwargs):
+    default = FakeMonitor()
+    return MonitorRegistry(factory=FakeMonitor, default=lambda: default, **kwargs), default
+
+
+def test_clients_get_their_own_monitor():
+    registry, default = _registry()
+    with registry.acquire("alice") as a1:
+        pass
+    with registry.acquire("alice") as a2, registry.acquire("bob") as b:
+        pass
+    with registry.acquire(DEFAULT_CLIENT_ID) as d:
+        pass
+    assert a1 is a2 and a1 is not b and d is default
+    assert registry.get("carol") is None and "carol" not in registry
+    assert registry.stats()["clients"] == 2 and registry.stats()["created"] == 2
+
+
+def test_same_client_is_serialized_other_clients_are_not():
+    registry, _ = _registry()
+    active = {"alice": 0, "bob": 0}
+    peak = {"alice": 0, "bob": 0}
+    lock = threading.Lock()
+
+    def work(client_id):
+        with registry.acquire(client_id):
+            with lock:
+                active[client_id] += 1
+                peak[client_id] = max(peak[client_id], active[client_id])
+                both = active["alice"] and active["bob"]
+            time.sleep(0.05)
+            with lock:
+                active[client_id] -= 1
+            return both
+
+    results = []
+    threads = [threading.Thread(target=lambda c=c: results.append(work(c))) for c in ["alice", "alice", "bob", "bob"]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak == {"alice": 1, "bob": 1}
+    assert any(results)
+
+
+def test_idle_and_capacity_eviction():
+    registry, _ = _registry(idle_timeout=10, max_clients=2)
+    with registry.acquire("alice") as alice:
+        alice.current_task = "写报告"
+    with registry.acquire("bob"):
+        pass
+
+    # 容量已满：淘汰最久未用的 alice，并结束它的任务
+    with registry.acquire("carol"):
+        pass
+    assert "alice" not in registry and alice.ended == 1
+    assert registry.stats()["evicted"] == 1
+
+    # 正在处理请求（其他线程持有条目锁）的客户端不会被淘汰
+    evicted = []
+    with registry.acquire("bob"):
+        sweeper = threading.Thread(target=lambda: evicted.append(registry.evict_idle(now=time.monotonic() + 60)))
+        sweeper.start()
+        sweeper.join()
+    assert evicted == [1] and "bob" in registry and "carol" not in registry
+
+
+def test_client_monitors_share_resources_but_not_tasks(tmp_path):
+    base = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                            focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    base.client = StubLLMClient()
+    registry = MonitorRegistry(factory=lambda client_id: TaskFocusMonitor(parent=base, client_id=client_id), default=lambda: base)
+
+    with registry.acquire("alice") as alice:
+        alice.check_from_flowstate({"name": "学习Python编程"}, {"url": "https://docs.python.org"})
+    with registry.acquire("bob") as bob:
+        bob.check_from_flowstate({"name": "写数学作业"}, {"url": "https://docs.python.org"})
+
+    assert alice.current_task != bob.current_task
+    assert len(alice.get_history()) == 1 and len(bob.get_history()) == 1
+    assert alice.verdict_cache is bob.verdict_cache is base.verdict_cache
+    assert alice.client is base.client and base.client.calls == 2
+    assert alice.focus_calculator.current_session.session_id != bob.focus_calculator.current_session.session_id
+
+    alice.end_task()
+    bob.end_task()
+    assert len(base.focus_calculator.sessions) == 2
+    reloaded = FocusScoreCalculator(str(tmp_path / "sessions.json"))
+    assert sorted(s.task_name for s in reloaded.sessions) == ["任务: 写数学作业", "任务: 学习Python编程"]
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+replay_benchmark 的测试：离线回放统计
+"""
+
+import json
+
+from replay_benchmark import build_monitor, load_events, percentile, replay, synthetic_events
+from stub_llm import StubLLMClient
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) == 0.0
+
+
+def test_replay_reports_cache_and_upstream_calls(tmp_path):
+    events = synthetic_events(200, seed=1)
+    client = StubLLMClient()
+    monitor = build_monitor(client, tmp_path)
+    report = replay(events, monitor, concurrency=1)
+
+    assert report["events"] == 200 and report["errors"] == 0
+    # 规范化 URL 后只有少量 (任务, 网站) 组合，其余都命中缓存
+    assert report["upstream_calls"] == report["cache_misses"]
+    assert report["cache_hits"] + report["cache_misses"] == 200
+    assert report["cache_hit_rate"] > 0.5
+    assert report["latency_ms"]["p50"] <= report["latency_ms"]["p99"]
+
+
+def test_load_events_skips_incomplete_records(tmp_path):
+    path = tmp_path / "website_events.jsonl"
+    records = synthetic_events(3) + [{"received_at": "2025-10-18T10:00:00", "website": {}}]
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+    assert len(load_events(path)) == 3
+    assert len(load_events(path, limit=2)) == 2
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+shared_state 与 serve 的测试：多个进程/监控器共享判定缓存、计数与活跃会话
+"""
+
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+import serve
+from focus_score_calculator import FocusScoreCalculator
+from monitor_registry import MonitorRegistry
+from shared_state import SharedStateStore, SharedVerdictCache
+from stub_llm import StubLLMClient
+from task_focus_monitor import TaskFocusMonitor
+
+
+def test_verdict_cache_is_shared_between_stores(tmp_path):
+    db_file = tmp_path / "shared.db"
+    worker_a = SharedVerdictCache(SharedStateStore(str(db_file)), max_entries=2)
+    worker_b = SharedVerdictCache(SharedStateStore(str(db_file)), max_entries=2)
+
+    assert worker_b.get("t", "https://docs.python.org") is None
+    worker_a.put("t", "https://docs.python.org/", {"is_relevant": True, "action": "allow",
+                                                   "reason": "文档", "confidence": "high", "raw_response": "x"})
+    hit = worker_b.get("t", "http://www.docs.python.org")
+    assert hit == {"is_relevant": True, "action": "allow", "reason": "文档", "confidence": "high"}
+    assert worker_b.stats()["hits"] == 1 and worker_b.stats()["misses"] == 1
+
+    worker_a.put("t", "https://a.com", {"is_relevant": False})
+    worker_a.put("t", "https://b.com", {"is_relevant": False})
+    assert worker_b.stats()["entries"] == 2
+    assert worker_a.stats()["evictions"] == 1
+    assert worker_b.get("t", "https://docs.python.org") is None
+
+
+def test_verdict_cache_evicts_least_recently_used(tmp_path):
+    db_file = tmp_path / "shared.db"
+    cache = SharedVerdictCache(SharedStateStore(str(db_file)), max_entries=2)
+    cache.put("t", "https://a.com", {"is_relevant": True})
+    cache.put("t", "https://b.com", {"is_relevant": True})
+    assert cache.get("t", "https://a.com") is not None
+    assert cache.contains("t", "https://b.com")
+    cache.put("t", "https://c.com", {"is_relevant": True})
+
+    assert cache.contains("t", "https://a.com") and cache.contains("t", "https://c.com")
+    assert not cache.contains("t", "https://b.com")
+
+
+def test_verdict_table_without_last_used_is_migrated(tmp_path):
+    db_file = tmp_path / "shared.db"
+    conn = sqlite3.connect(str(db_file))
+    conn.execute("CREATE TABLE verdicts (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, result TEXT NOT NULL)")
+    conn.execute("INSERT INTO verdicts VALUES ('old', ?, '{\"is_relevant\": true}')", (time.time(),))
+    conn.commit()
+    conn.close()
+
+    store = SharedStateStore(str(db_file))
+    assert store.get_verdict("old", ttl=60) == {"is_relevant": True}
+    assert store.put_verdict("new", {"is_relevant": False}, max_entries=1) == 1
+    assert store.get_verdict("new", ttl=60) == {"is_relevant": False}
+
+
+def test_claim_session_and_idle_expiry(tmp_path):
+    store = SharedStateStore(str(tmp_path / "shared.db"), session_idle=60)
+    first = store.claim_session("task", {"session_id": "s1", "task_name": "A"})
+    second = store.claim_session("task", {"session_id": "s2", "task_name": "A"})
+    assert first["session_id"] == second["session_id"] == "s1"
+
+    store.release_session("task", "s1")
+    assert store.claim_session("task", {"session_id": "s3"})["session_id"] == "s3"
+
+    store.session_idle = 0
+    assert store.claim_session("task", {"session_id": "s4"})["session_id"] == "s4"
+
+
+def _bump(db_file, n):
+    store = SharedStateStore(db_file)
+    for i in range(n):
+        store.record_check("task", "s1", is_relevant=i % 2 == 0)
+
+
+def test_counters_across_processes(tmp_path):
+    db_file = str(tmp_path / "shared.db")
+    SharedStateStore(db_file)
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_bump, args=(db_file, 50)) for _ in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(60)
+        assert p.exitcode == 0
+
+    store = SharedStateStore(db_file)
+    assert store.counters("checks:") == {"checks:total": 200, "checks:relevant": 100, "checks:irrelevant": 100}
+    assert store.session_counts("s1") == {"relevant": 100, "irrelevant": 100}
+
+
+def test_monitors_share_cache_and_session(tmp_path):
+    db_file = str(tmp_path / "shared.db")
+    client = StubLLMClient()
+    monitors = []
+    for name in ("a", "b"):
+        calculator = FocusScoreCalculator(str(tmp_path / f"{name}.json"), storage="sqlite")
+        monitor = TaskFocusMonitor(api_key="test", shared_state=SharedStateStore(db_file), focus_calculator=calculator)
+        monitor.client = client
+        monitors.append(monitor)
+
+    task = {"id": "t1", "name": "学习Python编程", "resources": []}
+    first = monitors[0].check_from_flowstate(task, {"url": "https://docs.python.org"})
+    second = monitors[1].check_from_flowstate(task, {"url": "https://docs.python.org"})
+    monitors[1].check_from_flowstate(task, {"url": "https://www.bilibili.com"})
+    assert first["is_relevant"] and second.get("cached") is True
+    assert client.calls == 2
+
+    session_ids = {m.focus_calculator.current_session.session_id for m in monitors}
+    assert len(session_ids) == 1
+
+    summary = monitors[0].end_task()
+    assert summary["relevant_websites"] == 2 and summary["irrelevant_websites"] == 1
+
+
+def test_clients_on_same_task_keep_separate_sessions(tmp_path):
+    store = SharedStateStore(str(tmp_path / "shared.db"))
+    calculator = FocusScoreCalculator(str(tmp_path / "sessions.json"), storage="sqlite")
+    base = TaskFocusMonitor(api_key="test", shared_state=store, focus_calculator=calculator)
+    base.client = StubLLMClient()
+    registry = MonitorRegistry(factory=lambda client_id: TaskFocusMonitor(parent=base, client_id=client_id),
+                               default=lambda: base)
+
+    task = {"id": "t1", "name": "学习Python编程", "resources": []}
+    with registry.acquire("alice") as alice:
+        alice.check_from_flowstate(task, {"url": "https://docs.python.org"})
+    with registry.acquire("bob") as bob:
+        bob.check_from_flowstate(task, {"url": "https://www.bilibili.com"})
+    bob_session = bob.focus_calculator.current_session.session_id
+    assert alice.focus_calculator.current_session.session_id != bob_session
+
+    summary = alice.end_task()
+    assert (summary["relevant_websites"], summary["irrelevant_websites"]) == (1, 0)
+
+    bob.check_from_flowstate(task, {"url": "https://docs.python.org"})
+    assert bob.focus_calculator.current_session.session_id == bob_session
+    assert store.client_counts("bob") == {"total": 2, "relevant": 1, "irrelevant": 1}
+    assert store.client_counts("alice") == {"total": 1, "relevant": 1, "irrelevant": 0}
+    summary = bob.end_task()
+    assert (summary["relevant_websites"], summary["irrelevant_websites"]) == (1, 1)
+
+
+def test_choose_server_falls_back(monkeypatch):
+    monkeypatch.setattr(serve, "_has_gunicorn", False)
+    monkeypatch.setattr(serve, "_has_waitress", False)
+    assert serve.choose_server("auto") == "werkzeug"
+    with pytest.raises(ValueError):
+        serve.choose_server("gunicorn")
+    monkeypatch.setattr(serve, "_has_waitress", True)
+    assert serve.choose_server("auto") == "waitress"
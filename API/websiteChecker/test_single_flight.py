@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求合并测试（基于 pytest）
+运行：
+    pytest -q API/websiteChecker/test_single_flight.py
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from single_flight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, n):
+    outcomes = []
+
+    def worker():
+        try:
+            outcomes.append(flight.do(key, fn))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads, outcomes
+
+
+def test_waiters_share_the_leader_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return {"is_relevant": True}
+
+    threads, outcomes = run_concurrently(flight, "k", fn, 5)
+    deadline = time.time() + 2
+    while flight.stats()["coalesced"] < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert [shared for _, shared in outcomes].count(False) == 1
+    assert all(result is outcomes[0][0] for result, _ in outcomes)
+    assert flight.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_errors_propagate_to_waiters_and_key_is_released():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(2)
+        raise RuntimeError("boom")
+
+    threads, outcomes = run_concurrently(flight, "k", fn, 3)
+    deadline = time.time() + 2
+    while flight.stats()["coalesced"] < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(outcomes) == 3 and all(isinstance(o, RuntimeError) for o in outcomes)
+    assert flight.do("k", lambda: 42) == (42, False)
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    assert flight.stats()["coalesced"] == 0
+    with pytest.raises(ValueError):
+        flight.do("a", lambda: int("x"))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+stub_llm 的测试：规则判定与回答格式能被 TaskFocusMonitor 正确解析，HTTP 桩服务
+"""
+
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from stub_llm import StubLLMClient, StubLLMError, StubLLMServer, answer, judge
+from focus_score_calculator import FocusScoreCalculator
+from task_focus_monitor import TaskFocusMonitor
+from verdict_cache import VerdictCache
+
+
+@pytest.fixture()
+def monitor(tmp_path):
+    m = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                         focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    m.client = StubLLMClient()
+    return m
+
+
+def test_judge_rules():
+    assert judge("学习Python编程", "https://docs.python.org/3/")[0] is True
+    assert judge("学习Python编程", "https://www.youtube.com/watch?v=1") == (False, "高", "娱乐、社交或购物网站，容易分心")
+    assert judge("写报告", "https://www.google.com/search?q=x")[:2] == (True, "中")
+    assert judge("写报告", "https://example.org/")[0] is False
+
+
+def test_single_answer_parsed_by_monitor(monitor):
+    monitor.set_task("学习Python编程")
+    result = monitor.check_website("https://www.youtube.com")
+    assert result["is_relevant"] is False
+    assert result["confidence"] == "high"
+    assert result["reason"] == "娱乐、社交或购物网站，容易分心"
+
+    result = monitor.check_website("https://docs.python.org", "Python 官方文档")
+    assert result["is_relevant"] is True
+    assert monitor.client.calls == 2
+
+
+def test_batch_answer_parsed_by_monitor(monitor):
+    monitor.set_task("学习Python编程")
+    results = monitor.check_websites(["https://docs.python.org", "https://twitter.com", "https://example.org"])
+    assert [r["is_relevant"] for r in results] == [True, False, False]
+    assert [r["confidence"] for r in results] == ["high", "high", "low"]
+    assert monitor.client.calls == 1
+
+
+def test_answer_without_task_still_well_formed():
+    assert answer("URL: https://bilibili.com").startswith("判断：不相关\n置信度：高\n理由：")
+
+
+def test_error_rate_raises():
+    client = StubLLMClient(error_rate=1.0)
+    with pytest.raises(StubLLMError):
+        client.chat.completions.create(messages=[{"role": "user", "content": "URL: https://a.com"}])
+    assert client.errors == 1
+
+
+def test_yes_no_prompt():
+    assert answer("任务: 学习Python\n网站: https://docs.python.org\n\n这个网站是否有助于完成任务？").startswith("是，")
+    assert answer("任务: 学习Python\n网站: https://weibo.com\n\n这个网站是否有助于完成任务？").startswith("否，")
+
+
+@pytest.fixture()
+def stub_server():
+    server = StubLLMServer(latency=0.01).start()
+    yield server
+    server.stop()
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read()), response.headers
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read()), e.headers
+
+
+def test_monitor_talks_to_stub_server_via_base_url(stub_server, tmp_path):
+    monitor = TaskFocusMonitor(api_key="stub", base_url=stub_server.base_url,
+                               verdict_cache=VerdictCache(cache_file=""),
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.set_task("学习Python编程")
+    result = monitor.check_website("https://www.bilibili.com")
+    assert result["is_relevant"] is False and result["confidence"] == "high"
+    results = monitor.check_websites(["https://docs.python.org", "https://example.org"])
+    assert [r["is_relevant"] for r in results] == [True, False]
+    assert stub_server.stats()["calls"] == 2
+
+    # 异步引擎沿用同一地址
+    result = monitor.engine.run(monitor.check_website_async("https://pypi.org/project/python-dateutil"))
+    assert result["is_relevant"] is True
+    monitor.engine.close()
+
+
+def test_stub_server_errors_and_rate_limit():
+    server = StubLLMServer(error_rate=1.0).start()
+    try:
+        url = server.base_url + "/v1/chat/completions"
+        status, body, _ = _post(url, {"model": "m", "messages": [{"role": "user", "content": "URL: a.com"}]})
+        assert status == 500 and body["error"]["type"] == "server_error"
+        status, _, _ = _post(url, {"model": "m"})
+        assert status == 400
+    finally:
+        server.stop()
+
+    server = StubLLMServer(rate_limit=1).start()
+    try:
+        url = server.base_url + "/openai/v1/chat/completions"
+        payload = {"model": "m", "messages": [{"role": "user", "content": "URL: a.com"}]}
+        statuses = [_post(url, payload) for _ in range(3)]
+        assert statuses[0][0] == 200
+        assert statuses[0][1]["choices"][0]["message"]["content"].startswith("判断：")
+        limited = [s for s in statuses if s[0] == 429]
+        assert limited and limited[0][2]["Retry-After"] == "1"
+        assert server.stats()["rate_limited"] == len(limited)
+    finally:
+        server.stop()
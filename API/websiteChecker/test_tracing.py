@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+tracing 的测试：分段记录、Server-Timing 格式、跨线程/异步引擎传播
+"""
+
+from async_engine import AsyncClassificationEngine
+from stub_llm import AsyncStubLLMClient, StubLLMClient
+from focus_score_calculator import FocusScoreCalculator
+from task_focus_monitor import TaskFocusMonitor
+from tracing import current_trace, end_trace, span, start_trace
+from verdict_cache import VerdictCache
+
+
+def _async_client():
+    content = "判断：相关\n置信度：高\n理由：软件包索引"
+    return AsyncStubLLMClient(latency=0.01, responder=lambda messages, **kwargs: content)
+
+
+def test_span_without_trace_is_noop():
+    assert current_trace() is None
+    with span("llm"):
+        pass
+    assert current_trace() is None
+
+
+def test_spans_aggregate_into_server_timing():
+    trace, token = start_trace("abc")
+    try:
+        with span("log"):
+            pass
+        with span("llm"):
+            pass
+        with span("log"):
+            pass
+    finally:
+        end_trace(token)
+
+    assert current_trace() is None
+    assert [s["name"] for s in trace.spans] == ["log", "llm", "log"]
+    assert list(trace.totals()) == ["log", "llm"]
+    header = trace.server_timing()
+    assert header.startswith("log;dur=") and ", llm;dur=" in header
+    assert header.split(", ")[-1].startswith("total;dur=")
+    record = trace.to_dict()
+    assert record["trace_id"] == "abc" and len(record["spans"]) == 3
+
+
+def test_monitor_stages_are_traced(tmp_path):
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.client = StubLLMClient()
+    task = {"id": "t1", "name": "学习Python编程", "resources": []}
+
+    trace, token = start_trace()
+    try:
+        monitor.check_from_flowstate(task, {"url": "https://docs.python.org"})
+    finally:
+        end_trace(token)
+    assert list(trace.totals()) == ["task", "cache", "prompt", "llm", "parse", "focus", "storage"]
+
+    # 异步引擎在后台事件循环中运行，追踪随 asyncio 任务的上下文传播过去
+    monitor._engine = AsyncClassificationEngine(client=_async_client())
+    trace, token = start_trace()
+    try:
+        monitor.engine.run(monitor.check_from_flowstate_async(task, {"url": "https://pypi.org"}))
+    finally:
+        end_trace(token)
+    monitor.engine.close()
+    assert "llm" in trace.totals() and "focus" in trace.totals()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+判定缓存测试（基于 pytest）
+- 覆盖 URL 规范化、任务指纹、TTL/LRU、持久化
+- 验证 TaskFocusMonitor 命中缓存时不再调用 LLM
+运行：
+    pytest -q API/websiteChecker/test_verdict_cache.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from verdict_cache import VerdictCache, canonicalize_url, task_fingerprint
+
+
+RESULT = {"is_relevant": True, "action": "allow", "reason": "学习资源", "confidence": "high"}
+
+
+def test_canonicalize_url_merges_equivalent_forms():
+    assert canonicalize_url("https://www.Example.com/docs/?b=2&a=1#top") == \
+        canonicalize_url("http://example.com/docs?a=1&b=2&utm_source=x")
+    assert canonicalize_url("example.com") == "https://example.com"
+    assert canonicalize_url("https://example.com:8443/") == "https://example.com:8443"
+    assert canonicalize_url("https://example.com/a") != canonicalize_url("https://example.com/b")
+
+
+def test_task_fingerprint_ignores_resource_order():
+    r1 = {"kind": "url", "id": "https://docs.python.org"}
+    r2 = {"kind": "app", "id": "vscode"}
+    assert task_fingerprint("学习Python", [r1, r2]) == task_fingerprint("学习Python", [r2, r1])
+    assert task_fingerprint("学习Python", [r1]) != task_fingerprint("学习Python", [r1, r2])
+    assert task_fingerprint("学习Python") != task_fingerprint("写作业")
+
+
+def test_cache_hit_miss_and_ttl():
+    cache = VerdictCache(cache_file="", ttl=60)
+    assert cache.get("t", "https://docs.python.org") is None
+    cache.put("t", "https://docs.python.org/", dict(RESULT, raw_response="..."))
+    hit = cache.get("t", "http://www.docs.python.org")
+    assert hit["is_relevant"] is True
+    assert "raw_response" not in hit
+    assert cache.get("other", "https://docs.python.org") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+    cache.ttl = 0
+    cache._entries[cache.make_key("t", "https://docs.python.org")] = (0.0, RESULT)
+    assert cache.get("t", "https://docs.python.org") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_lru_eviction():
+    cache = VerdictCache(cache_file="", max_entries=2)
+    cache.put("t", "https://a.com", RESULT)
+    cache.put("t", "https://b.com", RESULT)
+    cache.get("t", "https://a.com")
+    cache.put("t", "https://c.com", RESULT)
+    assert cache.get("t", "https://b.com") is None
+    assert cache.get("t", "https://a.com") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_persists_across_instances(tmp_path):
+    cache_file = tmp_path / "verdict_cache.json"
+    cache = VerdictCache(cache_file=str(cache_file))
+    cache.put("t", "https://docs.python.org", RESULT)
+    cache.save()
+
+    reloaded = VerdictCache(cache_file=str(cache_file))
+    assert reloaded.get("t", "https://docs.python.org")["reason"] == "学习资源"
+
+
+def test_monitor_serves_repeat_checks_from_cache(tmp_path):
+    from focus_score_calculator import FocusScoreCalculator
+    from stub_llm import StubLLMClient
+    from task_focus_monitor import TaskFocusMonitor
+
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.client = StubLLMClient(responder=lambda messages, **kwargs: "判断：相关\n置信度：高\n理由：官方文档")
+
+    task = {"id": "task_1", "name": "学习Python编程",
+            "resources": [{"kind": "url", "id": "https://docs.python.org", "title": "Python 文档"}]}
+    first = monitor.check_from_flowstate(task, {"url": "https://docs.python.org/3/"})
+    second = monitor.check_from_flowstate(task, {"url": "https://www.docs.python.org/3"})
+
+    assert monitor.client.calls == 1
+    assert first["is_relevant"] is True and "cached" not in first
+    assert second["cached"] is True and second["is_relevant"] is True
+    assert len(monitor.get_history()) == 2
+
+    # 任务数据缺少名称时，按任务数据算出的指纹与监控器实际使用的一致（api_server 的请求合并依赖它）
+    nameless = {"id": "task_2", "resources": task["resources"]}
+    monitor.check_from_flowstate(nameless, {"url": "https://docs.python.org/3/"})
+    assert TaskFocusMonitor.flowstate_task_key(nameless) == monitor.current_task_key
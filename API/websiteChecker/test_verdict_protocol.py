@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+verdict_protocol 的测试：JSON / 文本判定的严格解析、格式错误时的单次修复追问
+"""
+
+import pytest
+
+from async_engine import AsyncClassificationEngine
+from focus_score_calculator import FocusScoreCalculator
+from stub_llm import AsyncStubLLMClient, StubLLMClient
+from task_focus_monitor import TaskFocusMonitor
+from verdict_cache import VerdictCache
+from verdict_protocol import REPAIR_MARKER, VerdictParseError, parse_json_verdict, parse_verdict
+
+
+def sequence_client(*answers, client_class=StubLLMClient):
+    """依次返回给定回答的桩客户端，client.requests 记录每次调用的参数"""
+    answers = list(answers)
+    requests = []
+
+    def respond(messages, **kwargs):
+        requests.append(dict(kwargs, messages=messages))
+        return answers.pop(0)
+
+    client = client_class(responder=respond)
+    client.requests = requests
+    return client
+
+
+def _monitor(tmp_path, client, response_format="json"):
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                               response_format=response_format,
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.client = client
+    monitor.set_task("任务: 学习Python编程")
+    return monitor
+
+
+def test_strict_parsing():
+    result = parse_verdict('```json\n{"relevant": false, "confidence": "high", "reason": "视频网站"}\n```')
+    assert (result["is_relevant"], result["action"], result["confidence"]) == (False, "block", "high")
+    assert parse_verdict("判断：相关\n置信度：中\n理由：编程问答")["confidence"] == "medium"
+
+    for bad in ('{"relevant": "yes", "confidence": "high", "reason": "x"}',
+                '{"relevant": true, "confidence": "高", "reason": "x"}',
+                '{"relevant": true, "confidence": "high"}',
+                '[true, "high", "x"]',
+                "这个网站与任务不相关，置信度高",
+                "判断：相关\n理由：缺少置信度"):
+        with pytest.raises(VerdictParseError):
+            parse_verdict(bad)
+    with pytest.raises(VerdictParseError):
+        parse_json_verdict("判断：相关\n置信度：高\n理由：x")
+
+
+def test_json_mode_requests_compact_output(tmp_path):
+    monitor = _monitor(tmp_path, StubLLMClient())
+    result = monitor.check_website("https://www.bilibili.com")
+    assert (result["is_relevant"], result["confidence"]) == (False, "high")
+    assert result["raw_response"].startswith("{")
+
+    client = sequence_client('{"relevant": true, "confidence": "high", "reason": "官方文档"}')
+    monitor = _monitor(tmp_path, client)
+    monitor.check_website("https://docs.python.org")
+    assert client.requests[0]["response_format"] == {"type": "json_object"}
+    assert client.requests[0]["max_tokens"] <= 128
+    assert "JSON" in client.requests[0]["messages"][-1]["content"]
+
+    client = sequence_client("判断：相关\n置信度：高\n理由：官方文档")
+    _monitor(tmp_path, client, response_format="text").check_website("https://docs.python.org")
+    assert "response_format" not in client.requests[0]
+
+
+def test_repair_reask_then_error(tmp_path):
+    client = sequence_client("相关，置信度高", '{"relevant": true, "confidence": "medium", "reason": "教程"}')
+    monitor = _monitor(tmp_path, client)
+    result = monitor.check_website("https://realpython.com")
+    assert (result["is_relevant"], result["confidence"]) == (True, "medium")
+    repair = client.requests[1]["messages"]
+    assert repair[-2] == {"role": "assistant", "content": "相关，置信度高"}
+    assert REPAIR_MARKER in repair[-1]["content"]
+
+    client = sequence_client("不确定", "还是不确定")
+    monitor = _monitor(tmp_path, client)
+    result = monitor.check_website("https://example.org")
+    assert result["action"] == "error"
+    assert len(client.requests) == 2
+    assert len(monitor.check_history) == 0
+    assert not monitor.verdict_cache.contains(monitor.current_task_key, "https://example.org")
+
+
+def test_async_repair_reask(tmp_path):
+    client = sequence_client("相关", '{"relevant": true, "confidence": "high", "reason": "官方文档"}',
+                             client_class=AsyncStubLLMClient)
+    monitor = _monitor(tmp_path, StubLLMClient())
+    monitor._engine = AsyncClassificationEngine(client=client)
+    try:
+        result = monitor.engine.run(monitor.check_website_async("https://docs.python.org", timeout=5))
+    finally:
+        monitor.engine.close()
+    assert (result["is_relevant"], result["confidence"]) == (True, "high")
+    assert [r["response_format"] for r in client.requests] == [{"type": "json_object"}] * 2
+    assert len(monitor.check_history) == 1
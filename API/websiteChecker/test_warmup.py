@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+warmup 的测试：常访问域名统计、任务开始后的后台预热与任务切换时的中止
+"""
+
+import json
+from datetime import datetime
+
+from enhanced_focus_monitor import EnhancedFocusMonitor
+from focus_score_calculator import FocusScoreCalculator
+from stub_llm import StubLLMClient
+from task_focus_monitor import TaskFocusMonitor
+from verdict_cache import VerdictCache, task_fingerprint
+from warmup import TaskWarmup, frequent_sites
+
+RESOURCES = [
+    {"kind": "url", "id": "https://docs.python.org/3/tutorial/", "title": "Python 教程"},
+    {"kind": "app", "id": "vscode", "title": "VS Code"},
+]
+
+
+def _write_results(path, urls):
+    now = datetime.utcnow().isoformat()
+    with open(path, "w", encoding="utf-8") as f:
+        for url in urls:
+            record = {"timestamp": now, "task": {"name": "学习"}, "website": {"url": url, "title": ""},
+                      "result": {"is_relevant": True}}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def test_frequent_sites_picks_top_page_per_domain(tmp_path):
+    log = tmp_path / "classification_results.jsonl"
+    _write_results(log, [
+        "https://github.com/a", "https://www.github.com/a", "https://github.com/b",
+        "https://stackoverflow.com/q/1", "https://stackoverflow.com/q/1",
+        "https://www.bilibili.com",
+    ])
+    assert frequent_sites(log, limit=2) == [("https://github.com/a", None), ("https://stackoverflow.com/q/1", None)]
+    assert frequent_sites(tmp_path / "missing.jsonl", limit=2) == []
+
+
+def test_set_task_warms_cache_in_background(tmp_path):
+    log = tmp_path / "classification_results.jsonl"
+    _write_results(log, ["https://www.bilibili.com", "https://stackoverflow.com/q/1", "https://www.bilibili.com"])
+    warmup = TaskWarmup(result_log=log, max_domains=5)
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""), warmup=warmup,
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.client = StubLLMClient()
+
+    monitor.check_from_flowstate({"name": "学习Python编程", "resources": RESOURCES},
+                                 {"url": "https://docs.python.org/3/library/"})
+    assert warmup.wait(timeout=5)
+    assert warmup.stats() == {"runs": 1, "seeded": 3, "errors": 0}
+    assert len(monitor.get_history()) == 1
+
+    calls = monitor.client.calls
+    result = monitor.check_website("https://www.bilibili.com")
+    assert result["cached"] is True and result["is_relevant"] is False
+    assert monitor.check_website("https://docs.python.org/3/tutorial")["cached"] is True
+    assert monitor.client.calls == calls
+    assert monitor.verdict_cache.stats()["hits"] == 2
+
+
+def test_prefetch_stops_when_task_changes(tmp_path):
+    monitor = TaskFocusMonitor(api_key="test", verdict_cache=VerdictCache(cache_file=""),
+                               focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.client = StubLLMClient()
+    monitor.current_task, monitor.current_task_key = "任务: 学习Python编程", "k1"
+
+    original = monitor._chat
+
+    def chat_then_switch(prompt, max_tokens=512, model=None):
+        content = original(prompt, max_tokens, model)
+        monitor.current_task_key = "k2"
+        return content
+
+    monitor._chat = chat_then_switch
+    sites = ["https://docs.python.org", "https://github.com", "https://www.bilibili.com"]
+    assert monitor.prefetch(sites, max_batch=1) == 1
+    assert monitor.client.calls == 1
+    assert monitor.verdict_cache.contains("k1", "https://docs.python.org")
+
+
+def test_enhanced_monitor_uses_warmed_cache(tmp_path):
+    warmup = TaskWarmup(result_log=tmp_path / "none.jsonl")
+    monitor = EnhancedFocusMonitor(verdict_cache=VerdictCache(cache_file=""), warmup=warmup,
+                                   focus_calculator=FocusScoreCalculator(str(tmp_path / "sessions.json")))
+    monitor.client = StubLLMClient()
+
+    monitor.flowstate_bridge.get_current_task = lambda: {"id": "t1", "name": "学习Python编程", "resources": RESOURCES}
+    assert monitor.start_task_monitoring()
+    assert warmup.wait(timeout=5) and warmup.stats()["seeded"] == 1
+
+    monitor.flowstate_bridge.get_current_website = lambda: {"url": "https://docs.python.org/3/tutorial/", "title": ""}
+    result = monitor.check_current_website()
+    assert result["success"] and result["is_relevant"]
+    assert monitor.client.calls == 1
+    assert monitor.verdict_cache.contains(task_fingerprint("学习Python编程", RESOURCES), "https://docs.python.org/3/tutorial")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+轻量的请求内分段计时
+- start_trace() 在当前上下文（contextvars）开启一次追踪，span(name) 记录一段耗时
+- 没有开启追踪时 span() 返回空操作对象，监控器在 CLI 等场景下几乎没有额外开销
+- 追踪经 asyncio 任务复制的上下文传播，异步判定引擎中的分段也会记入同一次请求
+- trace_app() 为 Flask 应用加上 Server-Timing 响应头，并可把追踪记录交给 sink（如写入 JSONL）
+"""
+
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# 只记录总耗时不少于该值（毫秒）的追踪，0 表示全部记录
+DEFAULT_SLOW_MS = float(os.environ.get("WEBCHECKER_TRACE_SLOW_MS", "0"))
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("webchecker_trace", default=None)
+
+
+class Trace:
+    """一次请求的分段记录（可被多个线程/协程写入）"""
+
+    __slots__ = ("trace_id", "started", "spans", "_lock")
+
+    def __init__(self, trace_id: str = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float) -> None:
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "start_ms": round((start - self.started) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+            })
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def totals(self) -> Dict[str, float]:
+        """按名称汇总各段耗时（毫秒），按各名称首次开始的先后排列"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            spans = sorted(self.spans, key=lambda item: item["start_ms"])
+        for item in spans:
+            totals[item["name"]] = totals.get(item["name"], 0.0) + item["duration_ms"]
+        return totals
+
+    def server_timing(self) -> str:
+        """生成 Server-Timing 响应头，最后附上 total"""
+        parts = [f"{name};dur={duration:.1f}" for name, duration in self.totals().items()]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {"trace_id": self.trace_id, "total_ms": round(self.elapsed_ms(), 3), "spans": spans}
+
+
+class _Span:
+    __slots__ = ("_trace", "_name", "_start")
+
+    def __init__(self, trace: Trace, name: str):
+        self._trace = trace
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._trace.add(self._name, self._start, time.perf_counter())
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """
+    记录一段耗时（with span("llm"): ...）
+
+    参数:
+        name: 分段名称，作为 Server-Timing 的指标名，应只含字母、数字、下划线
+    """
+    trace = _current.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def start_trace(trace_id: str = None):
+    """
+    在当前上下文开启追踪
+
+    返回:
+        tuple: (Trace, token)，结束时把 token 交给 end_trace()
+    """
+    trace = Trace(trace_id)
+    return trace, _current.set(trace)
+
+
+def end_trace(token) -> None:
+    _current.reset(token)
+
+
+def trace_app(app, sink: Callable[[Dict], None] = None, slow_ms: float = None) -> None:
+    """
+    为 Flask 应用的每个请求开启追踪并返回 Server-Timing 响应头
+
+    参数:
+        app: Flask 应用
+        sink: 接收追踪记录的函数（None 表示不记录），记录包含请求方法、路径、状态码与各分段
+        slow_ms: 只把总耗时不少于该值（毫秒）的请求交给 sink，默认 WEBCHECKER_TRACE_SLOW_MS 或 0
+    """
+    from flask import g, request
+
+    slow_ms = DEFAULT_SLOW_MS if slow_ms is None else slow_ms
+
+    @app.before_request
+    def _trace_before_request():
+        g._trace, g._trace_token = start_trace(request.headers.get("X-Request-Id"))
+
+    @app.after_request
+    def _trace_after_request(response):
+        trace = g.get("_trace")
+        if trace is None:
+            return response
+        response.headers["Server-Timing"] = trace.server_timing()
+        if sink is not None:
+            record = trace.to_dict()
+            if record["total_ms"] >= slow_ms:
+                record.update({
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                })
+                sink(record)
+        return response
+
+    @app.teardown_request
+    def _trace_teardown_request(exc):
+        token = g.pop("_trace_token", None)
+        g.pop("_trace", None)
+        if token is not None:
+            try:
+                end_trace(token)
+            except ValueError:
+                # 令牌来自其他上下文（例如测试客户端复用了线程）时无需复原
+                pass
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+网站判定结果缓存
+- 以 (任务指纹, 规范化URL) 为键缓存 LLM 的判定结果
+- 支持 TTL 过期与 LRU 淘汰
+- 持久化到 JSON 文件，进程重启后仍可命中
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+DEFAULT_CACHE_FILE = Path(__file__).parent / "verdict_cache.json"
+
+# 不影响页面内容的跟踪参数，规范化时丢弃
+_TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "spm", "ref", "ref_src"}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    规范化URL，使同一页面的不同写法映射到同一个缓存键
+
+    规则：协议与主机名小写、去掉 www. 前缀和默认端口、
+    去掉片段(#...)与跟踪参数、查询参数排序、去掉末尾的 /
+
+    参数:
+        url: 原始URL
+
+    返回:
+        str: 规范化后的URL
+    """
+    url = (url or "").strip()
+    if not url:
+        return ""
+    if "://" not in url:
+        url = "http://" + url
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url.lower()
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    if scheme == "http":
+        # http 与 https 视为同一站点
+        scheme = "https"
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/")
+
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def task_fingerprint(task_name: str, resources: Optional[List[Dict]] = None) -> str:
+    """
+    计算任务指纹（任务名 + 资源列表的哈希）
+
+    资源按 kind:id 排序后参与哈希，顺序变化不会改变指纹
+
+    参数:
+        task_name: 任务名称或任务描述
+        resources: FlowState 任务资源列表（可选）
+
+    返回:
+        str: 十六进制指纹
+    """
+    resource_keys = sorted(
+        f"{r.get('kind', '')}:{r.get('id', '')}" for r in (resources or [])
+    )
+    payload = json.dumps(
+        {"name": (task_name or "").strip(), "resources": resource_keys},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class VerdictCache:
+    """带 TTL 与 LRU 淘汰的判定结果缓存（线程安全）"""
+
+    def __init__(self, cache_file: Optional[str] = None, ttl: float = None,
+                 max_entries: int = None, save_interval: float = 5.0):
+        """
+        初始化缓存
+
+        参数:
+            cache_file: 持久化文件路径，传入 "" 表示只用内存
+            ttl: 条目有效期（秒），默认读取 VERDICT_CACHE_TTL，否则 24 小时
+            max_entries: 最大条目数，默认读取 VERDICT_CACHE_SIZE，否则 5000
+            save_interval: 两次落盘之间的最短间隔（秒）
+        """
+        if cache_file is None:
+            cache_file = os.environ.get("VERDICT_CACHE_FILE", str(DEFAULT_CACHE_FILE))
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.ttl = float(ttl if ttl is not None else os.environ.get("VERDICT_CACHE_TTL", 24 * 3600))
+        self.max_entries = int(max_entries if max_entries is not None else os.environ.get("VERDICT_CACHE_SIZE", 5000))
+        self.save_interval = save_interval
+
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self.load()
+        if self.cache_file:
+            atexit.register(self.save)
+
+    @staticmethod
+    def make_key(task_key: str, website_url: str) -> str:
+        """由任务指纹与URL生成缓存键"""
+        return f"{task_key}|{canonicalize_url(website_url)}"
+
+    def get(self, task_key: str, website_url: str) -> Optional[Dict]:
+        """
+        查询缓存
+
+        返回:
+            dict: 命中时返回判定结果的副本，未命中或已过期返回 None
+        """
+        key = self.make_key(task_key, website_url)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, result = entry
+            if now - stored_at > self.ttl:
+                del self._entries[key]
+                self._dirty = True
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def contains(self, task_key: str, website_url: str) -> bool:
+        """是否有未过期的条目（不计入命中率、不调整 LRU 顺序，供预热等后台任务使用）"""
+        key = self.make_key(task_key, website_url)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() - entry[0] <= self.ttl
+
+    def put(self, task_key: str, website_url: str, result: Dict) -> None:
+        """
+        写入缓存（只保存判定所需字段，不保存 raw_response）
+        """
+        key = self.make_key(task_key, website_url)
+        value = {
+            "is_relevant": result.get("is_relevant", False),
+            "action": result.get("action", "block"),
+            "reason": result.get("reason", ""),
+            "confidence": result.get("confidence", "medium"),
+        }
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+        self._maybe_save()
+
+    def clear(self) -> None:
+        """清空缓存（计数器保留）"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.save()
+
+    def stats(self) -> Dict:
+        """返回命中率等统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def load(self) -> None:
+        """从文件加载未过期的条目"""
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with self.cache_file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[WARN] 加载判定缓存失败 {self.cache_file}: {e}")
+            return
+
+        now = time.time()
+        entries = sorted(data.get("entries", []), key=lambda e: e[1])
+        with self._lock:
+            for key, stored_at, result in entries[-self.max_entries:]:
+                if now - stored_at <= self.ttl:
+                    self._entries[key] = (stored_at, result)
+
+    def save(self) -> None:
+        """落盘（先写临时文件再替换，避免写到一半损坏）"""
+        if not self.cache_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[key, stored_at, result] for key, (stored_at, result) in self._entries.items()]
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            tmp_file = self.cache_file.with_suffix(self.cache_file.suffix + ".tmp")
+            with tmp_file.open("w", encoding="utf-8") as f:
+                json.dump({"entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            print(f"[WARN] 保存判定缓存失败 {self.cache_file}: {e}")
+
+    def _maybe_save(self) -> None:
+        if time.time() - self._last_save >= self.save_interval:
+            self.save()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+LLM 判定的结构化输出协议
+- JSON 模式（默认）：提示词要求只输出 {"relevant", "confidence", "reason"} 三个字段，
+  调用时传 response_format={"type": "json_object"}，max_tokens 只需约 128
+- 严格解析：字段缺失、类型不对或取值不在范围内都视为解析失败，不再按子串猜测
+  （例如回答里出现“高”就当作高置信度），避免误判的结果计入专注度
+- 解析失败时由调用方发起一次修复追问（repair_messages），仍失败则按调用出错处理
+- 文本模式（WEBCHECKER_RESPONSE_FORMAT=text）沿用“判断/置信度/理由”三行格式，同样严格解析
+"""
+
+import json
+import os
+import re
+from typing import Dict, List
+
+
+DEFAULT_RESPONSE_FORMAT = os.environ.get("WEBCHECKER_RESPONSE_FORMAT", "json")
+# JSON 模式下单个判定的最大输出长度
+DEFAULT_JSON_MAX_TOKENS = int(os.environ.get("WEBCHECKER_JSON_MAX_TOKENS", "128"))
+TEXT_MAX_TOKENS = 512
+# 理由的最大长度（字符），超出部分截断
+MAX_REASON_LENGTH = 200
+
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+JSON_OUTPUT_INSTRUCTIONS = """只输出一个 JSON 对象，不要输出其他内容，格式如下：
+{"relevant": true 或 false, "confidence": "high" 或 "medium" 或 "low", "reason": "不超过30字的理由"}"""
+
+TEXT_OUTPUT_INSTRUCTIONS = """请按以下格式回答：
+判断：相关 / 不相关
+置信度：高 / 中 / 低
+理由：[简短说明为什么相关或不相关]
+
+只回答以上内容，不要添加其他说明。"""
+
+REPAIR_MARKER = "上一条回答的格式不正确"
+
+_CONFIDENCES = ("high", "medium", "low")
+_TEXT_CONFIDENCE = {"高": "high", "中": "medium", "低": "low"}
+_FENCE_RE = re.compile(r"^```(?:json)?\s*(.*?)\s*```$", re.S)
+_TEXT_VERDICT_RE = re.compile(r"^\s*判断\s*[：:]\s*(不相关|相关)\s*$", re.M)
+_TEXT_CONFIDENCE_RE = re.compile(r"^\s*置信度\s*[：:]\s*(高|中|低)\s*$", re.M)
+_TEXT_REASON_RE = re.compile(r"^\s*理由\s*[：:]\s*(.+?)\s*$", re.M)
+
+
+class VerdictParseError(ValueError):
+    """模型回答不符合约定的格式"""
+
+
+def response_format_mode(mode: str = None) -> str:
+    """规范化输出模式（json / text），无法识别时使用 json"""
+    mode = (mode or DEFAULT_RESPONSE_FORMAT).strip().lower()
+    if mode not in ("json", "text"):
+        print(f"[WARN] 未知的输出模式 {mode}，使用 json")
+        return "json"
+    return mode
+
+
+def output_instructions(mode: str) -> str:
+    return JSON_OUTPUT_INSTRUCTIONS if mode == "json" else TEXT_OUTPUT_INSTRUCTIONS
+
+
+def max_tokens_for(mode: str) -> int:
+    return DEFAULT_JSON_MAX_TOKENS if mode == "json" else TEXT_MAX_TOKENS
+
+
+def _result(is_relevant: bool, confidence: str, reason: str, raw: str) -> Dict:
+    return {
+        "is_relevant": is_relevant,
+        "action": "allow" if is_relevant else "block",
+        "reason": reason[:MAX_REASON_LENGTH],
+        "confidence": confidence,
+        "raw_response": raw,
+    }
+
+
+def parse_json_verdict(text: str) -> Dict:
+    """
+    严格解析 JSON 判定
+
+    返回:
+        dict: 判定结果（格式同 check_website，含 raw_response）
+
+    异常:
+        VerdictParseError: 不是 JSON 对象，或字段缺失/类型错误/取值不合法
+    """
+    body = (text or "").strip()
+    fenced = _FENCE_RE.match(body)
+    if fenced:
+        body = fenced.group(1)
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise VerdictParseError(f"不是有效的 JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise VerdictParseError("JSON 顶层不是对象")
+
+    relevant = data.get("relevant")
+    if not isinstance(relevant, bool):
+        raise VerdictParseError("relevant 必须是 true 或 false")
+    confidence = data.get("confidence")
+    if confidence not in _CONFIDENCES:
+        raise VerdictParseError(f"confidence 必须是 {' / '.join(_CONFIDENCES)}")
+    reason = data.get("reason")
+    if not isinstance(reason, str) or not reason.strip():
+        raise VerdictParseError("reason 必须是非空字符串")
+    return _result(relevant, confidence, reason.strip(), text)
+
+
+def parse_text_verdict(text: str) -> Dict:
+    """
+    严格解析“判断/置信度/理由”三行文本
+
+    异常:
+        VerdictParseError: 缺少任一行，或取值不在范围内
+    """
+    text = text or ""
+    verdict = _TEXT_VERDICT_RE.search(text)
+    confidence = _TEXT_CONFIDENCE_RE.search(text)
+    reason = _TEXT_REASON_RE.search(text)
+    if not (verdict and confidence and reason):
+        raise VerdictParseError("缺少“判断”“置信度”或“理由”行")
+    return _result(verdict.group(1) == "相关", _TEXT_CONFIDENCE[confidence.group(1)], reason.group(1), text)
+
+
+def parse_verdict(text: str) -> Dict:
+    """
+    解析单个网站的判定（JSON 对象或三行文本，两种格式都严格校验）
+
+    异常:
+        VerdictParseError: 两种格式都不符合
+    """
+    stripped = (text or "").lstrip()
+    if stripped.startswith("{") or stripped.startswith("```"):
+        return parse_json_verdict(text)
+    return parse_text_verdict(text)
+
+
+def repair_messages(messages: List[Dict], bad_output: str, error: Exception, mode: str) -> List[Dict]:
+    """
+    构造修复追问：在原对话后附上错误的回答与格式要求
+
+    参数:
+        messages: 原请求的消息列表
+        bad_output: 无法解析的回答
+        error: 解析错误
+        mode: json / text
+    """
+    return list(messages) + [
+        {"role": "assistant", "content": bad_output or ""},
+        {"role": "user", "content": f"{REPAIR_MARKER}（{error}）。{output_instructions(mode)}"},
+    ]
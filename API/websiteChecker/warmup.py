@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+设置任务后的判定缓存预热
+- 任务开始时在后台线程预先判定：任务自身的 url 资源 + 用户最常访问的域名
+  （从 classification_results.jsonl 统计，每个域名取访问最多的页面）
+- 判定结果只写入判定缓存，不计入检查历史与专注会话；会话开始后的前几次访问直接命中缓存
+- 任务在预热途中切换时，剩余的批次不再发送
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from check_history import domain_of
+from log_segments import read_range
+from verdict_cache import canonicalize_url
+
+
+DEFAULT_RESULT_LOG = Path(__file__).parent / "logs" / "classification_results.jsonl"
+# 为 0 时不预热
+DEFAULT_WARMUP_ENABLED = os.environ.get("WEBCHECKER_WARMUP", "1") != "0"
+# 预热的常访问域名数
+DEFAULT_WARMUP_DOMAINS = int(os.environ.get("WEBCHECKER_WARMUP_DOMAINS", "20"))
+# 统计常访问域名时回看的天数
+DEFAULT_WARMUP_DAYS = float(os.environ.get("WEBCHECKER_WARMUP_DAYS", "14"))
+# 常访问域名的统计结果缓存多久（秒），避免每次设置任务都扫描日志
+_FREQUENT_SITES_TTL = 300.0
+# 与 _apply_flowstate_task 一致，只取前 5 个资源
+_MAX_RESOURCES = 5
+
+
+def resource_sites(resources: Optional[Sequence[Dict]]) -> List[Tuple[str, Optional[str]]]:
+    """
+    取任务资源中的网址
+
+    返回:
+        list: (url, description) 列表
+    """
+    sites = []
+    for resource in (resources or [])[:_MAX_RESOURCES]:
+        if resource.get("kind") == "url" and resource.get("id"):
+            sites.append((resource["id"], resource.get("title") or None))
+    return sites
+
+
+def frequent_sites(result_log: Path, limit: int, days: float = None) -> List[Tuple[str, Optional[str]]]:
+    """
+    统计判定日志中访问最多的域名，每个域名返回访问最多的页面
+
+    参数:
+        result_log: classification_results.jsonl 路径（包含已轮转的段）
+        limit: 返回的域名数
+        days: 回看的天数，None 表示全部
+
+    返回:
+        list: 按访问次数降序的 (url, title) 列表
+    """
+    start = datetime.utcnow() - timedelta(days=days) if days else None
+    domains: Counter = Counter()
+    pages: Dict[str, Counter] = {}
+    titles: Dict[str, str] = {}
+    for record in read_range(result_log, start=start):
+        website = record.get("website") or {}
+        url = website.get("url")
+        domain = domain_of(url or "")
+        if not domain:
+            continue
+        canonical = canonicalize_url(url)
+        domains[domain] += 1
+        pages.setdefault(domain, Counter())[canonical] += 1
+        if website.get("title"):
+            titles[canonical] = website["title"]
+
+    sites = []
+    for domain, _ in domains.most_common(limit):
+        canonical = pages[domain].most_common(1)[0][0]
+        sites.append((canonical, titles.get(canonical)))
+    return sites
+
+
+class TaskWarmup:
+    """任务开始时在后台预热判定缓存（可被多个监控器共用，线程安全）"""
+
+    def __init__(self, result_log: Path = None, max_domains: int = None, days: float = None,
+                 max_batch: int = None):
+        """
+        参数:
+            result_log: 判定日志路径，默认 logs/classification_results.jsonl
+            max_domains: 预热的常访问域名数，默认 WEBCHECKER_WARMUP_DOMAINS 或 20
+            days: 统计常访问域名时回看的天数，默认 WEBCHECKER_WARMUP_DAYS 或 14
+            max_batch: 单次 LLM 调用最多判定的网站数量，默认与批量判定相同
+        """
+        self.result_log = Path(result_log) if result_log else DEFAULT_RESULT_LOG
+        self.max_domains = max_domains if max_domains is not None else DEFAULT_WARMUP_DOMAINS
+        self.days = days if days is not None else DEFAULT_WARMUP_DAYS
+        self.max_batch = max_batch
+
+        self._lock = threading.Lock()
+        self._frequent: Optional[List[Tuple[str, Optional[str]]]] = None
+        self._frequent_at = 0.0
+        self._threads: List[threading.Thread] = []
+
+        self.runs = 0
+        self.seeded = 0
+        self.errors = 0
+
+    def candidates(self, resources: Optional[Sequence[Dict]] = None) -> List[Tuple[str, Optional[str]]]:
+        """
+        需要预热的网站：任务资源在前，其后是常访问域名（按规范化 URL 去重）
+
+        返回:
+            list: (url, description) 列表
+        """
+        sites = []
+        seen = set()
+        for url, description in resource_sites(resources) + self._frequent_sites():
+            canonical = canonicalize_url(url)
+            if canonical and canonical not in seen:
+                seen.add(canonical)
+                sites.append((url, description))
+        return sites
+
+    def _frequent_sites(self) -> List[Tuple[str, Optional[str]]]:
+        if self.max_domains <= 0:
+            return []
+        with self._lock:
+            if self._frequent is not None and time.monotonic() - self._frequent_at < _FREQUENT_SITES_TTL:
+                return self._frequent
+        try:
+            sites = frequent_sites(self.result_log, self.max_domains, self.days)
+        except Exception as e:
+            print(f"[WARN] 读取判定日志失败，跳过常访问域名预热: {e}")
+            sites = []
+        with self._lock:
+            self._frequent, self._frequent_at = sites, time.monotonic()
+        return sites
+
+    def start(self, monitor, resources: Optional[Sequence[Dict]] = None) -> threading.Thread:
+        """
+        在后台线程为监控器的当前任务预热判定缓存
+
+        参数:
+            monitor: 已设置任务的监控器，需提供 prefetch(websites, max_batch=None)
+            resources: 任务的资源列表（FlowState 任务数据中的 resources）
+
+        返回:
+            threading.Thread: 预热线程
+        """
+        thread = threading.Thread(target=self._run, args=(monitor, resources), name="task-warmup", daemon=True)
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()] + [thread]
+        thread.start()
+        return thread
+
+    def _run(self, monitor, resources) -> None:
+        try:
+            seeded = monitor.prefetch(self.candidates(resources), max_batch=self.max_batch)
+        except Exception as e:
+            with self._lock:
+                self.runs += 1
+                self.errors += 1
+            print(f"[WARN] 判定缓存预热失败: {e}")
+            return
+        with self._lock:
+            self.runs += 1
+            self.seeded += seeded
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待进行中的预热完成（测试与基准使用），超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                return False
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"runs": self.runs, "seeded": self.seeded, "errors": self.errors}
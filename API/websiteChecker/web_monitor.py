@@ -9,10 +9,23 @@ from flask import Flask, render_template_string, request, jsonify
 
 os.environ["GROQ_API_KEY"] = "type in your own key"
 
+from local_model import LocalRelevanceModel
+from metrics import instrument_app, register_cache_metrics
+from monitor_registry import MonitorRegistry, client_id_from_request
+from shared_state import SharedStateStore
 from task_focus_monitor import TaskFocusMonitor
+from warmup import DEFAULT_WARMUP_ENABLED, TaskWarmup
 
 app = Flask(__name__)
-monitor = TaskFocusMonitor()
+instrument_app(app)
+monitor = TaskFocusMonitor(shared_state=SharedStateStore.from_env(),
+                           warmup=TaskWarmup() if DEFAULT_WARMUP_ENABLED else None,
+                           local_model=LocalRelevanceModel.from_env())
+# 每个浏览器（页面生成的 X-Client-Id）一个监控器，各自的任务互不覆盖
+monitors = MonitorRegistry(factory=lambda client_id: TaskFocusMonitor(parent=monitor, client_id=client_id),
+                           default=lambda: monitor)
+
+register_cache_metrics(lambda: monitor.verdict_cache)
 
 # HTML模板
 HTML_TEMPLATE = """
@@ -279,6 +292,13 @@ HTML_TEMPLATE = """
     </div>
     
     <script>
+        // 每个浏览器一个客户端标识，服务端据此区分各自的任务
+        let clientId = localStorage.getItem('webcheckerClientId');
+        if (!clientId) {
+            clientId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Math.random()).slice(2);
+            localStorage.setItem('webcheckerClientId', clientId);
+        }
+        
         let stats = {
             total: 0,
             relevant: 0,
@@ -294,7 +314,7 @@ HTML_TEMPLATE = """
             
             fetch('/set_task', {
                 method: 'POST',
-                headers: {'Content-Type': 'application/json'},
+                headers: {'Content-Type': 'application/json', 'X-Client-Id': clientId},
                 body: JSON.stringify({task: task})
             })
             .then(response => response.json())
@@ -325,7 +345,7 @@ HTML_TEMPLATE = """
             
             fetch('/check_website', {
                 method: 'POST',
-                headers: {'Content-Type': 'application/json'},
+                headers: {'Content-Type': 'application/json', 'X-Client-Id': clientId},
                 body: JSON.stringify({website: website})
             })
             .then(response => response.json())
@@ -388,7 +408,8 @@ def set_task():
     """设置任务API"""
     data = request.json
     task = data.get('task', '')
-    monitor.set_task(task)
+    with monitors.acquire(client_id_from_request(request, data)) as client_monitor:
+        client_monitor.set_task(task)
     return jsonify({"success": True, "task": task})
 
 
@@ -398,12 +419,14 @@ def check_website():
     data = request.json
     website = data.get('website', '')
     
-    result = monitor.check_website(website)
+    with monitors.acquire(client_id_from_request(request, data)) as client_monitor:
+        result = client_monitor.check_website(website)
     
     return jsonify({
         "is_relevant": result['is_relevant'],
         "reason": result['reason'],
-        "confidence": result['confidence']
+        "confidence": result['confidence'],
+        "cached": result.get('cached', False)
     })
 
 
@@ -413,6 +436,7 @@ if __name__ == '__main__':
     print("="*70)
     print("\n启动服务器...")
     print("请在浏览器中访问: http://localhost:5000")
+    print("开发模式（调试器与自动重载已开启）；生产环境请使用: python3 serve.py --app web_monitor")
     print("\n按 Ctrl+C 停止服务器\n")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
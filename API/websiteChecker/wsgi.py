@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+WSGI 入口，供 gunicorn / waitress / uWSGI 等直接加载：
+    gunicorn -w 4 --threads 8 -b 127.0.0.1:5001 wsgi:application
+
+默认启用多进程共享状态（见 serve.py 的 configure_shared_state）
+"""
+
+from serve import configure_shared_state
+
+configure_shared_state()
+
+from api_server import app as application
@@ -31,6 +31,10 @@ export class TaskStore {
         this.data = await this.readFile();
         return this.data;
     }
+    /** Drop the in-memory copy so the next load() re-reads the file (used by long-lived processes). */
+    reload() {
+        this.data = null;
+    }
     async persist() {
         await this.ensureDir();
         const data = this.data ?? DEFAULT_DATA;
@@ -0,0 +1,55 @@
+#!/usr/bin/env node
+// Long-lived worker for the Python bridge: reads one JSON request per line on
+// stdin and writes one JSON response per line on stdout, so callers pay the
+// Node startup cost once instead of once per command.
+import readline from 'readline';
+import { TaskStore } from './store.js';
+const store = new TaskStore();
+async function handle(req) {
+    // Re-read store.json on every request so edits made by the CLI are visible.
+    store.reload();
+    switch (req.cmd) {
+        case 'ping':
+            return 'pong';
+        case 'task:list':
+            return store.listTasks();
+        case 'task:show':
+            return (await store.getTask(req.args?.[0] ?? '')) ?? null;
+        case 'task:current': {
+            const [latest] = await store.listTasks();
+            return latest ?? null;
+        }
+        default:
+            throw new Error(`Unknown command: ${req.cmd}`);
+    }
+}
+function write(res) {
+    process.stdout.write(JSON.stringify(res) + '\n');
+}
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+// Requests are handled one at a time, so responses come back in request order.
+let queue = Promise.resolve();
+async function processLine(line) {
+    if (!line.trim())
+        return;
+    let req;
+    try {
+        req = JSON.parse(line);
+    }
+    catch (e) {
+        write({ id: null, ok: false, error: `Invalid request: ${e.message}` });
+        return;
+    }
+    try {
+        write({ id: req.id, ok: true, result: await handle(req) });
+    }
+    catch (e) {
+        write({ id: req.id, ok: false, error: e?.message ?? String(e) });
+    }
+}
+rl.on('line', (line) => {
+    queue = queue.then(() => processLine(line));
+});
+rl.on('close', () => {
+    queue.then(() => process.exit(0));
+});
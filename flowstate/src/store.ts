@@ -39,6 +39,11 @@ export class TaskStore {
     return this.data;
   }
 
+  /** Drop the in-memory copy so the next load() re-reads the file (used by long-lived processes). */
+  reload(): void {
+    this.data = null;
+  }
+
   private async persist() {
     await this.ensureDir();
     const data = this.data ?? DEFAULT_DATA;